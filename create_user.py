@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
 import os
+import argparse
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -8,19 +9,31 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from src.AuthManager import AuthManager
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python create_user.py <username> <password>")
-        sys.exit(1)
-    
-    username = sys.argv[1]
-    password = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Create a user, or set the groups of an existing one.")
+    parser.add_argument("username")
+    parser.add_argument("password", nargs="?", help="The password of a new user")
+    parser.add_argument("--groups", help="Comma separated persona groups, for example default,admin")
+    args = parser.parse_args()
+    if args.password is None and args.groups is None:
+        parser.error("give a password to create the user, or --groups to update it")
     
     auth_manager = AuthManager()
     
-    if auth_manager.create_user(username, password):
-        print(f"User '{username}' created successfully.")
-    else:
-        print(f"Failed to create user '{username}'. Username may already exist.")
+    if args.password is not None:
+        if auth_manager.create_user(args.username, args.password):
+            print(f"User '{args.username}' created successfully.")
+        else:
+            print(f"Failed to create user '{args.username}'. Username may already exist.")
+            if args.groups is None:
+                sys.exit(1)
+    
+    if args.groups is not None:
+        groups = [group.strip() for group in args.groups.split(",") if group.strip()]
+        if auth_manager.set_user_config(args.username, {"groups": groups}):
+            print(f"Set the groups of '{args.username}' to {', '.join(groups)}.")
+        else:
+            print(f"User '{args.username}' does not exist.")
+            sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -2,46 +2,110 @@ import json
 import os
 import hashlib
 import secrets
+import sqlite3
 import time
+import threading
 from pathlib import Path
 from typing import Dict, Any, Optional
 from LocalConfigManager import LocalConfigManager
 
 class AuthManager:
-    def __init__(self):
+    def __init__(self, config_manager: Optional[LocalConfigManager] = None):
         """
-        Initialize the AuthManager with a user ID.
+        Initialize the AuthManager with the shared auth database.
+        
+        The database lives in ~/.leah/auth/auth.db and is safe to share between several server
+        processes. Users from a legacy auth.json are imported the first time it is opened.
         
         Args:
-            user_id (str): The user ID to create a config directory for
+            config_manager (Optional[LocalConfigManager]): The config manager to place the database with,
+                or None for the "auth" one
         """
-        self.config_manager = LocalConfigManager("auth")
+        if config_manager is None:
+            config_manager = LocalConfigManager("auth")
+        self.config_manager = config_manager
         self.config_path = self.config_manager.get_path("auth.json")
-        self.auth_data: Dict[str, Any] = {}
-        self.load_auth_data()
+        self.db_path = self.config_manager.get_path("auth.db")
+        self._local = threading.local()
+        self._create_tables()
+        self._migrate_auth_json()
         # Token expiration time in seconds (1 year)
         self.token_expiration = 86400*365
 
-    def load_auth_data(self) -> None:
+    def _get_connection(self) -> sqlite3.Connection:
         """
-        Load authentication data from the auth.json file.
-        Creates the file if it doesn't exist.
+        Get the database connection for the current thread, opening it on first use.
+        
+        Returns:
+            sqlite3.Connection: The connection, in autocommit mode with write-ahead logging enabled
         """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _create_tables(self) -> None:
+        """Create the users and tokens tables if they don't exist."""
+        connection = self._get_connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL,
+                salt TEXT NOT NULL,
+                config TEXT NOT NULL DEFAULT '{}'
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS tokens (
+                token TEXT PRIMARY KEY,
+                username TEXT NOT NULL REFERENCES users (username),
+                created_at INTEGER NOT NULL,
+                expires_at INTEGER NOT NULL
+            )
+        """)
+        connection.execute("CREATE INDEX IF NOT EXISTS tokens_expires_at ON tokens (expires_at)")
+
+    def _migrate_auth_json(self) -> None:
+        """Import the users and unexpired tokens of a legacy auth.json, then rename it out of the way."""
         if not os.path.exists(self.config_path):
-            # Create an empty auth.json file with a basic structure
-            default_auth = {
-                "users": {}
-            }
-            with open(self.config_path, 'w') as f:
-                json.dump(default_auth, f, indent=4)
-        
+            return
         try:
             with open(self.config_path, 'r') as f:
-                self.auth_data = json.load(f)
+                auth_data = json.load(f)
         except json.JSONDecodeError:
             raise ValueError(f"Invalid JSON format in {self.config_path}")
-        except Exception as e:
-            raise Exception(f"Error loading auth data: {str(e)}")
+
+        current_time = int(time.time())
+        connection = self._get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for username, user_data in auth_data.get("users", {}).items():
+                connection.execute(
+                    "INSERT OR IGNORE INTO users (username, password_hash, salt, config) VALUES (?, ?, ?, ?)",
+                    (username, user_data["password_hash"], user_data["salt"], json.dumps(user_data.get("config", {})))
+                )
+                for token, token_data in user_data.get("tokens", {}).items():
+                    if token_data["expires_at"] >= current_time:
+                        connection.execute(
+                            "INSERT OR IGNORE INTO tokens (token, username, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                            (token, username, token_data["created_at"], token_data["expires_at"])
+                        )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        try:
+            os.replace(self.config_path, self.config_path + ".migrated")
+        except OSError:
+            # Another process finished the migration first
+            pass
+        print(f"Migrated {len(auth_data.get('users', {}))} users from {self.config_path}")
+
+    @staticmethod
+    def _hash_password(password: str, salt: str) -> str:
+        return hashlib.md5((password + salt).encode()).hexdigest()
 
     def create_user(self, username: str, password: str) -> bool:
         """
@@ -54,25 +118,27 @@ class AuthManager:
         Returns:
             bool: True if user was created successfully, False if username already exists
         """
-        if username in self.auth_data["users"]:
-            return False
-            
         # Generate a random salt
         salt = secrets.token_hex(16)
+        cursor = self._get_connection().execute(
+            "INSERT OR IGNORE INTO users (username, password_hash, salt) VALUES (?, ?, ?)",
+            (username, self._hash_password(password, salt), salt)
+        )
+        return cursor.rowcount > 0
+
+    def set_user_config(self, username: str, config: Dict[str, Any]) -> bool:
+        """
+        Replace the configuration of a user.
         
-        # Hash the password with the salt
-        hashed_password = hashlib.md5((password + salt).encode()).hexdigest()
-        
-        # Store the user data
-        self.auth_data["users"][username] = {
-            "password_hash": hashed_password,
-            "salt": salt,
-            "tokens": {}
-        }
-        
-        # Save the updated auth data
-        self.update_auth_data(self.auth_data)
-        return True
+        Args:
+            username (str): The username to update
+            config (Dict[str, Any]): The new configuration, for example {"groups": ["default"]}
+            
+        Returns:
+            bool: True if the user exists and was updated, False otherwise
+        """
+        cursor = self._get_connection().execute("UPDATE users SET config = ? WHERE username = ?", (json.dumps(config), username))
+        return cursor.rowcount > 0
 
     def authenticate(self, username: str, password: str) -> Optional[str]:
         """
@@ -85,36 +151,42 @@ class AuthManager:
         Returns:
             Optional[str]: The authentication token if successful, None if authentication failed
         """
-        if username not in self.auth_data["users"]:
+        connection = self._get_connection()
+        row = connection.execute("SELECT password_hash, salt FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
             return None
             
-        user_data = self.auth_data["users"][username]
-        salt = user_data["salt"]
-        
-        # Hash the provided password with the stored salt
-        hashed_password = hashlib.md5((password + salt).encode()).hexdigest()
-        
         # Verify the password
-        if hashed_password != user_data["password_hash"]:
+        password_hash, salt = row
+        if self._hash_password(password, salt) != password_hash:
             return None
             
-        # Generate a new token
+        # Generate a new token and store it with its expiration
         token = secrets.token_urlsafe(32)
-        expiration = int(time.time()) + self.token_expiration
+        created_at = int(time.time())
+        connection.execute(
+            "INSERT INTO tokens (token, username, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (token, username, created_at, created_at + self.token_expiration)
+        )
+        return token
+
+    def get_token(self, token: str) -> Optional[tuple]:
+        """
+        Look up a token along with its user's configuration.
         
-        # Store the token with its expiration
-        if "tokens" not in user_data:
-            user_data["tokens"] = {}
+        Args:
+            token (str): The token to look up
             
-        user_data["tokens"][token] = {
-            "created_at": int(time.time()),
-            "expires_at": expiration
-        }
-        
-        # Save the updated auth data
-        self.update_auth_data(self.auth_data)
-        
-        return token
+        Returns:
+            Optional[tuple]: A tuple of (username, expires_at, config), or None if the token doesn't exist
+        """
+        row = self._get_connection().execute("""
+            SELECT tokens.username, tokens.expires_at, users.config FROM tokens
+            JOIN users ON users.username = tokens.username WHERE tokens.token = ?
+        """, (token,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
 
     def verify_token(self, username: str, token: str) -> bool:
         """
@@ -127,24 +199,11 @@ class AuthManager:
         Returns:
             bool: True if the token is valid and not expired, False otherwise
         """
-        if username not in self.auth_data["users"]:
-            return False
-            
-        user_data = self.auth_data["users"][username]
-        if "tokens" not in user_data or token not in user_data["tokens"]:
-            return False
-            
-        token_data = user_data["tokens"][token]
-        current_time = int(time.time())
-        
-        # Check if token has expired
-        if current_time > token_data["expires_at"]:
-            # Remove expired token
-            del user_data["tokens"][token]
-            self.update_auth_data(self.auth_data)
+        entry = self.get_token(token)
+        if entry is None or entry[0] != username:
             return False
-            
-        return True
+        # Expired tokens are removed by delete_expired_tokens
+        return int(time.time()) <= entry[1]
 
     def get_user_config(self, username: str, token: str) -> Dict[str, Any]:
         """
@@ -152,22 +211,133 @@ class AuthManager:
         
         Args:
             username (str): The username to get configuration for
+            token (str): A token belonging to the user
         """
-        if username not in self.auth_data["users"]:
+        entry = self.get_token(token)
+        if entry is None or entry[0] != username:
             return None
+        return entry[2]
 
-        if token not in self.auth_data["users"][username]["tokens"]:
-            return None
+    def delete_expired_tokens(self, batch_size: int = 500) -> int:
+        """
+        Delete every expired token, a batch at a time so writers in other processes are not blocked for long.
+        
+        Args:
+            batch_size (int): The number of tokens deleted per statement
+            
+        Returns:
+            int: The number of tokens deleted
+        """
+        connection = self._get_connection()
+        current_time = int(time.time())
+        deleted = 0
+        while True:
+            cursor = connection.execute(
+                "DELETE FROM tokens WHERE token IN (SELECT token FROM tokens WHERE expires_at < ? LIMIT ?)",
+                (current_time, batch_size)
+            )
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
 
-        return self.auth_data["users"][username]["config"]
+def start_token_sweeper(interval: float = 3600.0) -> threading.Thread:
+    """
+    Start a background thread that deletes expired tokens from the auth database.
+    
+    Args:
+        interval (float): The number of seconds between sweeps
+        
+    Returns:
+        threading.Thread: The sweeper thread
+    """
+    def sweep():
+        auth_manager = AuthManager()
+        while True:
+            try:
+                deleted = auth_manager.delete_expired_tokens()
+                if deleted:
+                    print(f"Deleted {deleted} expired tokens")
+            except Exception as e:
+                print(f"Error in token sweeper: {e}")
+            time.sleep(interval)
+    thread = threading.Thread(target=sweep, daemon=True)
+    thread.start()
+    return thread
+
+class TokenIndex:
+    """
+    An in-memory index of recently used tokens, kept coherent with the auth database.
+
+    Lookups of known tokens are a dict access. The index is dropped whenever another connection
+    commits a change to the database, which is detected with PRAGMA data_version at most once per
+    check_interval, so logins, new users and swept tokens are picked up without reading every row.
+    """
+
+    def __init__(self, check_interval: float = 1.0, auth_manager: Optional[AuthManager] = None):
+        """
+        Initialize the token index.
+        
+        Args:
+            check_interval (float): The minimum number of seconds between checks of the database for changes
+            auth_manager (Optional[AuthManager]): The auth manager to read tokens with, or None for a new one
+        """
+        self.auth_manager = auth_manager if auth_manager is not None else AuthManager()
+        self.check_interval = check_interval
+        self.tokens: Dict[str, tuple] = {}
+        self.data_version = None
+        self.last_check = 0.0
+        self.lock = threading.Lock()
+        # A dedicated connection, since data_version only reports commits made by other connections
+        self.version_connection = sqlite3.connect(self.auth_manager.db_path, timeout=30, check_same_thread=False)
 
-    def update_auth_data(self, new_data: Dict[str, Any]) -> None:
+    def lookup(self, username: str, token: str) -> Optional[Dict[str, Any]]:
         """
-        Update the authentication data and save it to the file.
+        Verify a token and get the configuration of its user.
         
         Args:
-            new_data (Dict[str, Any]): New authentication data to merge with existing data
+            username (str): The username the token should belong to
+            token (str): The token to verify
+            
+        Returns:
+            Optional[Dict[str, Any]]: The user's configuration if the token is valid and not expired, None otherwise
         """
-        self.auth_data.update(new_data)
-        with open(self.config_path, 'w') as f:
-            json.dump(self.auth_data, f, indent=4)
+        with self.lock:
+            self._refresh()
+            entry = self.tokens.get(token)
+        if entry is None:
+            entry = self.auth_manager.get_token(token)
+            if entry is None:
+                return None
+            with self.lock:
+                self.tokens[token] = entry
+        if entry[0] != username:
+            return None
+        if int(time.time()) > entry[1]:
+            # The token sweeper deletes it from the database
+            with self.lock:
+                self.tokens.pop(token, None)
+            return None
+        return entry[2]
+
+    def _refresh(self) -> None:
+        """Drop the index if the database changed since the last check. Must be called with the lock held."""
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        data_version = self.version_connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            self.tokens = {}
+            self.data_version = data_version
+
+_token_index: Optional[TokenIndex] = None
+_token_index_lock = threading.Lock()
+
+def get_token_index() -> TokenIndex:
+    """Get the process-wide token index."""
+    global _token_index
+    if _token_index is None:
+        with _token_index_lock:
+            if _token_index is None:
+                _token_index = TokenIndex()
+    return _token_index
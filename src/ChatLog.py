@@ -0,0 +1,101 @@
+import os
+import threading
+from array import array
+from typing import List
+
+_append_lock = threading.Lock()
+
+class ChatLogFile:
+    """
+    A day's chat log with a sidecar index of line offsets, so its most recent lines can be read
+    without scanning the file.
+
+    The log itself stays a plain text file with one message per line. Next to chat_<date>.log, a
+    chat_<date>.idx file holds the byte offset at which each line starts, as unsigned 64-bit
+    integers. The index is written after each line and is repaired from the log on read if it is
+    missing or behind, so logs written before the index existed keep working.
+    """
+
+    def __init__(self, log_path: str):
+        """
+        Initialize the chat log file.
+
+        Args:
+            log_path (str): The path of the .log file
+        """
+        self.log_path = log_path
+        self.index_path = os.path.splitext(log_path)[0] + ".idx"
+
+    def append(self, line: str) -> None:
+        """
+        Append a line to the log and record its offset.
+
+        Args:
+            line (str): The line to append, without its newline
+        """
+        with _append_lock:
+            with open(self.log_path, 'ab') as log_file:
+                offset = log_file.tell()
+                log_file.write((line + "\n").encode('utf-8'))
+            with open(self.index_path, 'ab') as index_file:
+                array('Q', [offset]).tofile(index_file)
+
+    def _read_offsets(self) -> array:
+        """Load the line offsets, indexing any lines the sidecar is missing."""
+        # Held throughout so a repair can't interleave with an append
+        with _append_lock:
+            offsets = array('Q')
+            rewrite = False
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'rb') as index_file:
+                    data = index_file.read()
+                # A torn write leaves a partial offset that would misalign every later one
+                rewrite = len(data) % offsets.itemsize != 0
+                offsets.frombytes(data[:len(data) - len(data) % offsets.itemsize])
+            log_size = os.path.getsize(self.log_path)
+            with open(self.log_path, 'rb') as log_file:
+                if offsets and offsets[-1] >= log_size:
+                    # The log was replaced or truncated, so its index no longer applies
+                    offsets = array('Q')
+                    rewrite = True
+                if offsets:
+                    log_file.seek(offsets[-1])
+                    log_file.readline()
+                if log_file.tell() >= log_size and not rewrite:
+                    return offsets
+                missing = array('Q')
+                while True:
+                    offset = log_file.tell()
+                    if not log_file.readline():
+                        break
+                    missing.append(offset)
+            offsets.extend(missing)
+            if rewrite:
+                with open(self.index_path, 'wb') as index_file:
+                    offsets.tofile(index_file)
+            else:
+                with open(self.index_path, 'ab') as index_file:
+                    missing.tofile(index_file)
+            return offsets
+
+    def read_recent(self, count: int, max_line_bytes: int = 8192) -> List[str]:
+        """
+        Read the last lines of the log, newest first.
+
+        Args:
+            count (int): The maximum number of lines to read
+            max_line_bytes (int): The number of bytes read from each line, longer lines are cut short
+
+        Returns:
+            List[str]: The lines without their newlines, newest first
+        """
+        if count <= 0 or not os.path.exists(self.log_path):
+            return []
+        offsets = self._read_offsets()
+        lines = []
+        with open(self.log_path, 'rb') as log_file:
+            for i in range(len(offsets) - 1, max(-1, len(offsets) - 1 - count), -1):
+                log_file.seek(offsets[i])
+                data = log_file.readline(max_line_bytes)
+                lines.append(data.decode('utf-8', errors='ignore').rstrip("\n"))
+        return lines
@@ -0,0 +1,362 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from text_analyzer import ANALYZER_VERSION, analyze
+
+class LogIndex:
+    """
+    An inverted index over a persona's conversation messages, stored in a single SQLite database.
+
+    Each message is stored once. Postings map every normalized term to the messages containing it,
+    and per-term document frequencies and collection totals are kept up to date as messages are
+    added, so searches can rank by BM25 without scanning the messages. The index terms picked for
+    a conversation are kept as tags, which are searchable like words in the message.
+
+    Terms are produced by text_analyzer, and the index is rebuilt from the stored messages when it
+    was built with a different analyzer version.
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.2, b: float = 0.75, recency_weight: float = 0.5, recency_half_life_days: float = 30.0):
+        """
+        Open the index, creating its tables if needed.
+
+        Args:
+            db_path (str): The path of the SQLite database
+            k1 (float): The BM25 term frequency saturation
+            b (float): The BM25 length normalization
+            recency_weight (float): How much a brand new message is boosted over an old one, as a fraction of its score
+            recency_half_life_days (float): The age in days at which the recency boost halves
+        """
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.recency_half_life_days = recency_half_life_days
+        self._local = threading.local()
+        self._create_tables()
+        if self._get_meta("analyzer_version") != str(ANALYZER_VERSION):
+            self.reindex()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection for the current thread, opening it on first use.
+
+        Returns:
+            The connection, in autocommit mode with write-ahead logging enabled.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _create_tables(self) -> None:
+        """Create the message store, postings and statistics tables if they don't exist."""
+        connection = self._get_connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                content_hash TEXT NOT NULL UNIQUE,
+                tags TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(messages)")]
+        if "tags" not in columns:
+            connection.execute("ALTER TABLE messages ADD COLUMN tags TEXT NOT NULL DEFAULT ''")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, message_id)
+            ) WITHOUT ROWID
+        """)
+        connection.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+        connection.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def add_messages(self, messages: Iterable[Tuple[str, str]], tags: Iterable[str] = (), timestamp: Optional[str] = None) -> int:
+        """
+        Add messages to the index in one transaction, skipping messages that are already indexed.
+
+        Args:
+            messages (Iterable[Tuple[str, str]]): The (role, content) pairs to add, role being 'user' or 'assistant'
+            tags (Iterable[str]): The index terms that describe the messages
+            timestamp (Optional[str]): The time of the messages as '%Y-%m-%d_%H-%M-%S', defaulting to now
+
+        Returns:
+            int: The number of messages added
+        """
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        created_at = datetime.strptime(timestamp, '%Y-%m-%d_%H-%M-%S').timestamp()
+        tags = sorted({tag.strip().lower() for tag in tags if tag.strip()})
+        tag_terms = [term for tag in tags for term in analyze(tag)]
+        connection = self._get_connection()
+        added = 0
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for role, content in messages:
+                content_hash = hashlib.sha256(f"{timestamp}\0{role}\0{content}".encode("utf-8")).hexdigest()
+                terms = Counter(analyze(content) + tag_terms)
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO messages (timestamp, created_at, role, content, length, content_hash, tags) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (timestamp, created_at, role, content, sum(terms.values()), content_hash, ",".join(tags))
+                )
+                if not cursor.rowcount:
+                    continue
+                self._add_postings(connection, cursor.lastrowid, terms)
+                added += 1
+            if added:
+                connection.executemany("INSERT INTO tags (tag, count) VALUES (?, 1) ON CONFLICT (tag) DO UPDATE SET count = count + 1",
+                                       [(tag,) for tag in tags])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def _add_postings(self, connection: sqlite3.Connection, message_id: int, terms: Counter) -> None:
+        """Add a message's term frequencies and update the collection statistics. Must be called in a transaction."""
+        connection.executemany("INSERT INTO postings (term, message_id, tf) VALUES (?, ?, ?)",
+                               [(term, message_id, tf) for term, tf in terms.items()])
+        connection.executemany("INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT (term) DO UPDATE SET df = df + 1",
+                               [(term,) for term in terms])
+        self._increment_meta(connection, "message_count", 1)
+        self._increment_meta(connection, "total_length", sum(terms.values()))
+
+    def reindex(self) -> None:
+        """Rebuild the postings and term statistics from the stored messages with the current analyzer."""
+        connection = self._get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM postings")
+            connection.execute("DELETE FROM terms")
+            connection.execute("DELETE FROM meta WHERE key IN ('message_count', 'total_length')")
+            rows = connection.execute("SELECT id, content, tags FROM messages").fetchall()
+            for message_id, content, tags in rows:
+                terms = Counter(analyze(content) + [term for tag in tags.split(",") for term in analyze(tag)])
+                connection.execute("UPDATE messages SET length = ? WHERE id = ?", (sum(terms.values()), message_id))
+                self._add_postings(connection, message_id, terms)
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('analyzer_version', ?)", (str(ANALYZER_VERSION),))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        if rows:
+            print(f"Reindexed {len(rows)} messages in {self.db_path}")
+
+    def _increment_meta(self, connection: sqlite3.Connection, key: str, amount: int) -> None:
+        connection.execute("""
+            INSERT INTO meta (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value
+        """, (key, amount))
+
+    def _get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._get_connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def search(self, queries: Iterable[str], mode: str = "or", limit: int = 20) -> List[str]:
+        """
+        Find the messages best matching a set of search terms.
+
+        Args:
+            queries (Iterable[str]): The search terms, each of which may contain several words
+            mode (str): 'or' to match messages containing any term, 'and' to require every term
+            limit (int): The maximum number of messages to return
+
+        Returns:
+            List[str]: The matching messages as log lines ("[timestamp] [ROLE] message"), best match first
+        """
+        if mode not in ("and", "or"):
+            raise ValueError("mode must be either 'and' or 'or'")
+        query_terms = [analyze(query) for query in queries]
+        query_terms = [terms for terms in query_terms if terms]
+        if not query_terms:
+            return []
+        connection = self._get_connection()
+        message_count = int(self._get_meta("message_count", "0"))
+        if not message_count:
+            return []
+        average_length = int(self._get_meta("total_length", "0")) / message_count
+
+        scores: Dict[int, float] = {}
+        matched_queries: Counter = Counter()
+        postings_cache: Dict[str, List[Tuple[int, int]]] = {}
+        for query_index, terms in enumerate(query_terms):
+            query_matches = None
+            for term in set(terms):
+                if term not in postings_cache:
+                    postings_cache[term] = connection.execute("SELECT message_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                term_matches = {message_id for message_id, _ in postings_cache[term]}
+                # Every word of a multi-word term must appear in the message
+                query_matches = term_matches if query_matches is None else query_matches & term_matches
+            for message_id in query_matches:
+                matched_queries[message_id] += 1
+        candidates = [message_id for message_id, count in matched_queries.items() if mode == "or" or count == len(query_terms)]
+        if not candidates:
+            return []
+
+        candidate_set = set(candidates)
+        lengths = self._fetch_columns(connection, "length", candidates)
+        for term, postings in postings_cache.items():
+            idf = math.log(1 + (message_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for message_id, tf in postings:
+                if message_id not in candidate_set:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * lengths[message_id] / average_length)
+                scores[message_id] = scores.get(message_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        now = time.time()
+        created = self._fetch_columns(connection, "created_at", candidates)
+        for message_id in candidates:
+            age_days = max(0.0, now - created[message_id]) / 86400
+            scores[message_id] *= 1 + self.recency_weight * 0.5 ** (age_days / self.recency_half_life_days)
+
+        top = sorted(candidates, key=lambda message_id: scores[message_id], reverse=True)[:limit]
+        rows = {row[0]: row[1:] for row in self._fetch_rows(connection, "id, timestamp, role, content", top)}
+        return [self._format_line(*rows[message_id]) for message_id in top]
+
+    def _format_line(self, timestamp: str, role: str, content: str) -> str:
+        """Format a message the way the chat logs store it, with newlines escaped."""
+        escaped_content = content.replace("\n", "\\n")
+        return f"[{timestamp}] [{role.upper()}] {escaped_content}"
+
+    def search_text(self, text: str, context: Optional[str] = None, limit: int = 20, max_context_terms: int = 10) -> List[str]:
+        """
+        Find the messages most relevant to a piece of text, such as a query, without picking search terms by hand.
+
+        Every term of the text is searched for, along with the rarest terms of the context, and
+        messages matching any of them are ranked by BM25 and recency.
+
+        Args:
+            text (str): The text to find related messages for
+            context (Optional[str]): Additional text, such as the previous reply, to draw extra terms from
+            limit (int): The maximum number of messages to return
+            max_context_terms (int): The maximum number of terms taken from the context
+
+        Returns:
+            List[str]: The matching messages as log lines, best match first
+        """
+        terms = list(dict.fromkeys(analyze(text)))
+        if context:
+            context_terms = [term for term in dict.fromkeys(analyze(context)) if term not in terms]
+            terms += self._rarest_terms(context_terms, max_context_terms)
+        return self.search(terms, "or", limit)
+
+    def _rarest_terms(self, terms: List[str], count: int) -> List[str]:
+        """Get the indexed terms that occur in the fewest messages, which carry the most weight in a search."""
+        document_frequencies = {}
+        connection = self._get_connection()
+        for start in range(0, len(terms), 500):
+            batch = terms[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            document_frequencies.update(connection.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", batch).fetchall())
+        return sorted(document_frequencies, key=document_frequencies.get)[:count]
+
+    def _fetch_rows(self, connection: sqlite3.Connection, columns: str, message_ids: List[int]) -> List[tuple]:
+        """Fetch columns of messages by id, in batches that stay below SQLite's variable limit."""
+        rows = []
+        for start in range(0, len(message_ids), 500):
+            batch = message_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(connection.execute(f"SELECT {columns} FROM messages WHERE id IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def _fetch_columns(self, connection: sqlite3.Connection, column: str, message_ids: List[int]) -> Dict[int, float]:
+        return dict(self._fetch_rows(connection, f"id, {column}", message_ids))
+
+    def get_tags(self, limit: Optional[int] = None) -> List[str]:
+        """
+        Get the index terms, most used first.
+
+        Args:
+            limit (Optional[int]): The maximum number of terms to return, or None for all
+
+        Returns:
+            List[str]: The index terms
+        """
+        rows = self._get_connection().execute("SELECT tag FROM tags ORDER BY count DESC, tag LIMIT ?", (limit if limit is not None else -1,))
+        return [row[0] for row in rows]
+
+    def migrate_term_logs(self, index_dir: str) -> int:
+        """
+        Import a directory of legacy one-file-per-term index logs, then rename it so it is imported once.
+
+        Each message was written to the log of every term it was indexed under, so the copies are
+        merged back into one message carrying all of those terms as tags.
+
+        Args:
+            index_dir (str): The directory holding the <term>.log files
+
+        Returns:
+            int: The number of messages imported
+        """
+        entries: Dict[tuple, set] = {}
+        for file_name in os.listdir(index_dir):
+            term, extension = os.path.splitext(file_name)
+            if extension != ".log":
+                continue
+            with open(os.path.join(index_dir, file_name), 'r', encoding='utf-8') as file:
+                for line in file:
+                    match = re.match(r'\[(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\] \[(USER|ASSISTANT)\] (.*)', line.rstrip("\n"))
+                    if match:
+                        key = (match.group(1), match.group(2).lower(), match.group(3).replace("\\n", "\n"))
+                        entries.setdefault(key, set()).add(term.replace("_", " "))
+        imported = 0
+        for (timestamp, role, content), tags in sorted(entries.items()):
+            imported += self.add_messages([(role, content)], tags, timestamp)
+        os.rename(index_dir, index_dir + ".migrated")
+        print(f"Imported {imported} messages from {index_dir}")
+        return imported
+
+_indexes: Dict[str, LogIndex] = {}
+_index_locks: Dict[str, threading.Lock] = {}
+_indexes_lock = threading.Lock()
+
+def get_log_index(logs_directory: str, persona: str) -> LogIndex:
+    """
+    Get the shared index of a persona's conversation messages, importing its legacy term logs on first use.
+
+    The import runs under a lock of its own index, so a large legacy log only holds up the
+    requests for that index.
+
+    Args:
+        logs_directory (str): The user's log directory
+        persona (str): The persona whose messages are indexed
+
+    Returns:
+        LogIndex: The persona's index
+    """
+    index_dir = os.path.join(logs_directory, "index")
+    db_path = os.path.join(index_dir, f"{persona}.db")
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is not None:
+            return index
+        index_lock = _index_locks.setdefault(db_path, threading.Lock())
+    with index_lock:
+        with _indexes_lock:
+            index = _indexes.get(db_path)
+        if index is None:
+            os.makedirs(index_dir, exist_ok=True)
+            index = LogIndex(db_path)
+            legacy_dir = os.path.join(index_dir, persona)
+            if os.path.isdir(legacy_dir):
+                index.migrate_term_logs(legacy_dir)
+            with _indexes_lock:
+                _indexes[db_path] = index
+    return index
@@ -2,6 +2,8 @@ import os
 from datetime import datetime
 from datetime import timedelta
 from LogItem import LogCollection
+from LogIndex import LogIndex, get_log_index
+from ChatLog import ChatLogFile
 class LogManager:
     def __init__(self, config_manager):
         """
@@ -36,43 +38,58 @@ class LogManager:
         with open(log_file, 'a', encoding='utf-8') as file:
             file.write(log_entry) 
 
-    def log_index_item(self, term: str, message: str, persona: str = "default") -> None:
+    def get_log_index(self, persona: str = "default") -> LogIndex:
         """
-        Log an index item with a timestamp.
+        Get the search index of a persona's conversation messages.
         
         Args:
-            term (str): The term to log
-            message (str): The message to log
-            persona (str): The persona name to organize logs under (default: "default")
+            persona (str): The persona name whose messages are indexed (default: "default")
+            
+        Returns:
+            LogIndex: The persona's index
         """
-        term = term.lower().replace(" ", "_")
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        message = message.replace("\n", "\\n")
-        log_entry = f"[{timestamp}] {message}\n"
+        return get_log_index(self.logs_directory, persona)
+
+    def index_messages(self, persona: str, messages: list[tuple[str, str]], terms: list[str] = ()) -> None:
+        """
+        Add the messages of a conversation turn to the persona's search index.
         
-        # Create a log file for the current term in the logs/index/persona directory
-        index_dir = os.path.join(self.logs_directory, "index", persona)
-        if not os.path.exists(index_dir):
-            os.makedirs(index_dir, exist_ok=True)
-        log_file = os.path.join(index_dir, f"{term}.log")
-        with open(log_file, 'a', encoding='utf-8') as file:
-            file.write(log_entry)
+        Args:
+            persona (str): The persona name to organize the index under
+            messages (list[tuple[str, str]]): The (role, content) pairs to index, role being 'user' or 'assistant'
+            terms (list[str]): The index terms describing the conversation
+        """
+        self.get_log_index(persona).add_messages(messages, terms)
+        
+    def search_index(self, persona: str, terms: list[str], mode: str = "or", limit: int = 50) -> list[str]:
+        """
+        Search the persona's index for messages matching the terms.
+        
+        Args:
+            persona (str): The persona name whose messages are searched
+            terms (list[str]): The search terms
+            mode (str): 'or' to match messages containing any term, 'and' to require every term
+            limit (int): The maximum number of messages to return
+            
+        Returns:
+            list[str]: The matching messages as log lines, best match first
+        """
+        return self.get_log_index(persona).search(terms, mode, limit)
+
+    def search_text(self, persona: str, text: str, context: str = None, limit: int = 50) -> list[str]:
+        """
+        Search the persona's index for messages related to a piece of text, without choosing search terms.
         
-    def search_log_item(self, persona: str, term: str) -> list[str]:
-        """
-        Search the log for an index item with a timestamp.
-        """
-        output = []
-        term = term.strip().lower().replace(" ", "_")
-        log_file = os.path.join(self.logs_directory, "index", persona, f"{term}.log")
-        print("Searching for log file: " + log_file)
-        if not os.path.exists(log_file):
-            return []
-        with open(log_file, 'r', encoding='utf-8') as file:
-            print("Found log file: " + log_file)
-            for line in file:
-                output.append(line.strip())
-        return list(set(output))
+        Args:
+            persona (str): The persona name whose messages are searched
+            text (str): The text to find related messages for, such as a query
+            context (str): Additional text to draw search terms from, such as the previous reply
+            limit (int): The maximum number of messages to return
+            
+        Returns:
+            list[str]: The matching messages as log lines, best match first
+        """
+        return self.get_log_index(persona).search_text(text, context, limit)
 
 
     def log_chat(self, message_type: str, message: str, persona: str = "default") -> None:
@@ -90,7 +107,7 @@ class LogManager:
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         # Escape newlines in the message
         escaped_message = message.replace('\n', '\\n')
-        log_entry = f"[{timestamp}] {message_type.upper()}: {escaped_message}\n"
+        log_entry = f"[{timestamp}] {message_type.upper()}: {escaped_message}"
         
         # Create persona-specific directory under logs/chat/
         chat_dir = os.path.join(self.logs_directory, "chat", persona)
@@ -101,80 +118,58 @@ class LogManager:
         current_date = datetime.now().strftime('%Y-%m-%d')
         log_file = os.path.join(chat_dir, f"chat_{current_date}.log")
         
-        # Append the log entry to the file
-        with open(log_file, 'a', encoding='utf-8') as file:
-            file.write(log_entry) 
-
-
+        # Append the log entry to the file and its line offset index
+        ChatLogFile(log_file).append(log_entry)
 
     def get_all_indexes(self, persona: str) -> list[str]:
         """
-        Get a list of all log file names in the logs/index directory without extensions.
+        Get all the index terms of a persona's conversations.
         
         Returns:
-            list[str]: A list of log file names without extensions.
-        """
-        index_dir = os.path.join(self.logs_directory, "index", persona)
-        if not os.path.exists(index_dir):
-            return []
-        log_files = []
-        for root, _, files in os.walk(index_dir):
-            for file in files:
-                file_name, _ = os.path.splitext(file)
-                log_files.append(file_name)
-        return log_files 
+            list[str]: The index terms.
+        """
+        return self.get_log_index(persona).get_tags()
 
-    def get_logs_for_days(self, persona: str, days: int) -> list[str]:
+    def get_logs_for_days(self, persona: str, days: int, max_logs: int = 50) -> str:
         """
-        Get log files from the current date back to the specified number of days.
+        Get a report of the most recent chat messages from the current date back to the specified number of days.
+
+        Days are read newest first, and only the tail of each day's log that is needed is read.
 
         Args:
             persona (str): The persona name to filter logs.
             days (int): The number of days to look back.
+            max_logs (int): The maximum number of messages in the report (default: 50).
 
         Returns:
-            list[str]: A list of log file paths.
+            str: The report of the most recent messages.
         """
-        log_entries = []
+        day_entries = []
+        collected = 0
         chat_dir = os.path.join(self.logs_directory, "chat", persona)
-        if not os.path.exists(chat_dir):
-            return log_entries
-
         current_date = datetime.now().date()
         for i in range(days + 1):
+            if collected >= max_logs or not os.path.exists(chat_dir):
+                break
             date_to_check = current_date - timedelta(days=i)
             log_file = os.path.join(chat_dir, f"chat_{date_to_check.strftime('%Y-%m-%d')}.log")
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as file:
-                    for line in file:
-                        log_entries.append(" ".join(line.split(" ")[:200]))        
-        log_collection = LogCollection.fromLogLines(log_entries)
-        return log_collection.generate_report()
+            lines = ChatLogFile(log_file).read_recent(max_logs - collected)
+            # Long messages are cut to 200 words only once they have been selected
+            day_entries.append([" ".join(line.split(" ", 200)[:200]) for line in reversed(lines)])
+            collected += len(lines)
+        # Each day's lines are in order, so the days are merged rather than sorted
+        log_collection = LogCollection.fromSortedLogLines(*day_entries)
+        return log_collection.generate_report(max_logs)
 
     def get_largest_index_logs(self, persona: str, num_logs: int = 100) -> list[str]:
         """
-        Get the largest index logs sorted from largest to smallest.
+        Get the most used index terms.
 
         Args:
             persona (str): The persona name to filter logs.
-            num_logs (int): The number of log files to return (default: 100).
+            num_logs (int): The number of index terms to return (default: 100).
 
         Returns:
-            list[str]: A list of the largest log file names without extensions, sorted by size.
+            list[str]: The index terms, sorted from most to least used.
         """
-        index_dir = os.path.join(self.logs_directory, "index", persona)
-        if not os.path.exists(index_dir):
-            return []
-
-        log_files = []
-        for root, _, files in os.walk(index_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_size = os.path.getsize(file_path)
-                log_files.append((file, file_size))
-
-        # Sort log files by size in descending order
-        log_files.sort(key=lambda x: x[1], reverse=True)
-
-        # Return the largest log file names without extensions, up to num_logs
-        return [os.path.splitext(file)[0] for file, _ in log_files[:min(num_logs, len(log_files))]]
+        return self.get_log_index(persona).get_tags(num_logs)
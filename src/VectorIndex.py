@@ -0,0 +1,469 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+from client_pool import get_client_pool
+from config import Config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def is_available() -> bool:
+    """Check whether semantic search can run, which needs NumPy and embeddings enabled in the config."""
+    return np is not None and Config().get_embeddings_config().get("enabled", False)
+
+class Embedder(ABC):
+    """
+    Turns text into embedding vectors.
+    """
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): The texts to embed
+
+        Returns:
+            List[List[float]]: One vector per text, in the same order
+        """
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embeds text with an OpenAI compatible embeddings endpoint, through the shared client pool.
+    """
+
+    def __init__(self, connector: Mapping[str, Any], model: str, batch_size: int = 64):
+        """
+        Initialize the embedder.
+
+        Args:
+            connector (Mapping[str, Any]): The connector settings from config, with url and optionally api_key
+            model (str): The embedding model
+            batch_size (int): The maximum number of texts sent per request
+        """
+        self.connector = connector
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        client = get_client_pool().get_client(self.connector["url"], self.connector.get("api_key") or "lm-studio",
+                                              self.connector.get("max_connections"), self.connector.get("idle_timeout"))
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+EMBEDDERS = {
+    "openai": OpenAIEmbedder
+}
+
+def create_embedder(settings: Optional[Mapping[str, Any]] = None) -> Embedder:
+    """
+    Create an embedder from the "embeddings" section of the config.
+
+    Args:
+        settings (Optional[Mapping[str, Any]]): The embedder type under "type", the connector name and the model
+
+    Returns:
+        Embedder: The embedder
+
+    Raises:
+        ValueError: If the embedder type is unknown
+    """
+    config = Config()
+    settings = settings if settings is not None else config.get_embeddings_config()
+    embedder_type = settings.get("type", "openai")
+    if embedder_type not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {embedder_type}")
+    connector = config.config['connectors'][settings.get("connector", "local")]
+    return EMBEDDERS[embedder_type](connector, settings.get("model"), settings.get("batch_size", 64))
+
+class VectorIndex:
+    """
+    A store of normalized float32 embeddings for one user and persona, searched by cosine similarity.
+
+    The vectors are appended to a flat binary file that is memory-mapped for search, and their
+    metadata is kept in SQLite, where the row number of an item is its row in the matrix. Removing
+    an item only marks it deleted. Compaction rewrites the matrix without deleted rows into a new
+    generation of the file, and switches to it in the same transaction that renumbers the items, so
+    a crash leaves either the old or the new generation in place.
+    """
+
+    def __init__(self, directory: str, compact_ratio: float = 0.25, block_rows: int = 65536):
+        """
+        Open the index, repairing any vectors written without their metadata.
+
+        Args:
+            directory (str): The directory holding the matrix and its metadata
+            compact_ratio (float): The fraction of deleted rows above which compact_if_needed compacts
+            block_rows (int): The number of rows multiplied at once when searching
+        """
+        if np is None:
+            raise RuntimeError("numpy is required for the vector index")
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.block_rows = block_rows
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, "items.db"), timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.RLock()
+        self._matrix = None
+        self._live = None
+        self._create_tables()
+        self._recover()
+
+    def _create_tables(self) -> None:
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                row INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                source TEXT NOT NULL,
+                text TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS items_source ON items (kind, source)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def dimension(self) -> Optional[int]:
+        value = self._get_meta("dimension")
+        return int(value) if value else None
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, f"vectors.{self._get_meta('generation', '0')}.f32")
+
+    def _row_count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def _recover(self) -> None:
+        """Drop vectors appended without metadata and matrix files left over from an interrupted compaction."""
+        with self.lock:
+            current = self._vectors_path()
+            for file_name in os.listdir(self.directory):
+                path = os.path.join(self.directory, file_name)
+                if file_name.startswith("vectors.") and file_name.endswith(".f32") and path != current:
+                    os.remove(path)
+            if self.dimension and os.path.exists(current):
+                expected_size = self._row_count() * self.dimension * 4
+                if os.path.getsize(current) > expected_size:
+                    with open(current, "r+b") as f:
+                        f.truncate(expected_size)
+
+    def add(self, kind: str, source: str, texts: List[str], vectors: List[List[float]], timestamp: Optional[str] = None) -> None:
+        """
+        Append items and their embeddings.
+
+        Args:
+            kind (str): The kind of item, such as 'message' or 'note'
+            source (str): Where the items come from, such as a note name
+            texts (List[str]): The text of each item, returned by searches
+            vectors (List[List[float]]): The embedding of each item
+            timestamp (Optional[str]): The time of the items as '%Y-%m-%d_%H-%M-%S', defaulting to now
+        """
+        if texts:
+            self._write(kind, source, texts, vectors, timestamp)
+
+    def replace_source(self, kind: str, source: str, texts: List[str], vectors: List[List[float]], version: Optional[str] = None) -> None:
+        """
+        Replace all the items of a source, such as the chunks of a note that was rewritten.
+
+        The old items are only removed in the transaction that adds the new ones, so a failed
+        replacement leaves the source as it was.
+
+        Args:
+            kind (str): The kind of the items
+            source (str): The source whose items are replaced
+            texts (List[str]): The text of each new item, none to remove the source
+            vectors (List[List[float]]): The embedding of each new item
+            version (Optional[str]): A version of the source to remember, such as a file's modification time
+        """
+        self._write(kind, source, texts, vectors, replace=True, version=version)
+
+    def _write(self, kind: str, source: str, texts: List[str], vectors: List[List[float]], timestamp: Optional[str] = None,
+               replace: bool = False, version: Optional[str] = None) -> None:
+        """Append items in one transaction, first removing the other items of their source if replace is set."""
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32)) if texts else None
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        with self.lock:
+            first_row = self._row_count()
+            vectors_path = self._vectors_path()
+            if matrix is not None:
+                dimension = self.dimension
+                if dimension is None:
+                    self._set_meta("dimension", matrix.shape[1])
+                elif matrix.shape[1] != dimension:
+                    raise ValueError(f"Expected vectors of dimension {dimension}, got {matrix.shape[1]}")
+                # The vectors are written before their metadata, so a crash leaves extra rows that _recover truncates
+                with open(vectors_path, "ab") as f:
+                    f.write(matrix.tobytes())
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self.connection.execute("UPDATE items SET deleted = 1 WHERE kind = ? AND source = ?", (kind, source))
+                    key = f"source_version:{kind}:{source}"
+                    if version is not None and texts:
+                        self._set_meta(key, version)
+                    else:
+                        self.connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+                self.connection.executemany(
+                    "INSERT INTO items (row, kind, source, text, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [(first_row + i, kind, source, text, timestamp) for i, text in enumerate(texts)]
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                if matrix is not None:
+                    # Drop the vectors again, or later rows would be numbered out of line with the matrix
+                    with open(vectors_path, "r+b") as f:
+                        f.truncate(first_row * matrix.shape[1] * 4)
+                raise
+            finally:
+                self._invalidate()
+
+    def get_source_versions(self, kind: str) -> Dict[str, str]:
+        """Get the versions remembered by replace_source for the sources of a kind, keyed by source."""
+        prefix = f"source_version:{kind}:"
+        with self.lock:
+            rows = self.connection.execute("SELECT key, value FROM meta WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)).fetchall()
+        return {key[len(prefix):]: value for key, value in rows}
+
+    def _normalize(self, matrix: "np.ndarray") -> "np.ndarray":
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (matrix / norms).astype(np.float32)
+
+    def _invalidate(self) -> None:
+        self._matrix = None
+        self._live = None
+
+    def _load(self) -> tuple:
+        """Get the memory-mapped matrix and the kind of every live row, mapping them again after a write."""
+        with self.lock:
+            if self._matrix is None:
+                rows = self._row_count()
+                if rows == 0 or not os.path.exists(self._vectors_path()):
+                    self._matrix = np.zeros((0, self.dimension or 0), dtype=np.float32)
+                else:
+                    self._matrix = np.memmap(self._vectors_path(), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+                kinds = np.full(rows, "", dtype=object)
+                for row, kind in self.connection.execute("SELECT row, kind FROM items WHERE deleted = 0"):
+                    kinds[row] = kind
+                self._live = kinds
+            return self._matrix, self._live
+
+    def search(self, query_vectors: List[List[float]], k: int = 10, kind: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Find the items most similar to each query.
+
+        Args:
+            query_vectors (List[List[float]]): The embeddings of the queries
+            k (int): The number of items to return per query
+            kind (Optional[str]): Only return items of this kind
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, the best items first, with their text, kind, source, timestamp and score
+        """
+        queries = self._normalize(np.asarray(query_vectors, dtype=np.float32))
+        while True:
+            with self.lock:
+                matrix, kinds = self._load()
+                generation = self._get_meta("generation", "0")
+            if matrix.shape[0] == 0:
+                return [[] for _ in range(len(queries))]
+            best_scores, best_rows = self._search_matrix(matrix, kinds, queries, k, kind)
+            wanted = {int(row) for rows, scores in zip(best_rows, best_scores) for row, score in zip(rows, scores) if score != -np.inf}
+            with self.lock:
+                # A compaction renumbers the rows, so rows found in the previous generation are searched again
+                if self._get_meta("generation", "0") != generation:
+                    continue
+                items = self._fetch_items(sorted(wanted))
+            break
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.argsort(-scores)
+            results.append([{**items[int(rows[i])], "score": float(scores[i])} for i in order if scores[i] != -np.inf and int(rows[i]) in items])
+        return results
+
+    def _search_matrix(self, matrix: "np.ndarray", kinds: "np.ndarray", queries: "np.ndarray", k: int, kind: Optional[str]) -> tuple:
+        """Find the rows of the k best scores of every query, a block of the matrix at a time."""
+        mask = (kinds == kind) if kind else (kinds != "")
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, matrix.shape[0], self.block_rows):
+            block = np.asarray(matrix[start:start + self.block_rows])
+            scores = queries @ block.T
+            scores[:, ~mask[start:start + len(block)]] = -np.inf
+            # Keep the k best rows seen so far for every query
+            candidate_scores = np.concatenate([best_scores, scores], axis=1)
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), scores.shape)], axis=1)
+            keep = min(k, candidate_scores.shape[1])
+            top = np.argpartition(-candidate_scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(candidate_scores, top, axis=1)
+            best_rows = np.take_along_axis(candidate_rows, top, axis=1)
+        return best_scores, best_rows
+
+    def _fetch_items(self, rows: List[int]) -> Dict[int, Dict[str, Any]]:
+        items = {}
+        with self.lock:
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for row, kind, source, text, timestamp in self.connection.execute(
+                        f"SELECT row, kind, source, text, timestamp FROM items WHERE row IN ({placeholders})", batch):
+                    items[row] = {"kind": kind, "source": source, "text": text, "timestamp": timestamp}
+        return items
+
+    def compact_if_needed(self) -> bool:
+        """
+        Compact the matrix once the deleted rows exceed compact_ratio of it.
+
+        Returns:
+            bool: True if the matrix was compacted
+        """
+        with self.lock:
+            total = self._row_count()
+            deleted = self.connection.execute("SELECT COUNT(*) FROM items WHERE deleted = 1").fetchone()[0]
+            if total == 0 or deleted / total <= self.compact_ratio:
+                return False
+            self.compact()
+            return True
+
+    def compact(self) -> None:
+        """Rewrite the matrix and the item rows without the deleted items."""
+        with self.lock:
+            matrix, _ = self._load()
+            live = self.connection.execute("SELECT row, kind, source, text, timestamp FROM items WHERE deleted = 0 ORDER BY row").fetchall()
+            old_path = self._vectors_path()
+            generation = int(self._get_meta("generation", "0")) + 1
+            new_path = os.path.join(self.directory, f"vectors.{generation}.f32")
+            live_rows = np.array([item[0] for item in live], dtype=np.int64)
+            with open(new_path, "wb") as f:
+                for start in range(0, len(live_rows), self.block_rows):
+                    f.write(np.asarray(matrix[live_rows[start:start + self.block_rows]]).tobytes())
+            self._matrix = None
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("DELETE FROM items")
+                self.connection.executemany("INSERT INTO items (row, kind, source, text, timestamp) VALUES (?, ?, ?, ?, ?)",
+                                            [(i, *item[1:]) for i, item in enumerate(live)])
+                self._set_meta("generation", generation)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                os.remove(new_path)
+                raise
+            self._invalidate()
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the size of the index.
+
+        Returns:
+            Dict[str, Any]: The number of rows, deleted rows and the vector dimension
+        """
+        with self.lock:
+            return {
+                "rows": self._row_count(),
+                "deleted": self.connection.execute("SELECT COUNT(*) FROM items WHERE deleted = 1").fetchone()[0],
+                "dimension": self.dimension
+            }
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_vector_index(config_manager, persona: str) -> VectorIndex:
+    """
+    Get the shared vector index of a user's persona.
+
+    Args:
+        config_manager (LocalConfigManager): The user's config manager
+        persona (str): The persona whose memories are indexed
+
+    Returns:
+        VectorIndex: The index
+    """
+    directory = config_manager.get_path(os.path.join("vectors", persona))
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = VectorIndex(directory, Config().get_embeddings_config().get("compact_ratio", 0.25))
+            _indexes[directory] = index
+    return index
+
+def chunk_text(text: str, max_chars: int = 1000) -> List[str]:
+    """
+    Split text into chunks of whole paragraphs of up to max_chars characters, for embedding.
+
+    Args:
+        text (str): The text to split
+        max_chars (int): The maximum length of a chunk, unless a single paragraph is longer
+
+    Returns:
+        List[str]: The chunks
+    """
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+def index_notes(vector_index: VectorIndex, notes_manager, embedder: Embedder) -> int:
+    """
+    Bring the note chunks in an index up to date with a user's notes.
+
+    Only notes whose modification time changed since they were last indexed are embedded again,
+    and the chunks of deleted notes are removed.
+
+    Args:
+        vector_index (VectorIndex): The index to update
+        notes_manager (NotesManager): The user's notes
+        embedder (Embedder): The embedder for the note chunks
+
+    Returns:
+        int: The number of notes embedded again
+    """
+    indexed = vector_index.get_source_versions("note")
+    embedded = 0
+    current = set()
+    for note_name in notes_manager.get_all_notes():
+        current.add(note_name)
+        try:
+            version = str(os.stat(os.path.join(notes_manager.notes_directory, note_name)).st_mtime_ns)
+        except OSError:
+            continue
+        if indexed.get(note_name) == version:
+            continue
+        chunks = chunk_text(notes_manager.get_note(note_name) or "")
+        vector_index.replace_source("note", note_name, chunks, embedder.embed(chunks) if chunks else [], version)
+        embedded += 1
+    for note_name in indexed.keys() - current:
+        vector_index.replace_source("note", note_name, [], [])
+    return embedded
@@ -12,7 +12,7 @@ class LogAction(IAction):
     def getTools(self) -> List[tuple]:
         return [
             (self.logIndex, "log_index", "Logs a list of index terms related to the query and the response for later referece with search_conversation_logs.", {"terms": "<comma separated list of index terms>"}),
-            (self.searchConversationLogs, "search_conversation_logs", "Searches past conversation logs for search terms related to the query and the response. Use this tool to find information from past conversations. Provide multiple terms to search for to expand the search. Terms should be a comma seperate list of general terms (usually one word terms).", {"terms": "<comma separated list of search terms>"}),
+            (self.searchConversationLogs, "search_conversation_logs", "Searches past conversation logs for search terms related to the query and the response. Use this tool to find information from past conversations. Provide multiple terms to search for to expand the search. Terms should be a comma seperate list of general terms (usually one word terms). Results are ranked by relevance and recency. Set match to all to only find conversations containing every term.", {"terms": "<comma separated list of search terms>", "match": "<any or all, defaults to any>"}),
             (self.getPastConversations, "get_past_conversations", "Searches past conversation logs. Use this tool to find information from past conversations. It takes a single argument for the number of days to worth of conversation to gather. Only use this tool if you cannot answer the query using the searchConversationLogs tool.", {"days": "<number of days to gather>"})
         ]
     
@@ -35,23 +35,18 @@ Answer the query using the context provided above.
         logManager = self.config_manager.get_log_manager()
         terms = arguments.get("terms", "").split(",")
         yield ("system", "Logging terms: " + arguments.get("terms", ""))
-        for term in terms:
-            logManager.log_index_item(term, "[USER] " + self.query.replace("\n", "\\n"), self.persona)
-            logManager.log_index_item(term, "[ASSISTANT] " + self.conversation_history[-1]["content"].replace("\n", "\\n"), self.persona)
+        logManager.index_messages(self.persona, [("user", self.query), ("assistant", self.conversation_history[-1]["content"])], terms)
         yield ("end", "")
 
-    def searchIndex(self, terms):
+    def searchIndex(self, terms, mode="or"):
         logManager = self.config_manager.get_log_manager()
-        results = []
-        for term in terms:
-            for result in logManager.search_log_item(self.persona, term):
-                results.append(result)
-        return results
+        return logManager.search_index(self.persona, terms, mode)
 
     def searchConversationLogs(self, arguments: Dict[str, Any]):
         yield ("system", "Searching logs for " + arguments["terms"])
         terms = arguments["terms"].split(",")
-        results = self.searchIndex(terms)
+        mode = "and" if arguments.get("match") == "all" else "or"
+        results = self.searchIndex(terms, mode)
         if not results:
             yield ("result", self.context_template(self.query, "No results found in logs, do not search logs for this query."))
         else:
@@ -6,6 +6,8 @@ from datetime import datetime
 from content_extractor import download_and_extract_content, download_and_extract_links, download_and_extract_rss
 from NotesManager import NotesManager
 from LocalConfigManager import LocalConfigManager
+from config import Config
+from prompt_builder import create_prompt_builder, chunk_by_tokens, estimate_tokens
 
 def context_template(message: str, context: str, extracted_url: str) -> str:
     now = datetime.now()
@@ -53,18 +55,14 @@ def link_agent(query: str, conversation_history: list[dict], arguments: list[str
     extract_urls = get_urls(" ".join(arguments))
     links = "\n".join([download_and_extract_links(url) for url in extract_urls])
     pages = [x[0] for x in [download_and_extract_content(url) for url in extract_urls] if x[2] == 200]
-    chunked_pages = []
-    for page in pages:
-        words = page.split()
-        for i in range(0, len(words), 1000):
-            chunk = ' '.join(words[i:i+1000])
-            chunked_pages.append(chunk)
-    pages = chunked_pages
+    # Each chunk and its summary must fit in the summarizer's context window alongside the prompt
+    chunk_tokens = create_prompt_builder(Config().get_prompt_budget("summer")).available // 4
+    pages = [chunk for page in pages for chunk in chunk_by_tokens(page, chunk_tokens)]
     summaries = []
     source = " ".join(extract_urls)
     yield("message", "Extracting information from " + str(len(pages)) + " pages")
     for r in pages:
-        if sum([len(x.split()) for x in summaries]) > 1500:
+        if sum([estimate_tokens(x) for x in summaries]) > chunk_tokens * 3 // 2:
             report = ask_agent("summer", 
                                "Here is context: \n\n" + summary + f"\n\nBuild a comprehensive report based on the given context and the query '{query}'.",
                                should_cache=True)
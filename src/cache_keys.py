@@ -0,0 +1,76 @@
+"""
+Cache keys - Builds compact, normalized cache keys for LLM requests.
+
+Keys are a SHA-256 digest of the model, temperature and messages, so they have a fixed size no
+matter how long the prompt is. Message contents go through a configurable normalization pipeline
+first, so that prompts differing only in ways that don't matter (such as whitespace in a
+re-fetched page) map to the same key.
+"""
+
+import hashlib
+import json
+import re
+from typing import Callable, Dict, List, Optional
+
+def collapse_whitespace(text: str) -> str:
+    """Replace every run of whitespace with a single space."""
+    return re.sub(r"\s+", " ", text)
+
+def strip(text: str) -> str:
+    """Remove leading and trailing whitespace."""
+    return text.strip()
+
+def lowercase(text: str) -> str:
+    """Lowercase the text."""
+    return text.lower()
+
+def strip_current_time(text: str) -> str:
+    """Remove the current time line that Config.get_system_content appends to every system prompt."""
+    return re.sub(r"^- the users current time and date is .*$", "", text, flags=re.MULTILINE)
+
+NORMALIZERS: Dict[str, Callable[[str], str]] = {
+    "collapse_whitespace": collapse_whitespace,
+    "strip": strip,
+    "lowercase": lowercase,
+    "strip_current_time": strip_current_time,
+}
+
+DEFAULT_NORMALIZERS = ["strip_current_time", "collapse_whitespace", "strip"]
+
+def normalize_text(text: str, normalizers: Optional[List[str]] = None) -> str:
+    """
+    Run text through a normalization pipeline.
+
+    Args:
+        text (str): The text to normalize
+        normalizers (Optional[List[str]]): The names of the normalizers to apply in order, DEFAULT_NORMALIZERS if None
+
+    Returns:
+        str: The normalized text
+    """
+    for name in DEFAULT_NORMALIZERS if normalizers is None else normalizers:
+        if name not in NORMALIZERS:
+            raise ValueError(f"Unknown cache key normalizer: {name}")
+        text = NORMALIZERS[name](text)
+    return text
+
+def make_cache_key(model: str, temperature: float, messages: List[dict], normalizers: Optional[List[str]] = None) -> str:
+    """
+    Build the cache key for an LLM request.
+
+    Args:
+        model (str): The model the request is sent to
+        temperature (float): The sampling temperature
+        messages (List[dict]): The request messages, including the system message
+        normalizers (Optional[List[str]]): The names of the normalizers to apply to each message's content
+
+    Returns:
+        str: A fixed-size key of the form llm_response_<sha256 hex digest>
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [[message.get("role"), normalize_text(message.get("content") or "", normalizers)] for message in messages]
+    }
+    digest = hashlib.sha256(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"llm_response_{digest}"
@@ -1,173 +1,480 @@
 import os
 import json
 import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
 from typing import Any, Optional, Union, Dict
 import hashlib
 import time
 from LocalConfigManager import LocalConfigManager
+from config import Config
+
+class MemoryCache:
+    """
+    A thread-safe in-process LRU cache bounded by both entry count and total size.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_entries: The maximum number of entries to keep.
+            max_bytes: The maximum total size in bytes of the entries to keep.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> tuple:
+        """
+        Get an entry from the memory cache.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            A tuple of (found, value).
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() > entry[1]:
+                if entry is not None:
+                    self._remove(key)
+                self.stats["misses"] += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, entry[0]
+
+    def set(self, key: str, value: Any, expiration_time: float, size: int) -> None:
+        """
+        Store an entry, evicting the least recently used entries to stay within budget.
+
+        Args:
+            key: The cache key.
+            value: The value to store.
+            expiration_time: The time at which the entry expires.
+            size: The size of the entry in bytes.
+        """
+        with self.lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, expiration_time, size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+
+    def delete(self, key: str) -> None:
+        """Remove an entry from the memory cache."""
+        with self.lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all entries from the memory cache."""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry. Must be called with the lock held."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the hit, miss and eviction counts along with the current usage."""
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "bytes": self.total_bytes}
 
 class CacheManager:
     """
-    A class to manage a cache directory with get and set methods.
+    A class to manage a cache stored in a single indexed SQLite database with get and set methods.
+
+    Reads are served from an optional in-process LRU tier before falling back to the database,
+    which evicts its least recently used entries once it grows past max_disk_bytes. Hits on the
+    memory tier are recorded in the database in batches, so the entries read most stay the most
+    recently used ones on disk as well.
     """
-    
-    def __init__(self, config_manager: Optional[LocalConfigManager] = None, default_expiration: int = 600):
+
+    def __init__(self, config_manager: Optional[LocalConfigManager] = None, default_expiration: int = 600, purge_batch_size: int = 500,
+                 memory_cache: Optional[MemoryCache] = None, max_disk_bytes: Optional[int] = None, touch_interval: float = 30):
         """
         Initialize the cache manager with the specified LocalConfigManager.
-        
+
         Args:
             config_manager: The LocalConfigManager instance to use for path management.
                            If None, a new instance will be created with "default" as the user ID.
             default_expiration: Default expiration time in seconds (default: 600 seconds / 10 minutes)
+            purge_batch_size: The number of entries deleted per statement when purging or evicting
+            memory_cache: An optional in-process tier checked before the database
+            max_disk_bytes: The maximum total size of the database entries, or None for no limit
+            touch_interval: The longest time in seconds memory tier hits wait before their access time is written to the database
         """
         if config_manager is None:
             config_manager = LocalConfigManager("default")
-            
+
         self.config_manager = config_manager
         self.cache_dir = self.config_manager.get_path("cache")
         self.default_expiration = default_expiration
+        self.purge_batch_size = purge_batch_size
+        self.memory_cache = memory_cache
+        self.max_disk_bytes = max_disk_bytes
+        self.touch_interval = touch_interval
+        self.disk_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.db_path = os.path.join(self.cache_dir, "cache.db")
         self.manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self._stats_lock = threading.Lock()
+        self._touch_lock = threading.Lock()
+        self._pending_touches: Dict[str, float] = {}
+        self._last_touch_flush = time.time()
+        self._local = threading.local()
         self._ensure_cache_dir_exists()
-        self._load_manifest()
-    
+        self._create_tables()
+        self._migrate_legacy_cache()
+
     def _ensure_cache_dir_exists(self) -> None:
         """Ensure the cache directory exists, creating it if necessary."""
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir, exist_ok=True)
-    
-    def _load_manifest(self) -> None:
-        """Load the cache manifest from disk or create a new one if it doesn't exist."""
-        if os.path.exists(self.manifest_path):
-            try:
-                with open(self.manifest_path, 'r') as f:
-                    self.manifest = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                self.manifest = {}
-        else:
-            self.manifest = {}
-    
-    def _save_manifest(self) -> None:
-        """Save the cache manifest to disk."""
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection for the current thread, opening it on first use.
+
+        Returns:
+            The connection, in autocommit mode with write-ahead logging enabled.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _create_tables(self) -> None:
+        """Create the cache tables, indexes and size-tracking triggers if they don't exist."""
+        connection = self._get_connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expiration_time REAL NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL DEFAULT 0
+            )
+        """)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(cache)")]
+        if "last_access" not in columns:
+            connection.execute("ALTER TABLE cache ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_expiration ON cache (expiration_time)")
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        # Keep a running total of the stored bytes so the size budget can be checked in O(1)
+        connection.execute("CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)")
+        connection.execute("INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM cache")
+        connection.execute("""
+            CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache
+            BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END
+        """)
+        connection.execute("""
+            CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache
+            BEGIN UPDATE cache_size SET total = total + NEW.size - OLD.size WHERE id = 0; END
+        """)
+        connection.execute("""
+            CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache
+            BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END
+        """)
+
+    def _migrate_legacy_cache(self) -> None:
+        """Import the entries of the old per-key .cache files and manifest.json, then remove them."""
+        if not os.path.exists(self.manifest_path):
+            return
         try:
-            with open(self.manifest_path, 'w') as f:
-                json.dump(self.manifest, f)
-        except IOError as e:
-            print(f"Error saving manifest: {e}")
-    
-    def _get_cache_path(self, key: str) -> str:
-        """
-        Get the path to the cache file for the given key.
-        
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            manifest = {}
+
+        current_time = time.time()
+        rows = []
+        for key, info in manifest.items():
+            expiration_time = info.get('expiration_time', 0)
+            cache_path = self._get_legacy_cache_path(key)
+            if current_time > expiration_time or not os.path.exists(cache_path):
+                continue
+            try:
+                # The legacy files are already pickled so they can be stored as is
+                with open(cache_path, 'rb') as f:
+                    value = f.read()
+            except IOError:
+                continue
+            rows.append((key, value, expiration_time, len(value)))
+
+        connection = self._get_connection()
+        connection.executemany("INSERT OR IGNORE INTO cache (key, value, expiration_time, size) VALUES (?, ?, ?, ?)", rows)
+        print(f"Migrated {len(rows)} legacy cache entries")
+
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.cache') or filename == "manifest.json":
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                except OSError:
+                    pass
+
+    def _get_legacy_cache_path(self, key: str) -> str:
+        """
+        Get the path to the legacy cache file for the given key.
+
         Args:
             key: The cache key.
-            
+
         Returns:
             The path to the cache file.
         """
-        # Hash the key to create a safe filename
         safe_key = hashlib.md5(key.encode()).hexdigest()
         return os.path.join(self.cache_dir, f"{safe_key}.cache")
-    
+
     def get(self, key: str, default: Any = None) -> Any:
         """
         Get data from the cache.
-        
+
         Args:
             key: The cache key.
             default: The default value to return if the key is not found.
-            
+
         Returns:
             The cached data or the default value if not found.
         """
-        cache_path = self._get_cache_path(key)
-        
-        # Check if the key exists in the manifest and is not expired
-        if key in self.manifest:
-            expiration_time = self.manifest[key].get('expiration_time', 0)
-            if time.time() > expiration_time:
-                # Cache item has expired, delete it
-                self.delete(key)
-                return default
-        
-        if not os.path.exists(cache_path):
+        if self.memory_cache is not None:
+            found, value = self.memory_cache.get(key)
+            if found:
+                self._touch(key)
+                return value
+
+        connection = self._get_connection()
+        row = connection.execute("SELECT value, expiration_time FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count_disk("misses")
             return default
-        
+
+        blob, expiration_time = row
+        current_time = time.time()
+        if current_time > expiration_time:
+            # Cache item has expired, delete it
+            self.delete(key)
+            self._count_disk("misses")
+            return default
+
         try:
-            with open(cache_path, 'rb') as f:
-                return pickle.load(f)
-        except (pickle.PickleError, EOFError, FileNotFoundError):
+            value = pickle.loads(blob)
+        except (pickle.PickleError, EOFError):
             # If there's an error reading the cache, return the default
+            self._count_disk("misses")
             return default
-    
+
+        self._count_disk("hits")
+        connection.execute("UPDATE cache SET last_access = ? WHERE key = ?", (current_time, key))
+        if self.memory_cache is not None:
+            self.memory_cache.set(key, value, expiration_time, len(blob))
+        return value
+
     def set(self, key: str, data: Any, expiration: Optional[int] = None) -> None:
         """
         Store data in the cache.
-        
+
         Args:
             key: The cache key.
             data: The data to store.
             expiration: Optional expiration time in seconds. If None, uses default_expiration.
         """
-        cache_path = self._get_cache_path(key)
-        
         try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(data, f)
-            
-            # Update manifest with expiration time
-            expiration_time = time.time() + (expiration if expiration is not None else self.default_expiration)
-            self.manifest[key] = {
-                'expiration_time': expiration_time,
-                'cache_path': cache_path
-            }
-            self._save_manifest()
-        except (pickle.PickleError, IOError) as e:
+            value = pickle.dumps(data)
+            current_time = time.time()
+            expiration_time = current_time + (expiration if expiration is not None else self.default_expiration)
+            self._get_connection().execute("""
+                INSERT INTO cache (key, value, expiration_time, size, last_access) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value, expiration_time = excluded.expiration_time,
+                    size = excluded.size, last_access = excluded.last_access
+            """, (key, value, expiration_time, len(value), current_time))
+            if self.memory_cache is not None:
+                self.memory_cache.set(key, data, expiration_time, len(value))
+            self._evict_over_budget()
+        except (pickle.PickleError, sqlite3.Error) as e:
             print(f"Error writing to cache: {e}")
-    
+
+    def _touch(self, key: str) -> None:
+        """
+        Record a memory tier hit, writing the pending access times once a batch fills up or touch_interval has passed.
+
+        Args:
+            key: The cache key.
+        """
+        current_time = time.time()
+        with self._touch_lock:
+            self._pending_touches[key] = current_time
+            if len(self._pending_touches) < self.purge_batch_size and current_time - self._last_touch_flush < self.touch_interval:
+                return
+        self._flush_touches()
+
+    def _flush_touches(self) -> None:
+        """Write the access times of the memory tier hits to the database."""
+        with self._touch_lock:
+            touches = self._pending_touches
+            self._pending_touches = {}
+            self._last_touch_flush = time.time()
+        if not touches:
+            return
+        connection = self._get_connection()
+        try:
+            connection.execute("BEGIN")
+            # MAX keeps a newer access time written by a disk hit in the meantime
+            connection.executemany("UPDATE cache SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                   [(access_time, key) for key, access_time in touches.items()])
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Error writing cache access times: {e}")
+
+    def _get_disk_bytes(self) -> int:
+        """Get the total size of the entries stored in the database."""
+        return self._get_connection().execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict_over_budget(self) -> None:
+        """Delete the least recently used database entries until the total size is within max_disk_bytes."""
+        if self.max_disk_bytes is None:
+            return
+        # Write the pending memory tier hits first so they count towards the recency order
+        self._flush_touches()
+        connection = self._get_connection()
+        while self._get_disk_bytes() > self.max_disk_bytes:
+            rows = connection.execute("SELECT key, size FROM cache ORDER BY last_access LIMIT ?", (self.purge_batch_size,)).fetchall()
+            if not rows:
+                return
+            excess = self._get_disk_bytes() - self.max_disk_bytes
+            deleted = False
+            for key, size in rows:
+                if excess <= 0:
+                    return
+                if self.delete(key):
+                    self._count_disk("evictions")
+                    excess -= size
+                    deleted = True
+            if not deleted:
+                # The deletes are failing, retrying them would select the same rows forever
+                print("Error evicting cache entries, the cache stays over its size budget")
+                return
+
+    def _count_disk(self, name: str) -> None:
+        with self._stats_lock:
+            self.disk_stats[name] += 1
+
     def delete(self, key: str) -> bool:
         """
         Delete a cache entry.
-        
+
         Args:
             key: The cache key.
-            
+
         Returns:
             True if the key was deleted, False otherwise.
         """
-        cache_path = self._get_cache_path(key)
-        
-        if os.path.exists(cache_path):
-            try:
-                os.remove(cache_path)
-                if key in self.manifest:
-                    del self.manifest[key]
-                    self._save_manifest()
-                return True
-            except OSError:
-                return False
-        
-        return False
-    
+        if self.memory_cache is not None:
+            self.memory_cache.delete(key)
+        try:
+            cursor = self._get_connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+            return cursor.rowcount > 0
+        except sqlite3.Error:
+            return False
+
     def clear(self) -> None:
         """Clear all cache entries."""
-        for filename in os.listdir(self.cache_dir):
-            if filename.endswith('.cache'):
-                try:
-                    os.remove(os.path.join(self.cache_dir, filename))
-                except OSError:
-                    pass
-        
-        # Clear the manifest
-        self.manifest = {}
-        self._save_manifest()
-    
-    def delete_expired(self) -> None:
-        """Delete all expired cache entries."""
+        if self.memory_cache is not None:
+            self.memory_cache.clear()
+        self._get_connection().execute("DELETE FROM cache")
+
+    def delete_expired(self) -> int:
+        """
+        Delete all expired cache entries in batches.
+
+        Returns:
+            The number of entries deleted.
+        """
+        connection = self._get_connection()
         current_time = time.time()
-        expired_keys = [
-            key for key, info in self.manifest.items()
-            if current_time > info.get('expiration_time', 0)
-        ]
-        
-        for key in expired_keys:
-            self.delete(key) 
\ No newline at end of file
+        deleted = 0
+        while True:
+            cursor = connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache WHERE expiration_time < ? LIMIT ?)",
+                (current_time, self.purge_batch_size)
+            )
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.purge_batch_size:
+                return deleted
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the hit, miss and eviction counts of each cache tier.
+
+        Returns:
+            A dict with "memory" and "disk" stats.
+        """
+        with self._stats_lock:
+            disk_stats = dict(self.disk_stats)
+        disk_stats["entries"] = self._get_connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        disk_stats["bytes"] = self._get_disk_bytes()
+        return {
+            "memory": self.memory_cache.get_stats() if self.memory_cache is not None else {},
+            "disk": disk_stats
+        }
+
+_shared_cache_manager: Optional[CacheManager] = None
+_shared_cache_lock = threading.Lock()
+
+def get_cache_manager() -> CacheManager:
+    """
+    Get the process-wide CacheManager for the default cache, configured from the "cache" section of the config.
+
+    Returns:
+        The shared CacheManager instance.
+    """
+    global _shared_cache_manager
+    if _shared_cache_manager is None:
+        with _shared_cache_lock:
+            if _shared_cache_manager is None:
+                cache_config = Config().get_cache_config()
+                memory_cache = MemoryCache(cache_config.get("memory_max_entries", 512), cache_config.get("memory_max_bytes", 16 * 1024 * 1024))
+                _shared_cache_manager = CacheManager(memory_cache=memory_cache, max_disk_bytes=cache_config.get("disk_max_bytes"))
+    return _shared_cache_manager
+
+def start_cache_sweeper(interval: float = 600.0, cache_manager: Optional[CacheManager] = None) -> threading.Thread:
+    """
+    Start a background thread that deletes expired entries from the cache database, so entries that are never read again don't stay on disk.
+
+    Args:
+        interval: The number of seconds between sweeps.
+        cache_manager: The cache to sweep, or None for the shared one.
+
+    Returns:
+        The sweeper thread.
+    """
+    def sweep():
+        cache = cache_manager if cache_manager is not None else get_cache_manager()
+        while True:
+            try:
+                deleted = cache.delete_expired()
+                if deleted:
+                    print(f"Deleted {deleted} expired cache entries")
+            except Exception as e:
+                print(f"Error in cache sweeper: {e}")
+            time.sleep(interval)
+    thread = threading.Thread(target=sweep, name="cache-sweeper", daemon=True)
+    thread.start()
+    return thread
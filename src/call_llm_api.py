@@ -4,8 +4,9 @@ from typing import Any
 import socket
 from config import Config
 from datetime import datetime
-from cache_manager import CacheManager
-from openai import OpenAI
+from cache_manager import get_cache_manager
+from cache_keys import make_cache_key
+from client_pool import get_client_pool
 from LocalConfigManager import LocalConfigManager
 
 def context_template(message: str, context: str, extracted_url: str) -> str:
@@ -36,6 +37,7 @@ def ask_agent(persona: str,
     headers = persona_override.get("headers", config.get_headers())
     api_key = persona_override.get("api_key", config.get_ollama_api_key(persona))
     script = persona_override.get("script", config.get_prompt_script(persona))
+    connector = config.get_connector(persona)
     if script:
         with open("src/prompt_scripts/" + script, "r") as f:
             script_content = f.read()
@@ -54,14 +56,16 @@ def ask_agent(persona: str,
     }
 
     if not stream and should_cache:
-        cache = CacheManager()
-        cache_key = f"llm_response_{persona}_{query}"
+        cache = get_cache_manager()
+        cache_key = make_cache_key(model, api_data["temperature"], messages, config.get_cache_config().get("key_normalizers"))
         cached_response = cache.get(cache_key)
         if cached_response:
             return cached_response
 
     try:
-        response = call_llm_with_openai(api_data, url, headers, api_key)
+        response = call_llm_with_openai(api_data, url, headers, api_key,
+                                        max_connections=connector.get("max_connections"),
+                                        idle_timeout=connector.get("idle_timeout"))
     except Exception as e:
         print("Error calling LLM API: ", e)
         return "An error occurred while calling the LLM API: " + str(e)
@@ -74,10 +78,10 @@ def ask_agent(persona: str,
             cache.set(cache_key, result)
         return result
 
-def call_llm_with_openai(data: dict, url: str, headers: dict, api_key = None) -> Any:
+def call_llm_with_openai(data: dict, url: str, headers: dict, api_key = None, max_connections: int = None, idle_timeout: float = None) -> Any:
     print("Calling LLM API with (Using OpenAI): ", url, headers)
     api_key = api_key or "lm-studio"
-    client = OpenAI(api_key=api_key, base_url=url)
+    client = get_client_pool().get_client(url, api_key, max_connections, idle_timeout)
     return client.chat.completions.create(  
         model=data["model"],
         messages=data["messages"],
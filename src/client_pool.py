@@ -0,0 +1,195 @@
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+import httpx
+from openai import OpenAI
+
+def _environment_proxy(base_url: str) -> Optional[str]:
+    """
+    Get the proxy the environment sets for a URL, as httpx would for a client without a custom transport.
+
+    Args:
+        base_url (str): The URL the client talks to
+
+    Returns:
+        Optional[str]: The proxy URL, or None if there is none or the host is listed in NO_PROXY
+    """
+    url = httpx.URL(base_url)
+    if urllib.request.proxy_bypass(url.host):
+        return None
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get(url.scheme) or proxies.get("all")
+    if proxy and "://" not in proxy:
+        proxy = f"http://{proxy}"
+    return proxy
+
+class _TrackedStream(httpx.SyncByteStream):
+    """A response body that releases its client's checkout once it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            release, self.release = self.release, None
+            if release:
+                release()
+
+class _TrackedTransport(httpx.BaseTransport):
+    """A transport that counts the requests of a pooled client from when they are sent until their body is closed."""
+
+    def __init__(self, transport: httpx.BaseTransport, pool: "ClientPool", entry: dict):
+        self.transport = transport
+        self.pool = pool
+        self.entry = entry
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.pool._checkout(self.entry)
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self.pool._release(self.entry)
+            raise
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_TrackedStream(response.stream, lambda: self.pool._release(self.entry)),
+                              extensions=response.extensions)
+
+    def close(self) -> None:
+        self.transport.close()
+
+class ClientPool:
+    """
+    A process-wide registry of OpenAI clients keyed by (base_url, api_key).
+
+    Each client owns a keep-alive connection pool, so repeated calls to the same
+    connector reuse their TCP connections and TLS sessions instead of opening new ones.
+    A client is only closed for being idle once none of its requests is in flight, which
+    for a streamed completion lasts until the stream is read to the end or closed.
+    """
+
+    def __init__(self, default_max_connections: int = 10, default_idle_timeout: float = 300.0):
+        """
+        Initialize the client pool.
+
+        Args:
+            default_max_connections (int): Connection limit for connectors that don't set max_connections
+            default_idle_timeout (float): Seconds a client may sit unused before it is closed
+        """
+        self.default_max_connections = default_max_connections
+        self.default_idle_timeout = default_idle_timeout
+        self.clients: Dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            "clients_opened": 0,
+            "clients_reused": 0,
+            "clients_evicted": 0,
+            "connections_opened": 0,
+            "connections_reused": 0
+        }
+
+    def get_client(self, base_url: str, api_key: str, max_connections: Optional[int] = None, idle_timeout: Optional[float] = None) -> OpenAI:
+        """
+        Get the shared client for a connector, creating it on first use.
+
+        Args:
+            base_url (str): The base URL of the OpenAI compatible API
+            api_key (str): The API key to authenticate with
+            max_connections (Optional[int]): The maximum number of connections to keep for this connector
+            idle_timeout (Optional[float]): Seconds before an unused client or connection is closed
+
+        Returns:
+            OpenAI: The pooled client
+        """
+        key = (base_url, api_key)
+        now = time.monotonic()
+        with self.lock:
+            self._evict_idle(now)
+            entry = self.clients.get(key)
+            if entry:
+                entry["last_used"] = now
+                self.stats["clients_reused"] += 1
+                return entry["client"]
+            idle_timeout = idle_timeout or self.default_idle_timeout
+            entry = {"last_used": now, "idle_timeout": idle_timeout, "in_use": 0}
+            entry["http_client"] = self._create_http_client(entry, base_url, max_connections or self.default_max_connections, idle_timeout)
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=entry["http_client"])
+            entry["client"] = client
+            self.clients[key] = entry
+            self.stats["clients_opened"] += 1
+            return client
+
+    def _create_http_client(self, entry: dict, base_url: str, max_connections: int, idle_timeout: float) -> httpx.Client:
+        """
+        Create an HTTP client with a bounded keep-alive pool that reports connection reuse and requests in flight.
+
+        httpx ignores the proxy environment variables once a transport is passed in, so the proxy
+        for base_url is looked up here and given to the transport. The timeouts and redirects match
+        the OpenAI client's defaults.
+        """
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=idle_timeout)
+        transport = _TrackedTransport(httpx.HTTPTransport(limits=limits, proxy=_environment_proxy(base_url)), self, entry)
+        return httpx.Client(transport=transport, timeout=httpx.Timeout(600.0, connect=5.0), follow_redirects=True,
+                            event_hooks={"request": [self._trace_connections]})
+
+    def _checkout(self, entry: dict) -> None:
+        """Count a request of a client as in flight."""
+        with self.lock:
+            entry["in_use"] += 1
+            entry["last_used"] = time.monotonic()
+
+    def _release(self, entry: dict) -> None:
+        """Count a request of a client as finished, which restarts its idle timeout."""
+        with self.lock:
+            entry["in_use"] -= 1
+            entry["last_used"] = time.monotonic()
+
+    def _trace_connections(self, request: httpx.Request) -> None:
+        """Attach an httpcore trace callback that counts new and reused connections for a request."""
+        state = {"connected": False}
+
+        def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                state["connected"] = True
+                self._count("connections_opened")
+            elif event_name.endswith(".send_request_headers.started") and not state["connected"]:
+                self._count("connections_reused")
+
+        request.extensions["trace"] = trace
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+    def _evict_idle(self, now: float) -> None:
+        """Close clients that have no requests in flight and have not been used within their idle timeout. Must be called with the lock held."""
+        for key, entry in list(self.clients.items()):
+            if entry["in_use"] == 0 and now - entry["last_used"] > entry["idle_timeout"]:
+                del self.clients[key]
+                self.stats["clients_evicted"] += 1
+                try:
+                    entry["client"].close()
+                except Exception as e:
+                    print(f"Error closing idle client for {key[0]}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the pool counters.
+
+        Returns:
+            Dict[str, Any]: Counts of clients and connections opened, reused and evicted
+        """
+        with self.lock:
+            return {**self.stats, "open_clients": len(self.clients)}
+
+_client_pool = ClientPool()
+
+def get_client_pool() -> ClientPool:
+    """Get the process-wide client pool."""
+    return _client_pool
@@ -6,42 +6,113 @@ Config - A module for managing configuration settings for the Leah script.
 
 import os
 import json
-from typing import Dict, Any
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
 from copy import deepcopy
 from datetime import datetime
 
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+USER_CONFIG_PATH = os.path.join(os.path.expanduser("~"), '.leah/config.json')
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class ConfigSnapshot:
+    """An immutable, pre-merged view of config.json and the user config with every persona resolved."""
+
+    def __init__(self, config: Dict[str, Any], mtimes: tuple):
+        """
+        Resolve the personas of a merged configuration and freeze the result.
+
+        Args:
+            config (Dict[str, Any]): The merged configuration
+            mtimes (tuple): The modification times of the files the configuration was loaded from
+        """
+        self.mtimes = mtimes
+        default_persona = config['personas']['default']
+        personas = {}
+        for persona, persona_config in config['personas'].items():
+            # Every persona inherits the settings it doesn't override from the default persona
+            personas[persona] = {**default_persona, **persona_config}
+        self.config = _freeze(config)
+        self.personas = _freeze(personas)
+
+    def get_persona_config(self, persona: str) -> Mapping[str, Any]:
+        """Get the resolved configuration for a persona, falling back to the default persona."""
+        return self.personas.get(persona) or self.personas['default']
+
 class Config:
     """Configuration management class for the Leah script."""
+
+    # How often, in seconds, the config files are checked for changes
+    reload_check_interval = 1.0
+    _snapshot: Optional[ConfigSnapshot] = None
+    _last_check = 0.0
+    _lock = threading.Lock()
     
     def __init__(self):
-        """Initialize the configuration by loading from config.json."""
-        self.config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
-        self.config = self._load_config()
+        """Initialize the configuration from the shared snapshot, reloading it if the config files changed."""
+        self.config_path = CONFIG_PATH
+        self.snapshot = self._get_snapshot()
+        self.config = self.snapshot.config
+
+    @classmethod
+    def _get_snapshot(cls) -> ConfigSnapshot:
+        """Get the shared config snapshot, reloading it when config.json or the user config has changed."""
+        snapshot = cls._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - cls._last_check < cls.reload_check_interval:
+            return snapshot
+        with cls._lock:
+            if cls._snapshot is not None and now - cls._last_check < cls.reload_check_interval:
+                return cls._snapshot
+            mtimes = cls._get_mtimes()
+            if cls._snapshot is None or cls._snapshot.mtimes != mtimes:
+                cls._snapshot = ConfigSnapshot(cls._load_config(), mtimes)
+            cls._last_check = now
+            return cls._snapshot
+
+    @staticmethod
+    def _get_mtimes() -> tuple:
+        """Get the modification times of config.json and the user config, None for a missing file."""
+        mtimes = []
+        for path in (CONFIG_PATH, USER_CONFIG_PATH):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
     
-    def _load_config(self) -> Dict[str, Any]:
-        """Load configuration from config.json and merge with .hey.config.json if it exists."""
+    @classmethod
+    def _load_config(cls) -> Dict[str, Any]:
+        """Load configuration from config.json and merge with ~/.leah/config.json if it exists."""
         # Load the main config file
-        with open(self.config_path, 'r') as f:
+        with open(CONFIG_PATH, 'r') as f:
             config = json.load(f)
         
         # Check for user config in home directory
-        home_dir = os.path.expanduser("~")
-        user_config_path = os.path.join(home_dir, '.leah/config.json')
-        
-        if os.path.exists(user_config_path):
+        if os.path.exists(USER_CONFIG_PATH):
             print("User config found")
             try:
-                with open(user_config_path, 'r') as f:
+                with open(USER_CONFIG_PATH, 'r') as f:
                     user_config = json.load(f)
                 
                 # Merge user config with main config
-                config = self._merge_configs(config, user_config)
+                config = cls._merge_configs(config, user_config)
             except Exception as e:
                 print(e)
         
         return config
     
-    def _merge_configs(self, main_config: Dict[str, Any], user_config: Dict[str, Any]) -> Dict[str, Any]:
+    @classmethod
+    def _merge_configs(cls, main_config: Dict[str, Any], user_config: Dict[str, Any]) -> Dict[str, Any]:
         """Merge user config with main config, with user config taking precedence."""
         # Create a deep copy of the main config to avoid modifying it
         merged_config = deepcopy(main_config)
@@ -52,32 +123,25 @@ class Config:
                 merged_config[key] = value
             elif isinstance(value, dict) and isinstance(merged_config[key], dict):
                 # Recursively merge dictionaries
-                merged_config[key] = self._merge_configs(merged_config[key], value)
+                merged_config[key] = cls._merge_configs(merged_config[key], value)
             else:
                 # User config takes precedence
                 merged_config[key] = value
         
         return merged_config
     
-    def _get_persona_config(self, persona='default') -> Dict[str, Any]:
-        """Get the configuration for a persona, merging with default if needed."""
-        if persona == 'default':
-            return self.config['personas']['default']
-        
-        # Start with a deep copy of the default persona
-        persona_config = deepcopy(self.config['personas']['default'])
-        
-        # Merge in the selected persona's settings
-        if persona in self.config['personas']:
-            for key, value in self.config['personas'][persona].items():
-                persona_config[key] = value
-        
-        return persona_config
+    def _get_persona_config(self, persona='default') -> Mapping[str, Any]:
+        """Get the configuration for a persona, merged with the default persona."""
+        return self.snapshot.get_persona_config(persona)
     
     def get_stable_diffusion_config(self) -> str:
         """Get the Stable Diffusion URL from config."""
         return self.config.get('stable_diffusion', {})
 
+    def get_cache_config(self) -> Mapping[str, Any]:
+        """Get the LLM response cache settings from config."""
+        return self.config.get('cache', {})
+
     def get_system_content(self, persona='default') -> str:
         """Get the system content based on the specified persona."""
         persona_config = self._get_persona_config(persona)
@@ -87,6 +151,26 @@ class Config:
         """Get the use broker setting for the specified persona."""
         return self._get_persona_config(persona).get('use_broker', False)
 
+    def get_prefetch_deadline(self, persona='default') -> float:
+        """Get the number of seconds to wait for query enrichment before streaming for the specified persona."""
+        return self._get_persona_config(persona).get('prefetch_deadline', 10.0)
+
+    def get_log_search(self, persona='default') -> str:
+        """Get how past conversations are searched for the specified persona, 'local' or 'llm'."""
+        return self._get_persona_config(persona).get('log_search', 'local')
+
+    def get_voice_segmenter(self, persona='default') -> Mapping[str, Any]:
+        """Get the settings of the segmenter that splits replies into voice clips for the specified persona."""
+        return self._get_persona_config(persona).get('voice_segmenter', {})
+
+    def get_sse_flush(self, persona='default') -> Mapping[str, Any]:
+        """Get how streamed content is batched into server-sent events for the specified persona."""
+        return self._get_persona_config(persona).get('sse_flush', {})
+
+    def get_prompt_budget(self, persona='default') -> Mapping[str, Any]:
+        """Get the context window and the tokens reserved for the reply of the specified persona's model."""
+        return self._get_persona_config(persona).get('prompt_budget', {})
+
     def get_model(self, persona='default') -> str:
         """Get the model for the specified persona."""
         return self._get_persona_config(persona)['model']
@@ -119,6 +203,33 @@ class Config:
         else:
             return None 
         
+    def get_connector(self, persona='default') -> Dict[str, Any]:
+        """Get the connector settings for the specified persona, or an empty dict if it uses the default URL."""
+        connector = self._get_persona_config(persona).get('connector')
+        if connector:
+            return self.config['connectors'][connector]
+        return {}
+
+    def get_connector_name(self, persona='default') -> str:
+        """Get the name of the connector used by the specified persona, "default" if it uses the default URL."""
+        return self._get_persona_config(persona).get('connector') or 'default'
+
+    def get_worker_config(self, job_type: str) -> Mapping[str, Any]:
+        """Get the background worker settings for the specified job type."""
+        return self.config.get('workers', {}).get(job_type, {})
+
+    def get_embeddings_config(self) -> Mapping[str, Any]:
+        """Get the semantic memory settings from config."""
+        return self.config.get('embeddings', {})
+
+    def get_conversations_config(self) -> Mapping[str, Any]:
+        """Get the server-side conversation store settings from config."""
+        return self.config.get('conversations', {})
+
+    def get_tts_config(self) -> Mapping[str, Any]:
+        """Get the text to speech service settings from config."""
+        return self.config.get('tts', {})
+
     def get_headers(self) -> Dict[str, str]:
         """Get the headers from config."""
         return self.config['headers']
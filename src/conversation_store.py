@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import Config
+from LocalConfigManager import LocalConfigManager
+from history_delta import history_delta
+
+class Conversation:
+    """A conversation held in memory, with the number of records in its file."""
+
+    def __init__(self, path: str, messages: List[Dict[str, Any]], records: int):
+        self.path = path
+        self.messages = messages
+        self.records = records
+
+class ConversationStore:
+    """
+    A server-side store of conversation histories, keyed by user and conversation ID.
+
+    Each conversation is persisted as an append-only JSONL file in the user's config directory, at
+    conversations/<id>.jsonl. A line is either a message or a truncate record that
+    drops the messages after a given length, so replacing the tail of a history, as the tool loop
+    does, only appends to the file. A file is rewritten once it holds more than twice as many
+    records as its conversation has messages. The most recently used conversations are kept in
+    memory, so a hot conversation is read from disk once.
+    """
+
+    def __init__(self, max_sessions: int = 256, config_manager_factory: Callable[[str], Any] = LocalConfigManager):
+        """
+        Initialize the store.
+
+        Args:
+            max_sessions (int): The number of conversations kept in memory
+            config_manager_factory (Callable[[str], Any]): Creates the config manager of a user, which places their files
+        """
+        self.config_manager_factory = config_manager_factory
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "compactions": 0}
+
+    def _path(self, username: str, conversation_id: str) -> str:
+        """Get the file of a conversation."""
+        return os.path.join(self.config_manager_factory(username).get_path("conversations"), f"{conversation_id}.jsonl")
+
+    @staticmethod
+    def _load(path: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Replay a conversation file into its messages and the number of records it holds."""
+        messages = []
+        records = 0
+        if not os.path.exists(path):
+            return messages, records
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn write at the end of the file loses only its own record
+                    continue
+                records += 1
+                if record.get("op") == "truncate":
+                    del messages[record.get("length", 0):]
+                else:
+                    messages.append(record)
+        return messages, records
+
+    def _get_session(self, username: str, conversation_id: str) -> Conversation:
+        """Get a conversation from memory or disk. Must be called with the lock held."""
+        key = (username, conversation_id)
+        session = self.sessions.get(key)
+        if session is not None:
+            self.sessions.move_to_end(key)
+            self.stats["hits"] += 1
+            return session
+        path = self._path(username, conversation_id)
+        messages, records = self._load(path)
+        session = Conversation(path, messages, records)
+        self.stats["loads"] += 1
+        self.sessions[key] = session
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.stats["evictions"] += 1
+        return session
+
+    def get(self, username: str, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the history of a conversation.
+
+        Args:
+            username (str): The user the conversation belongs to
+            conversation_id (str): The ID of the conversation
+
+        Returns:
+            List[Dict[str, Any]]: The messages of the conversation, empty if it is new
+        """
+        with self.lock:
+            return list(self._get_session(username, conversation_id).messages)
+
+    def update(self, username: str, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Store a new version of a conversation's history, appending only the messages that changed.
+
+        Args:
+            username (str): The user the conversation belongs to
+            conversation_id (str): The ID of the conversation
+            messages (List[Dict[str, Any]]): The full history of the conversation
+        """
+        with self.lock:
+            session = self._get_session(username, conversation_id)
+            base, appended = history_delta(session.messages, messages)
+            if base == len(session.messages) and not appended:
+                return
+            lines = []
+            if base < len(session.messages):
+                lines.append(json.dumps({"op": "truncate", "length": base}))
+            lines.extend(json.dumps(message) for message in appended)
+            session.messages = list(messages)
+            os.makedirs(os.path.dirname(session.path), exist_ok=True)
+            if session.records + len(lines) > 2 * len(session.messages) + 16:
+                self._compact(session)
+            else:
+                with open(session.path, 'a', encoding='utf-8') as f:
+                    f.write("\n".join(lines) + "\n")
+                session.records += len(lines)
+
+    def _compact(self, session: Conversation) -> None:
+        """Rewrite a conversation file with only its current messages. Must be called with the lock held."""
+        temp_path = session.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for message in session.messages:
+                f.write(json.dumps(message) + "\n")
+        os.replace(temp_path, session.path)
+        session.records = len(session.messages)
+        self.stats["compactions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number of conversations in memory and the hit, load, eviction and compaction counts."""
+        with self.lock:
+            return {"sessions": len(self.sessions), **self.stats}
+
+_shared_store: Optional[ConversationStore] = None
+_shared_store_lock = threading.Lock()
+
+def get_conversation_store() -> ConversationStore:
+    """
+    Get the process-wide ConversationStore, configured from the "conversations" section of the config.
+
+    Returns:
+        The shared ConversationStore instance.
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = ConversationStore(Config().get_conversations_config().get("max_sessions", 256))
+    return _shared_store
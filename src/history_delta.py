@@ -0,0 +1,74 @@
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+# Conversation IDs name files on disk, so only plain identifiers are accepted from clients
+CONVERSATION_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def new_conversation_id() -> str:
+    """Create a new conversation ID."""
+    return uuid.uuid4().hex
+
+def valid_conversation_id(conversation_id: Any) -> bool:
+    """Check whether a client supplied conversation ID is safe to use."""
+    return isinstance(conversation_id, str) and bool(CONVERSATION_ID.match(conversation_id))
+
+def history_delta(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Compute the change from one version of a conversation history to the next.
+
+    Args:
+        previous (List[Dict[str, Any]]): The history the client has
+        current (List[Dict[str, Any]]): The new history
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: The number of leading messages the two share, and the
+            messages of the new history after them
+    """
+    base = 0
+    for old, new in zip(previous, current):
+        if old != new:
+            break
+        base += 1
+    return base, current[base:]
+
+class HistorySync:
+    """
+    Tracks the history a client holds for a conversation, so only the changes are sent to it.
+
+    The client applies a history_delta frame by keeping the first `base` messages of its history and
+    appending `messages` after them, which covers both appended messages and replaced ones, such as
+    a reply swapped for a tool result.
+    """
+
+    def __init__(self, conversation_id: str, history: List[Dict[str, Any]]):
+        """
+        Initialize the tracker.
+
+        Args:
+            conversation_id (str): The ID of the conversation
+            history (List[Dict[str, Any]]): The history the client already has
+        """
+        self.conversation_id = conversation_id
+        self.history = list(history)
+
+    def delta(self, history: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Get the frame that brings the client's history up to date.
+
+        Args:
+            history (List[Dict[str, Any]]): The new history
+
+        Returns:
+            Optional[Dict[str, Any]]: The history_delta frame, or None if the client is already up to date
+        """
+        base, messages = history_delta(self.history, history)
+        if base == len(self.history) and not messages:
+            return None
+        self.history = list(history)
+        return {
+            "type": "history_delta",
+            "conversation_id": self.conversation_id,
+            "base": base,
+            "messages": messages
+        }
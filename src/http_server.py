@@ -1,32 +1,38 @@
-import random
 from flask import Flask, send_from_directory, request, jsonify, g
 import os
 from LogManager import LogManager
 from NotesManager import NotesManager
 from actions import Actions, LogAction
 from call_llm_api import ask_agent
+from client_pool import get_client_pool
+from cache_manager import get_cache_manager, start_cache_sweeper
+from worker_pool import WorkerPool
+from job_queue import JobQueue
+from tts_service import TTSService, voice_cache_filename
+from voice_segmenter import create_segmenter
+from voice_registry import VoiceJobRegistry, open_voice_clip, SYNTHESIZING, READY, FAILED
 from config import Config
 import json
-import edge_tts
-import asyncio
 from datetime import datetime
 import re
 import mimetypes
-import copy
 from content_extractor import download_and_extract_content
 from urllib.parse import urlparse
 from get_initial_data_and_response import get_initial_data_and_response
 from agents import get_agent
-import threading
-import queue
-import time
+from prefetch import Prefetcher
 from LocalConfigManager import LocalConfigManager
 import dirtyjson
-from AuthManager import AuthManager
+from AuthManager import AuthManager, get_token_index, start_token_sweeper
 from functools import wraps
 from actions import Actions
-from stream_processor import StreamProcessor
+from stream_processor import MultiStreamProcessor
+from sse_writer import create_sse_writer
+from history_delta import HistorySync, new_conversation_id, valid_conversation_id
+from conversation_store import get_conversation_store
+from prompt_builder import build_chat_prompt
 from LogItem import LogItem, LogCollection
+import VectorIndex
 app = Flask(__name__)
 
 # Create application context
@@ -61,14 +67,14 @@ def token_required(f):
             return jsonify({"error": "Username is required for token validation"}), 401
             
         # Validate the token
-        auth_manager = AuthManager()
-        if not auth_manager.verify_token(username, token):
+        user_config = get_token_index().lookup(username, token)
+        if user_config is None:
             return jsonify({"error": "Invalid or expired token"}), 401
             
         # Set username on request state
         g.username = username
         g.token = token
-        g.user_config = auth_manager.get_user_config(username, token)
+        g.user_config = user_config
         
         # Set LocalConfigManager on request state
         g.config_manager = LocalConfigManager(username)
@@ -78,41 +84,8 @@ def token_required(f):
     
     return decorated
 
-# Create a queue to hold the tuples
-memory_builder_queue = queue.Queue()
-indexing_queue = queue.Queue()
-
-# Function to watch the queue and process items
-def watch_memory_builder_queue():
-    while True:
-        try:
-            # Wait for 2 minutes
-            time.sleep(30)
-            # Check if there is an item in the queue
-            if not memory_builder_queue.empty():
-                # Get the item from the queue
-                username, persona, parsed_history, full_response = memory_builder_queue.get()
-                # Process the item
-                memory_builder(username, persona, parsed_history, full_response)
-            if not indexing_queue.empty():
-                username, persona, parsed_history, full_response = indexing_queue.get()
-        except Exception as e:
-            print(f"Error in watch_queue: {e}")
-
-# Start the background thread
-threading.Thread(target=watch_memory_builder_queue, daemon=True).start()
-
-def watch_indexing_queue():
-    while True:
-        time.sleep(5)
-        try:
-            username, persona, query, full_response = indexing_queue.get()
-            run_indexer(username, persona, query, full_response)
-        except Exception as e:
-            print(f"Error in watch_indexing_queue: {e}")
-            print(traceback.format_exc())
-
-threading.Thread(target=watch_indexing_queue, daemon=True).start()
+start_token_sweeper()
+start_cache_sweeper()
 
 def memory_builder(username, persona, parsed_history, full_response):
     print("Running memory builder")
@@ -131,6 +104,18 @@ def memory_builder(username, persona, parsed_history, full_response):
     }
     result = ask_agent(persona, "Generate new notes based on the conversation and the previous notes.", conversation_history=parsed_history, persona_override=persona_override)
     notesManager.put_note(f"memories/memories_{persona}.txt", result)
+    if VectorIndex.is_available():
+        try:
+            # The memories are rewritten as a whole, so their old chunks are replaced
+            chunks = VectorIndex.chunk_text(result)
+            vector_index = VectorIndex.get_vector_index(config_manager, persona)
+            embedder = VectorIndex.create_embedder()
+            vector_index.replace_source("note", f"memories_{persona}", chunks, embedder.embed(chunks))
+            # The user's own notes are embedded per note, again only once they have changed
+            VectorIndex.index_notes(vector_index, notesManager, embedder)
+            vector_index.compact_if_needed()
+        except Exception as e:
+            print(f"Error embedding memories: {e}")
  
 def run_indexer(username, persona, query, full_response): 
     print("Running indexer")
@@ -149,33 +134,47 @@ The conversation:
     terms = ask_agent("summer", script)
     print("Logging terms: " + terms)
     logger = config_manager.get_log_manager()
-    for term in terms.split(","):
-        term = term.strip()
-        logger.log_index_item(term, "[USER] " + query, persona)
-        logger.log_index_item(term, "[ASSISTANT] " + full_response, persona)
-
-
-voice_files = {}
-voice_queue = queue.Queue()
-
-def voice_generator():
-    while True:
+    logger.index_messages(persona, [("user", query), ("assistant", full_response)], terms.split(","))
+    if VectorIndex.is_available():
+        # An embedding failure must not fail the job, which would index the messages again on retry
         try:
-            time.sleep(1)
-            while not voice_queue.empty():
-                voice_filename, plain_text_content, voice = voice_queue.get()
-                voice_dir = os.path.join(WEB_DIR, 'voice')
-                voice_file_path = os.path.join(voice_dir, voice_filename)
-                if not os.path.exists(voice_file_path):
-                   print(f"Generating voice for {voice_filename} as {voice_file_path}")
-                   async def generate_voice():
-                     communicate = edge_tts.Communicate(text=plain_text_content, voice=voice)
-                     await communicate.save(voice_file_path)
-                   asyncio.run(generate_voice())
-                   del voice_files[voice_filename]         
+            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            lines = [f"[{timestamp}] [{role}] " + message.replace("\n", "\\n") for role, message in (("USER", query), ("ASSISTANT", full_response))]
+            vectors = VectorIndex.create_embedder().embed([query, full_response])
+            VectorIndex.get_vector_index(config_manager, persona).add("message", "chat", lines, vectors, timestamp)
         except Exception as e:
-            print(f"Error in voice_generator: {e}")
-threading.Thread(target=voice_generator, daemon=True).start()
+            print(f"Error embedding messages: {e}")
+
+worker_pool = WorkerPool(JobQueue(LocalConfigManager("jobs").get_path("jobs.db")))
+
+def start_workers():
+    """Register the post-response background jobs and rate limit the connectors they call."""
+    config = Config()
+    for name, connector in config.config['connectors'].items():
+        if connector.get('rate_limit_per_minute'):
+            worker_pool.set_rate_limit(name, connector['rate_limit_per_minute'])
+    worker_pool.register("memory_builder", memory_builder,
+                         concurrency=config.get_worker_config("memory_builder").get("concurrency", 1),
+                         connector=lambda username, persona, *args: Config().get_connector_name(persona),
+                         coalesce=lambda username, persona, *args: f"{username}/{persona}")
+    worker_pool.register("indexer", run_indexer,
+                         concurrency=config.get_worker_config("indexer").get("concurrency", 1),
+                         connector=lambda *args: Config().get_connector_name("summer"))
+
+start_workers()
+
+tts_config = Config().get_tts_config()
+voice_jobs = VoiceJobRegistry(max_pending=tts_config.get("max_pending_jobs", 64),
+                              ttl=tts_config.get("job_ttl", 300),
+                              on_expire=lambda voice_filename: tts_service.cancel(voice_filename))
+tts_service = TTSService(os.path.join(WEB_DIR, 'voice'),
+                         concurrency=tts_config.get("concurrency", 4),
+                         on_start=lambda voice_filename: voice_jobs.set_state(voice_filename, SYNTHESIZING),
+                         on_complete=lambda voice_filename, succeeded: voice_jobs.set_state(voice_filename, READY if succeeded else FAILED),
+                         max_cache_bytes=tts_config.get("max_cache_bytes", 256 * 1024 * 1024),
+                         max_cache_age=tts_config.get("max_cache_age", 7 * 24 * 3600),
+                         sweep_interval=tts_config.get("sweep_interval", 600))
+tts_service.start()
 
 @app.route('/')
 def serve_index():
@@ -265,22 +264,32 @@ Answer the query based on the context.
 """
 
 
-def generate_voice_file(plain_text_content, username, persona):
+def generate_voice_file(plain_text_content, username, persona, priority=1):
     config = Config()
     voice = config.get_voice(persona)
-    voice_dir = os.path.join(WEB_DIR, 'voice')
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S"+str(random.randint(0, 1000000)))
-    voice_file_path = os.path.join(voice_dir, f'{voice}_{username}_{timestamp}.mp3')
     plain_text_content = strip_markdown(plain_text_content)
     plain_text_content = filter_emojis(plain_text_content)
     plain_text_content = filter_urls(plain_text_content)
     # Remove '#' character
     plain_text_content = plain_text_content.replace('#', '')
-    filename = os.path.basename(voice_file_path)
-    voice_files[filename] = (plain_text_content, voice)
-    voice_queue.put((filename, plain_text_content, voice))
+    filename = voice_cache_filename(voice, plain_text_content)
+    if tts_service.has_clip(filename) or voice_jobs.contains(filename):
+        return filename
+    if not voice_jobs.register(filename, plain_text_content, voice):
+        # Too many clips are waiting for synthesis, so this one is skipped
+        return None
+    tts_service.submit(filename, plain_text_content, voice, priority)
     return filename
 
+def voice_message(voice_filename) -> str:
+    if voice_filename is None:
+        # Tell the client a clip was skipped because the voice queue is full
+        stats = voice_jobs.get_stats()
+        json_message = json.dumps({'type': 'voice_backpressure', 'pending': stats['queued'] + stats['synthesizing'], 'dropped': stats['dropped']})
+    else:
+        json_message = json.dumps({'filename': voice_filename})
+    return f"data: {json_message}\n\n"
+
 def system_message(message: str) -> str:
     json_message = json.dumps({'type': 'system', 'content': message})
     return f"data: {json_message}\n\n"
@@ -319,6 +328,41 @@ The query is: {query}
 
 
 def search_past_logs(config_manager, persona, query, previous_reply=None):
+    logManager = config_manager.get_log_manager()
+    if Config().get_log_search(persona) == "local":
+        # Rank past messages against the query and previous reply directly, without asking an LLM for terms
+        found = logManager.search_text(persona, query, previous_reply)
+    else:
+        found = logManager.search_index(persona, ask_for_search_terms(query, previous_reply).split(","))
+    related_notes = []
+    if VectorIndex.is_available():
+        try:
+            semantic_logs, related_notes = search_memories(config_manager, persona, query)
+            found = found + semantic_logs
+        except Exception as e:
+            print(f"Error searching memories by embedding: {e}")
+    logs = []
+    for log in found:
+        if len(log) > 256:
+            log = log[:255]
+        logs.append(log)
+    print("Found " + str(len(logs)) + " logs")
+    log_items = LogCollection.fromLogLines(logs)
+    report = log_items.generate_report()
+    if related_notes:
+        report += "\nRelated notes:\n" + "\n\n".join(related_notes)
+    return report
+
+def search_memories(config_manager, persona, query):
+    """Find the past messages and note chunks closest in meaning to the query."""
+    top_k = Config().get_embeddings_config().get("top_k", 10)
+    vector_index = VectorIndex.get_vector_index(config_manager, persona)
+    query_vector = VectorIndex.create_embedder().embed([query])
+    messages = vector_index.search(query_vector, top_k, kind="message")[0]
+    notes = vector_index.search(query_vector, top_k, kind="note")[0]
+    return [item["text"] for item in messages], [item["text"] for item in notes]
+
+def ask_for_search_terms(query, previous_reply=None):
     if previous_reply:
         previous_reply = f"Previous Reply: {previous_reply}"
     else:
@@ -334,16 +378,9 @@ The query is: {query}
 """ 
     terms = ask_agent("summer", script)
     print("Terms: " + terms)
-    logManager = config_manager.get_log_manager()
-    logs = []
-    for term in terms.split(","):
-        for log in logManager.search_log_item(persona, term.strip()):
-            if len(log) > 256:
-                log = log[:255]
-            logs.append(log)
-    print("Found " + str(len(logs)) + " logs")
-    log_items = LogCollection.fromLogLines(logs)
-    return log_items.generate_report()
+    return terms
+
+prefetcher = Prefetcher(max_workers=8, max_abandoned=4)
 
 @app.route('/query', methods=['POST'])
 @token_required
@@ -364,39 +401,45 @@ def query():
             yield f"data: {json.dumps({'type': 'end', 'content': 'END OF RESPONSE'})}\n\n"
             return
         use_broker = config.get_use_broker(persona)
-        # Extract conversation history from the request
-        conversation_history = data.get('history', [])
-
-        # Parse and validate the conversation history
-        parsed_history = []
-        for entry in conversation_history:
-            if isinstance(entry, dict) and 'role' in entry and 'content' in entry:
-                parsed_history.append(entry)
-            else:
-                print(f"Invalid entry in conversation history: {entry}")
+        conversation_store = get_conversation_store()
+        conversation_id = data.get('conversation_id')
+        if not valid_conversation_id(conversation_id):
+            conversation_id = new_conversation_id()
+
+        if 'history' in data:
+            # Clients that still post the conversation history replace the stored one with it
+            conversation_history = data.get('history') or []
+            parsed_history = []
+            for entry in conversation_history:
+                if isinstance(entry, dict) and 'role' in entry and 'content' in entry:
+                    parsed_history.append(entry)
+                else:
+                    print(f"Invalid entry in conversation history: {entry}")
+        else:
+            # The stored history was validated when it was saved
+            conversation_history = conversation_store.get(username, conversation_id)
+            parsed_history = list(conversation_history)
 
         notesManager = config_manager.get_notes_manager()
         memories = notesManager.get_note(f"memories/memories_{persona}.txt")
-        
-        try:
-            memories = compress_memories(memories, data.get("query", ""))
-        except: 
-            pass
-        
-        pastlogs = "No past logs found"
-        
-        try:
-            if len(parsed_history) >= 2:
-                pastlogs = search_past_logs(config_manager, persona, data.get("query",""), parsed_history[-1]["content"])
-            else:
-                pastlogs = search_past_logs(config_manager, persona, data.get("query",""))
-        except:
-            pass
+        previous_reply = parsed_history[-1]["content"] if len(parsed_history) >= 2 else None
+
+        # Run the enrichment steps in parallel and start streaming with whatever is ready by the deadline
+        enrichments, skipped = prefetcher.run({
+            "compress_memories": lambda: compress_memories(memories, data.get("query", "")),
+            "search_past_logs": lambda: search_past_logs(config_manager, persona, data.get("query", ""), previous_reply)
+        }, config.get_prefetch_deadline(persona))
+        yield f"data: {json.dumps({'type': 'prefetch', 'skipped': skipped})}\n\n"
+
+        memories = enrichments.get("compress_memories", memories)
+        pastlogs = enrichments.get("search_past_logs", "No past logs found")
         
         if memories:
-            memories = "These are your memories from previous conversations: \n\n" + memories + (pastlogs and ("\n\nThese are some relevant conversation logs:\n\n" + pastlogs) or "")
+            memories = "These are your memories from previous conversations: \n\n" + memories
+            pastlogs = pastlogs and ("These are some relevant conversation logs:\n\n" + pastlogs) or ""
         else:
             memories = ""
+            pastlogs = ""
 
         # yield system_message("Seeded memory: " + memories)
         # yield system_message("Remember Convo: " + pastlogs)
@@ -404,6 +447,11 @@ def query():
         max_calls = 3
         call_count = 0
         loop_on = True
+        sse = create_sse_writer(config.get_sse_flush(persona))
+        # Only the messages that differ from what the client already has are sent back
+        history_sync = HistorySync(conversation_id, conversation_history)
+        # Everything shown to the user as the reply, across tool calls, which becomes the stored assistant turn
+        assistant_reply = ""
         while loop_on and call_count < max_calls:  
             
             call_count += 1
@@ -414,81 +462,91 @@ def query():
             # Filter out any system messages from the history
             parsed_history = [msg for msg in parsed_history if msg.get('role') != 'system']
             
-            system_content = config.get_system_content(persona)
-            if not system_content:
-                system_content = ""
-            # Prepend persona's system content to the beginning of parsed history
-            
-            if memories:
-                system_content = system_content + "\n\n" + memories
+            # Fit the prompt into the model's context window; only the copies sent to the model are cut
+            actions_prompt = ""
             if use_broker:
                 actions = Actions.Actions(config_manager, persona, data.get('query', ''), conversation_history)
                 actions_prompt = actions.get_actions_prompt()
-                system_content = system_content + "\n\n" + actions_prompt
-            
+            system_content, prompt_query, prompt_history = build_chat_prompt(
+                config.get_prompt_budget(persona), config.get_system_content(persona), data.get('query', ''),
+                parsed_history, tools=actions_prompt, memories=memories, logs=pastlogs)
+
             print("System content: " + system_content)
             response = ask_agent(persona, 
-                                data.get('query', ''), 
+                                prompt_query, 
                                 stream=True, 
-                                conversation_history=parsed_history, 
+                                conversation_history=prompt_history, 
                                 persona_override={"system_content":system_content})
 
-            # Send the conversation history at the end of the stream
+            # Send the changes to the conversation history
             sent_history = parsed_history + [{"role": "user", "content": data.get('query', '')}]
-            
-            history_info = {
-                "type": "history",
-                "history": sent_history
-            }
-            yield f"data: {json.dumps(history_info)}\n\n"
+            history_info = history_sync.delta(sent_history)
+            if history_info:
+                yield sse.event(history_info)
 
             raw_response = ""
             full_response = ""
-            voice_buffer = ""
+            voice_segmenter = create_segmenter(config.get_voice_segmenter(persona))
+            first_clip = True
             
-            think_stream_processor = StreamProcessor("<think>", "</think>")
-            tool_stream_processor = StreamProcessor("```tool_code", "```")
-            json_stream_processor = StreamProcessor("```json", "```")
+            stream_processor = MultiStreamProcessor([("<think>", "</think>"), ("```tool_code", "```"), ("```json", "```")])
             
             for chunk in response:
                     try:
                         if isinstance(chunk, str):
-                            yield f"data: {json.dumps({'content': chunk})}\n\n"
+                            assistant_reply += chunk
+                            frames = sse.content(chunk)
+                            if frames:
+                                yield frames
                             continue
                         else:
                             if not chunk.choices:
-                                yield f"data: {json.dumps({'content': chunk.data})}\n\n"
+                                assistant_reply += chunk.data
+                                frames = sse.content(chunk.data)
+                                if frames:
+                                    yield frames
                                 continue
                             content = chunk.choices[0].delta.content
                         if content:
                             raw_response += content
-                            content = think_stream_processor.process_chunk(content)
-                            content = tool_stream_processor.process_chunk(content)
-                            content = json_stream_processor.process_chunk(content)
+                            content = stream_processor.process_chunk(content)
                             if not content:
                                 continue
                             else:
-                                voice_buffer += content
                                 full_response += content
-                                if voice_buffer.endswith(('.', '!', '?')) and len(voice_buffer) > 256:
-                                    # Generate voice for the complete sentence
-                                    voice_filename = generate_voice_file(voice_buffer, username, persona)
-                                    voice_file_info = {"filename": voice_filename}
-                                    yield f"data: {json.dumps(voice_file_info)}\n\n"
-                                    # Reset the buffer
-                                    voice_buffer = ""
-                                yield f"data: {json.dumps({'content': content})}\n\n"
+                                assistant_reply += content
+                                for segment in voice_segmenter.feed(content):
+                                    # Generate voice for the complete sentences
+                                    voice_filename = generate_voice_file(segment, username, persona, 0 if first_clip else 1)
+                                    first_clip = False
+                                    yield sse.control(voice_message(voice_filename))
+                                frames = sse.content(content)
+                                if frames:
+                                    yield frames
                     except json.JSONDecodeError as e:
                         loop_on = False
                         print(f"Error decoding JSON: {e}")
 
-            if voice_buffer:
-                voice_filename = generate_voice_file(voice_buffer, username, persona)
-                voice_file_info = {"filename": voice_filename}
-                yield f"data: {json.dumps(voice_file_info)}\n\n"
+            # Text held back as a possible delimiter is still part of the reply
+            content = stream_processor.flush()
+            if content:
+                full_response += content
+                assistant_reply += content
+                for segment in voice_segmenter.feed(content):
+                    voice_filename = generate_voice_file(segment, username, persona, 0 if first_clip else 1)
+                    first_clip = False
+                    yield sse.control(voice_message(voice_filename))
+                frames = sse.content(content)
+                if frames:
+                    yield frames
+
+            voice_segment = voice_segmenter.flush()
+            if voice_segment:
+                voice_filename = generate_voice_file(voice_segment, username, persona, 0 if first_clip else 1)
+                yield sse.control(voice_message(voice_filename))
 
             parsed_history.append({"role": "assistant", "content": full_response})
-            tool_matches = tool_stream_processor.matches + json_stream_processor.matches
+            tool_matches = stream_processor.get_matches("```tool_code", "```json")
             if tool_matches:
                 try:
                     for tool in tool_matches:
@@ -505,7 +563,7 @@ def query():
                         actions = Actions.Actions(config_manager, persona, data.get('query', ''), parsed_history)
                         for type,message in actions.run_tool(tool_name, tool_arguments):
                             if type == "system":
-                                yield f"data: {json.dumps({'type': 'system', 'content': message})}\n\n"
+                                yield sse.event({'type': 'system', 'content': message})
                             elif type == "feedback":
                                 query, callback = message
                                 print("FEED BACK: " + query)
@@ -514,10 +572,13 @@ def query():
                                     stream=False, 
                                     conversation_history=parsed_history[:-1], 
                                     persona_override={"system_content":""})
-                                yield f"data: {json.dumps({'content': callback(response)})}\n\n"
+                                feedback = callback(response)
+                                assistant_reply += feedback
+                                yield sse.event({'content': feedback})
                                 loop_on = False
                             elif type == "end":
-                                yield f"data: {json.dumps({'content': message})}\n\n"
+                                assistant_reply += message
+                                yield sse.event({'content': message})
                                 loop_on = False
                             elif type == "result":
                                 parsed_history = parsed_history[:-1]
@@ -526,61 +587,51 @@ def query():
                                 message = f"You already used the tool {tool_name} with the following arguments: {tool_arguments} do not repeat this call.\n\n{message}"
                                 parsed_history.append({"role": "user", "content": message})
                                 data['query'] = message
-                                yield system_message("Context added to query")
+                                yield sse.control(system_message("Context added to query"))
                 except Exception as e:
                     import traceback
                     error_message = f"An error occurred: {str(e)}\n"
                     error_message += traceback.format_exc()
                     print(error_message)
-                    yield f"data: {json.dumps({'content': error_message})}\n\n"
+                    assistant_reply += error_message
+                    yield sse.event({'content': error_message})
                     loop_on = False
             else:
                 break
 
         if call_count >= max_calls or not parsed_history[-1]["content"]:
-            yield f"data: {json.dumps({'content': '...'})}\n\n"  
-        yield f"data: {json.dumps({'type': 'end', 'content': 'END OF RESPONSE'})}\n\n"
+            assistant_reply += '...'
+            yield sse.event({'content': '...'})
+        final_history = history_sync.history + [{"role": "assistant", "content": assistant_reply}]
+        # Saved before anything else is sent, so a client that disconnects early doesn't leave the store behind
+        conversation_store.update(username, conversation_id, final_history)
+        history_info = history_sync.delta(final_history)
+        if history_info:
+            yield sse.event(history_info)
+        yield sse.event({'type': 'end', 'content': 'END OF RESPONSE'})
 
         log_manager = config_manager.get_log_manager()
         log_manager.log_chat("user", original_query, persona)
         log_manager.log_chat("assistant", full_response, persona)
         # Add the current request to the cleanup queue after the response is sent
-        update_post_request_queue(username, persona, copy.deepcopy(parsed_history), full_response)
-        indexing_queue.put((username, persona, original_query, full_response))
+        update_post_request_queue(username, persona, parsed_history, full_response)
+        worker_pool.submit("indexer", username, persona, original_query, full_response)
 
 
 
-    # Method to add to the queue
+    # Method to add to the queue, a burst of messages in one conversation collapses into one memory rebuild
     def update_post_request_queue(username, persona, parsed_history, full_response):
-        # Clear all existing items from the cleanup queue
-        # Remove existing items for this persona from the cleanup queue
-        items = []
-        while not memory_builder_queue.empty():
-            try:
-                item = memory_builder_queue.get_nowait()
-                if item[0] != persona:  # Keep items for other personas
-                    items.append(item)
-            except queue.Empty:
-                break
-        # Put back items we want to keep
-        for item in items:
-            memory_builder_queue.put(item)
-
-        memory_builder_queue.put((username, persona, copy.deepcopy(parsed_history), full_response))
+        worker_pool.submit("memory_builder", username, persona, parsed_history, full_response)
     return app.response_class(generate_stream(), mimetype='text/event-stream')
 
 @app.route('/voice/<voice_filename>')
 def serve_voice(voice_filename):
     voice_dir = os.path.join(WEB_DIR, 'voice')
-    voice_file_path = os.path.join(voice_dir, voice_filename)
-    if not os.path.exists(voice_file_path):
-        plain_text_content, voice = voice_files[voice_filename]
-        print(f"Just in time Generating voice for {voice_filename} as {voice_file_path}")
-        async def generate_voice():
-            communicate = edge_tts.Communicate(text=plain_text_content, voice=voice)
-            await communicate.save(voice_file_path)
-        asyncio.run(generate_voice())
-        del voice_files[voice_filename]
+    clip = open_voice_clip(voice_jobs, tts_service, voice_dir, voice_filename)
+    if clip is not None:
+        return app.response_class(clip.iter_chunks(), mimetype='audio/mpeg')
+    if not os.path.exists(os.path.join(voice_dir, voice_filename)):
+        return jsonify({"error": "Voice file not found"}), 404
     return send_from_directory(voice_dir, voice_filename)
 
 @app.route('/personas', methods=['GET'])
@@ -595,6 +646,18 @@ def get_personas():
     personas = config.get_persona_choices(groups)
     return jsonify(personas)
 
+@app.route('/stats', methods=['GET'])
+@token_required
+def get_stats():
+    return jsonify({
+        "llm_clients": get_client_pool().get_stats(),
+        "llm_cache": get_cache_manager().get_stats(),
+        "workers": worker_pool.get_stats(),
+        "tts": tts_service.get_stats(),
+        "voice_jobs": voice_jobs.get_stats(),
+        "conversations": get_conversation_store().get_stats()
+    })
+
 @app.route('/avatars/<requested_avatar>')
 def serve_avatar(requested_avatar):
     img_dir = os.path.join(WEB_DIR, 'img')
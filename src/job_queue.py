@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+class Job:
+    """A job claimed from a JobQueue."""
+
+    def __init__(self, id: int, job_type: str, args: list, enqueued_at: float, attempts: int):
+        self.id = id
+        self.job_type = job_type
+        self.args = args
+        self.enqueued_at = enqueued_at
+        self.attempts = attempts
+
+class JobQueue:
+    """
+    A disk-backed job queue with coalescing and at-least-once delivery.
+
+    Jobs are stored in SQLite until they are acknowledged, so pending and in-flight jobs survive a
+    restart. A pending job can carry a coalesce key: queueing another job with the same type and
+    key replaces its arguments in place rather than adding a second job. The queue is meant to be
+    owned by a single server process, which recovers its interrupted jobs on startup.
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = 3):
+        """
+        Open the job queue and requeue any jobs that were running when the process last stopped.
+
+        Args:
+            db_path (str): The path of the SQLite database holding the jobs
+            max_attempts (int): The number of times a failing job is run before it is dropped
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self.job_available = threading.Condition(self.lock)
+        self._create_tables()
+        self._recover()
+
+    def _create_tables(self) -> None:
+        """Create the jobs table and its indexes if they don't exist."""
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_type TEXT NOT NULL,
+                coalesce_key TEXT,
+                args TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Only one pending job per coalesce key, while a running job with the same key may coexist
+        self.connection.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending_key ON jobs (job_type, coalesce_key) WHERE status = 'pending'
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (job_type, status, id)")
+
+    def _recover(self) -> None:
+        """Return the jobs interrupted by a crash or restart to the pending state."""
+        with self.lock:
+            self._begin()
+            try:
+                # An interrupted job is superseded by a newer pending job with the same key
+                self.connection.execute("""
+                    DELETE FROM jobs WHERE status = 'running' AND coalesce_key IS NOT NULL AND EXISTS (
+                        SELECT 1 FROM jobs AS pending WHERE pending.status = 'pending'
+                        AND pending.job_type = jobs.job_type AND pending.coalesce_key = jobs.coalesce_key
+                    )
+                """)
+                cursor = self.connection.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+                self._commit()
+            except Exception:
+                self._rollback()
+                raise
+        if cursor.rowcount:
+            print(f"Recovered {cursor.rowcount} interrupted jobs")
+
+    def _begin(self) -> None:
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def _commit(self) -> None:
+        self.connection.execute("COMMIT")
+
+    def _rollback(self) -> None:
+        self.connection.execute("ROLLBACK")
+
+    def put(self, job_type: str, args: list, coalesce_key: Optional[str] = None) -> None:
+        """
+        Add a job to the queue.
+
+        Args:
+            job_type (str): The type of the job
+            args (list): The JSON serializable arguments of the job
+            coalesce_key (Optional[str]): If set, replaces the arguments of a pending job of the same type and key
+        """
+        with self.lock:
+            self.connection.execute("""
+                INSERT INTO jobs (job_type, coalesce_key, args, enqueued_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (job_type, coalesce_key) WHERE status = 'pending' DO UPDATE SET args = excluded.args
+            """, (job_type, coalesce_key, json.dumps(args), time.time()))
+            self.job_available.notify_all()
+
+    def get(self, job_type: str) -> Job:
+        """
+        Claim the oldest pending job of a type, blocking until one is available.
+
+        Args:
+            job_type (str): The type of job to claim
+
+        Returns:
+            Job: The claimed job, which must be passed to ack or retry once processed
+        """
+        with self.lock:
+            while True:
+                job = self._claim(job_type)
+                if job is not None:
+                    return job
+                self.job_available.wait()
+
+    def _claim(self, job_type: str) -> Optional[Job]:
+        """Mark the oldest pending job of a type as running. Must be called with the lock held."""
+        self._begin()
+        try:
+            row = self.connection.execute(
+                "SELECT id, args, enqueued_at, attempts FROM jobs WHERE job_type = ? AND status = 'pending' ORDER BY id LIMIT 1",
+                (job_type,)
+            ).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1 WHERE id = ?", (row[0],))
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+        if row is None:
+            return None
+        return Job(row[0], job_type, json.loads(row[1]), row[2], row[3] + 1)
+
+    def ack(self, job: Job) -> None:
+        """
+        Remove a job that was processed successfully.
+
+        Args:
+            job (Job): The job to remove
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def retry(self, job: Job) -> None:
+        """
+        Return a failed job to the queue, or drop it once it has used up its attempts.
+
+        Args:
+            job (Job): The job that failed
+        """
+        with self.lock:
+            if job.attempts >= self.max_attempts:
+                print(f"Dropping {job.job_type} job {job.id} after {job.attempts} attempts")
+                self.connection.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+                return
+            try:
+                self.connection.execute("UPDATE jobs SET status = 'pending' WHERE id = ?", (job.id,))
+            except sqlite3.IntegrityError:
+                # A newer job with the same coalesce key is already pending and supersedes this one
+                self.connection.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+            self.job_available.notify_all()
+
+    def depth(self, job_type: str) -> int:
+        """
+        Get the number of pending jobs of a type.
+
+        Args:
+            job_type (str): The type of job to count
+
+        Returns:
+            int: The number of pending jobs
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE job_type = ? AND status = 'pending'", (job_type,)
+            ).fetchone()[0]
@@ -20,6 +20,7 @@ from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
 from voice_thread import VoiceThread
+from voice_segmenter import SentenceSegmenter, create_segmenter
 from config import Config
 from content_extractor import download_and_extract_content
 from get_initial_data_and_response import get_initial_data_and_response
@@ -79,17 +80,25 @@ async def generate_audio_file(text, voice):
         return None
 
 
-def stream_response(response, voice=None, script_dir=None):
-    """Stream the response from the API and process it sentence by sentence."""
+def stream_response(response, voice=None, script_dir=None, segmenter=None):
+    """Stream the response from the API and voice it segment by segment."""
     full_response = ""
-    current_sentence = ""
-    combined_sentences = ""
     has_choices = False
+    segmenter = segmenter or SentenceSegmenter()
     
     # Initialize voice thread if voice and script_dir are provided
     voice_thread = None
     if voice and script_dir:
         voice_thread = VoiceThread(voice, script_dir)
+
+    def speak(segment):
+        filtered_segment = filter_think_tags(segment).strip()
+        if filtered_segment and voice_thread:
+            # Generate audio file in the main thread
+            audio_file = asyncio.run(generate_audio_file(filtered_segment, voice))
+            if audio_file:
+                # Add the audio file to the voice queue
+                voice_thread.add_audio_file(audio_file)
     
     try:
         for line in response:
@@ -108,31 +117,10 @@ def stream_response(response, voice=None, script_dir=None):
                             time.sleep(0.01)
                         
                         full_response += content
-                        current_sentence += content
                         
-                        # Check if we have a complete sentence
-                        if any(current_sentence.strip().endswith(end) for end in ['.', '!', '?', '...']):
-                            # Process the current sentence
-                            filtered_sentence = filter_think_tags(current_sentence.strip())
-                            
-                            # Add the filtered sentence to the combined sentences
-                            if filtered_sentence:
-                                if combined_sentences:
-                                    combined_sentences += " " + filtered_sentence
-                                else:
-                                    combined_sentences = filtered_sentence
-                            
-                            # Check if combined sentences are long enough to process
-                            if combined_sentences and len(combined_sentences) > 128 and voice_thread:
-                                # Generate audio file in the main thread
-                                audio_file = asyncio.run(generate_audio_file(combined_sentences, voice))
-                                if audio_file:
-                                    # Add the audio file to the voice queue
-                                    voice_thread.add_audio_file(audio_file)
-                                # Reset combined sentences
-                                combined_sentences = ""
-                            
-                            current_sentence = ""
+                        # Voice each segment as soon as its sentences are complete
+                        for segment in segmenter.feed(content):
+                            speak(segment)
                 except json.JSONDecodeError:
                     continue
     except KeyboardInterrupt:
@@ -143,21 +131,9 @@ def stream_response(response, voice=None, script_dir=None):
         raise
     
     # Process any remaining text
-    if current_sentence.strip():
-        filtered_sentence = filter_think_tags(current_sentence.strip())
-        if filtered_sentence:
-            if combined_sentences:
-                combined_sentences += " " + filtered_sentence
-            else:
-                combined_sentences = filtered_sentence
-    
-    # Process any remaining combined sentences
-    if combined_sentences and voice_thread:
-        # Generate audio file in the main thread
-        audio_file = asyncio.run(generate_audio_file(combined_sentences, voice))
-        if audio_file:
-            # Add the audio file to the voice queue
-            voice_thread.add_audio_file(audio_file)
+    remaining = segmenter.flush()
+    if remaining:
+        speak(remaining)
     
     print()  # Add a newline at the end
     
@@ -259,7 +235,7 @@ def process_message(message: str, persona: str, config: Config, conversation_his
                 voice = config.get_voice(persona)
             
             # Stream the response and process it sentence by sentence
-            full_response, voice_thread = stream_response(resp, voice, script_dir)
+            full_response, voice_thread = stream_response(resp, voice, script_dir, create_segmenter(config.get_voice_segmenter(persona)))
             
             # Get additional input without going to a new line
             print(">> ", end='', flush=True)
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple
+
+class Prefetcher:
+    """
+    Runs the enrichment steps of a query concurrently on a shared pool, waiting for them up to a deadline.
+
+    Steps that miss the deadline are cancelled if they have not started. Steps already running
+    cannot be interrupted, so they are abandoned and keep their thread until they return. While
+    abandoned steps hold max_abandoned threads, new steps are skipped at once rather than queued
+    behind them, which keeps the rest of the pool free for the queries that follow.
+    """
+
+    def __init__(self, max_workers: int = 8, max_abandoned: int = 4):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            max_workers (int): The number of threads the steps run on
+            max_abandoned (int): The number of threads abandoned steps may hold before new steps are skipped
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.max_abandoned = max_abandoned
+        self.abandoned = 0
+        self.lock = threading.Lock()
+
+    def run(self, steps: Dict[str, Callable[[], Any]], deadline: float) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Run the steps and wait for them up to the deadline.
+
+        Args:
+            steps (Dict[str, Callable[[], Any]]): A mapping of enrichment name to a callable that produces it
+            deadline (float): The number of seconds to wait for the steps to finish
+
+        Returns:
+            Tuple[Dict[str, Any], List[str]]: A tuple containing (results, skipped)
+                - results: The results of the steps that finished in time, keyed by name
+                - skipped: The names of the steps that were not run, timed out or failed
+        """
+        with self.lock:
+            saturated = self.abandoned >= self.max_abandoned
+        if saturated:
+            print(f"Skipping prefetch, {self.abandoned} abandoned steps are still running")
+            return {}, list(steps)
+        futures = {name: self.executor.submit(step) for name, step in steps.items()}
+        done, _ = wait(futures.values(), timeout=deadline)
+        results = {}
+        skipped = []
+        for name, future in futures.items():
+            if future not in done:
+                print(f"Prefetch step {name} missed the {deadline}s deadline")
+                skipped.append(name)
+                self._abandon(future)
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Error in prefetch step {name}: {e}")
+                skipped.append(name)
+        return results, skipped
+
+    def _abandon(self, future: Future) -> None:
+        """Cancel a step that has not started, or count a running one until it returns."""
+        if future.cancel():
+            return
+        with self.lock:
+            self.abandoned += 1
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future) -> None:
+        with self.lock:
+            self.abandoned -= 1
@@ -0,0 +1,222 @@
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Tokens a chat message costs beyond its content, for its role and separators
+MESSAGE_OVERHEAD = 4
+TRUNCATION_MARKER = "\n[...]\n"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a tokenizer.
+
+    English text and code average about four characters per token, while other scripts often take a
+    token per character, so ASCII characters are counted at a quarter of a token and all others at
+    one. The estimate errs high for accented Latin text, which keeps budgets on the safe side.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: The estimated number of tokens
+    """
+    if not text:
+        return 0
+    non_ascii = len(text) - len(text.encode('ascii', 'ignore'))
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to a token budget, keeping its start and its end.
+
+    The end is kept as well because prompts built from templates, such as tool results, often close
+    with the query and its instructions.
+
+    Args:
+        text (str): The text to cut
+        max_tokens (int): The token budget
+
+    Returns:
+        str: The text if it fits, otherwise its start and end around a marker, or an empty string if
+            not even the marker fits
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATION_MARKER)
+    # Scale by this text's own characters per token, so the first cut lands close to the budget
+    keep = int(len(text) * budget / tokens)
+    while keep > 0:
+        tail = keep // 4
+        result = text[:keep - tail] + TRUNCATION_MARKER + text[len(text) - tail:]
+        if estimate_tokens(result) <= max_tokens:
+            return result
+        keep = int(keep * 0.9)
+    return ""
+
+def chunk_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a text into chunks of at most max_tokens, cutting at whitespace where possible.
+
+    Args:
+        text (str): The text to split
+        max_tokens (int): The token budget of each chunk
+
+    Returns:
+        List[str]: The chunks, stripped of surrounding whitespace
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        # Four characters per token is the most an estimate allows, so this is the longest possible chunk
+        end = min(len(text), start + max(1, max_tokens) * 4)
+        while end > start + 1 and estimate_tokens(text[start:end]) > max_tokens:
+            end = start + max(1, int((end - start) * 0.9))
+        if end < len(text):
+            space = max(text.rfind(' ', start, end), text.rfind('\n', start, end))
+            if space > start:
+                end = space
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+def estimate_message_tokens(message: Mapping[str, Any]) -> int:
+    """Estimate the tokens a chat message takes in a prompt."""
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD
+
+class Prompt:
+    """A prompt assembled within a token budget."""
+
+    def __init__(self, sections: Dict[str, str], history: List[Dict[str, Any]], tokens: int, dropped_messages: int):
+        self.sections = sections
+        self.history = history
+        self.tokens = tokens
+        self.dropped_messages = dropped_messages
+
+class PromptBuilder:
+    """
+    Assembles a prompt from named sections and the conversation history within a model's context window.
+
+    The window, less the tokens reserved for the reply, is handed out by priority, lowest number
+    first. Each text section takes what it needs, up to its share of the budget if it has one, and
+    is cut down when the remaining budget is smaller. The history keeps its newest messages and drops
+    the oldest ones that don't fit.
+    """
+
+    def __init__(self, context_window: int = 8192, reserved_tokens: int = 1024):
+        """
+        Initialize the builder.
+
+        Args:
+            context_window (int): The number of tokens the model accepts
+            reserved_tokens (int): The tokens kept free for the reply
+        """
+        self.context_window = context_window
+        self.reserved_tokens = reserved_tokens
+        self.sections = []
+        self.history = None
+
+    @property
+    def available(self) -> int:
+        """The number of tokens available to the prompt."""
+        return max(0, self.context_window - self.reserved_tokens)
+
+    def add(self, name: str, text: str, priority: int, max_share: Optional[float] = None) -> None:
+        """
+        Add a text section.
+
+        Args:
+            name (str): The name the section is returned under
+            text (str): The text of the section
+            priority (int): The order in which the budget is handed out, lowest first
+            max_share (Optional[float]): The largest fraction of the budget the section may take
+        """
+        self.sections.append((priority, len(self.sections), name, text or "", max_share))
+
+    def add_history(self, messages: List[Dict[str, Any]], priority: int) -> None:
+        """
+        Add the conversation history, oldest message first.
+
+        Args:
+            messages (List[Dict[str, Any]]): The messages of the conversation
+            priority (int): The order in which the budget is handed out, lowest first
+        """
+        self.history = (priority, len(self.sections), messages)
+
+    def build(self) -> Prompt:
+        """
+        Hand out the budget and cut each part down to its allocation.
+
+        Returns:
+            Prompt: The sections by name, the kept history, the estimated size and the number of dropped messages
+        """
+        remaining = self.available
+        sections = {}
+        history = []
+        dropped = 0
+        parts = sorted(self.sections + ([self.history] if self.history else []), key=lambda part: part[:2])
+        for part in parts:
+            if part is self.history:
+                messages = part[2]
+                kept = len(messages)
+                while kept > 0:
+                    cost = estimate_message_tokens(messages[kept - 1])
+                    if cost > remaining:
+                        break
+                    remaining -= cost
+                    kept -= 1
+                history = list(messages[kept:])
+                dropped = kept
+                continue
+            _, _, name, text, max_share = part
+            allowed = remaining if max_share is None else min(remaining, int(self.available * max_share))
+            text = truncate_to_tokens(text, allowed)
+            sections[name] = text
+            remaining -= estimate_tokens(text)
+        return Prompt(sections, history, self.available - remaining, dropped)
+
+def create_prompt_builder(settings: Mapping[str, Any]) -> PromptBuilder:
+    """
+    Create a prompt builder from a persona's prompt_budget settings.
+
+    Args:
+        settings (Mapping[str, Any]): context_window and reserved_tokens, both optional
+
+    Returns:
+        PromptBuilder: The configured builder
+    """
+    return PromptBuilder(settings.get('context_window', 8192), settings.get('reserved_tokens', 1024))
+
+def build_chat_prompt(settings: Mapping[str, Any], system: str, query: str, history: List[Dict[str, Any]],
+                      tools: str = "", memories: str = "", logs: str = "") -> Tuple[str, str, List[Dict[str, Any]]]:
+    """
+    Fit a chat request into a persona's context window.
+
+    The query, which may carry a tool result, is cut to half the budget, the memories to a quarter
+    and the logs to 15%, and the oldest history is dropped once the budget runs out. Only the
+    returned copies are cut, the query and history passed in are left as they are.
+
+    Args:
+        settings (Mapping[str, Any]): The persona's prompt_budget settings
+        system (str): The persona's system content
+        query (str): The message to send
+        history (List[Dict[str, Any]]): The conversation before the query
+        tools (str): The actions prompt
+        memories (str): The memories section
+        logs (str): The past conversation logs section
+
+    Returns:
+        Tuple[str, str, List[Dict[str, Any]]]: The system content, the query and the history to send to the model
+    """
+    builder = create_prompt_builder(settings)
+    builder.add("system", system, 0)
+    builder.add("query", query, 1, max_share=0.5)
+    builder.add("tools", tools, 2)
+    builder.add("memories", memories, 3, max_share=0.25)
+    builder.add("logs", logs, 4, max_share=0.15)
+    builder.add_history(history, 5)
+    prompt = builder.build()
+    if prompt.dropped_messages:
+        print(f"Dropped {prompt.dropped_messages} old messages to fit the context window")
+    system_content = "\n\n".join(prompt.sections[name] for name in ("system", "memories", "logs", "tools") if prompt.sections[name])
+    return system_content, prompt.sections["query"], prompt.history
@@ -0,0 +1,111 @@
+import json
+import re
+import time
+from typing import Any, Callable, Mapping
+
+# Closing punctuation at the end of a delta or before whitespace, or a line break
+SENTENCE_END = re.compile(r'[.!?…]["\'”’)\]]*(?:\s|$)|\n')
+
+def sse_frame(payload: Mapping[str, Any]) -> str:
+    """Format a payload as a server-sent event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+class SSEWriter:
+    """
+    Coalesces streamed content deltas into fewer server-sent events.
+
+    Models often stream one token per delta, so framing every delta costs a json.dumps and a write
+    each. Content is held back and sent as one frame once the oldest pending delta is max_delay
+    seconds old, once max_bytes are pending, or at the end of a sentence, whichever comes first.
+    Control frames such as the history, voice clips and the end of the response are never delayed:
+    pending content is sent right before them, so the client sees everything in order.
+
+    The writer runs inside the response generator, so the time window is checked when the next
+    delta arrives; content pending when the model stalls goes out with the next delta or frame.
+    """
+
+    def __init__(self, max_delay: float = 0.03, max_bytes: int = 512, sentence_boundary: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the writer.
+
+        Args:
+            max_delay (float): Seconds content may be held back, 0 sends every delta as it arrives
+            max_bytes (int): The number of pending bytes that are sent without waiting, 0 for no limit
+            sentence_boundary (bool): Whether to send pending content at the end of each sentence
+            clock (Callable[[], float]): The time source, in seconds
+        """
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+        self.sentence_boundary = sentence_boundary
+        self.clock = clock
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_since = 0.0
+
+    def content(self, text: str) -> str:
+        """
+        Add a content delta.
+
+        Args:
+            text (str): The delta to send
+
+        Returns:
+            str: The frames to send now, or an empty string if the delta is held back
+        """
+        if not text:
+            return ""
+        now = self.clock()
+        if not self.pending:
+            self.pending_since = now
+        self.pending.append(text)
+        self.pending_bytes += len(text.encode('utf-8'))
+        if (now - self.pending_since >= self.max_delay
+                or (self.max_bytes and self.pending_bytes >= self.max_bytes)
+                or (self.sentence_boundary and SENTENCE_END.search(text))):
+            return self.flush()
+        return ""
+
+    def control(self, frame: str) -> str:
+        """
+        Send a control frame immediately, after any pending content.
+
+        Args:
+            frame (str): The formatted server-sent event
+
+        Returns:
+            str: The frames to send now
+        """
+        return self.flush() + frame
+
+    def event(self, payload: Mapping[str, Any]) -> str:
+        """Format a payload as a control frame and send it immediately, after any pending content."""
+        return self.control(sse_frame(payload))
+
+    def flush(self) -> str:
+        """
+        Send any pending content.
+
+        Returns:
+            str: The content frame, or an empty string if nothing is pending
+        """
+        if not self.pending:
+            return ""
+        text = "".join(self.pending)
+        self.pending = []
+        self.pending_bytes = 0
+        return sse_frame({'content': text})
+
+def create_sse_writer(settings: Mapping[str, Any]) -> SSEWriter:
+    """
+    Create an SSE writer from a persona's sse_flush settings.
+
+    Args:
+        settings (Mapping[str, Any]): max_delay_ms, max_bytes and sentence_boundary, all optional
+
+    Returns:
+        SSEWriter: The configured writer
+    """
+    return SSEWriter(max_delay=settings.get('max_delay_ms', 30) / 1000,
+                     max_bytes=settings.get('max_bytes', 512),
+                     sentence_boundary=settings.get('sentence_boundary', True))
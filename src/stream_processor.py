@@ -1,3 +1,5 @@
+import re
+
 class StreamProcessor:
     def __init__(self, match_start, match_end):
         self.buffer = ""
@@ -32,4 +34,88 @@ class StreamProcessor:
             self.buffer = ""
             self.matches.append(current_string[len(self.match_start):-len(self.match_end)])
             return ""
-        return ""
\ No newline at end of file
+        return ""
+
+class MultiStreamProcessor:
+    """
+    Filters several delimited blocks (such as <think></think> and fenced tool calls) out of a
+    stream in a single pass.
+
+    Each chunk is scanned with str.find for the next character that can begin a start delimiter,
+    or for the end delimiter of the block being read, so text outside the blocks is copied in
+    slices rather than character by character. A possible delimiter cut off at the end of a chunk
+    is carried over to the next chunk.
+    """
+
+    def __init__(self, delimiters):
+        """
+        Initialize the processor.
+
+        Args:
+            delimiters (list[tuple[str, str]]): The (start, end) delimiter pairs, checked in order when
+                two start delimiters match at the same position
+        """
+        self.delimiters = delimiters
+        self.matches = {start: [] for start, _ in delimiters}
+        self.start_pattern = re.compile("[" + "".join(sorted({re.escape(start[0]) for start, _ in delimiters})) + "]")
+        self.carry = ""
+        self.active = None
+        self.block = []
+
+    def get_matches(self, *starts):
+        """Get the contents of the blocks found for the given start delimiters, in the order the delimiters are given."""
+        return [match for start in starts for match in self.matches[start]]
+
+    def process_chunk(self, chunk):
+        """Process a chunk of the stream and return the text outside the delimited blocks."""
+        text = self.carry + chunk
+        self.carry = ""
+        output = []
+        position = 0
+        while position < len(text):
+            if self.active:
+                start, end = self.active
+                end_index = text.find(end, position)
+                if end_index == -1:
+                    # Keep back what could be the beginning of the end delimiter
+                    keep = self._partial_suffix(text, position, end)
+                    self.block.append(text[position:len(text) - keep])
+                    self.carry = text[len(text) - keep:]
+                    break
+                self.block.append(text[position:end_index])
+                self.matches[start].append("".join(self.block))
+                self.block = []
+                self.active = None
+                position = end_index + len(end)
+                continue
+            found = self.start_pattern.search(text, position)
+            if not found:
+                output.append(text[position:])
+                break
+            index = found.start()
+            output.append(text[position:index])
+            delimiter = next(((start, end) for start, end in self.delimiters if text.startswith(start, index)), None)
+            if delimiter:
+                self.active = delimiter
+                position = index + len(delimiter[0])
+            elif any(start.startswith(text[index:]) for start, _ in self.delimiters):
+                # The chunk ends part way through what may be a start delimiter
+                self.carry = text[index:]
+                break
+            else:
+                output.append(text[index])
+                position = index + 1
+        return "".join(output)
+
+    def _partial_suffix(self, text, position, delimiter):
+        """Get the length of the longest suffix of text[position:] that is a proper prefix of the delimiter."""
+        for length in range(min(len(delimiter) - 1, len(text) - position), 0, -1):
+            if text.endswith(delimiter[:length]):
+                return length
+        return 0
+
+    def flush(self):
+        """End the stream and return any text held back as a possible start delimiter. Unclosed blocks are dropped."""
+        carry = "" if self.active else self.carry
+        self.carry = ""
+        return carry
@@ -0,0 +1,24 @@
+import os
+
+class FakeClock:
+    """A clock that only moves when a test moves it, or when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeConfigManager:
+    """Stands in for LocalConfigManager, placing every path in a given directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self, name):
+        return os.path.join(self.directory, name)
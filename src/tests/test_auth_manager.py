@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from AuthManager import AuthManager, TokenIndex
+from fakes import FakeConfigManager
+
+class TestAuthManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_manager = FakeConfigManager(self.directory)
+        self.auth = AuthManager(self.config_manager)
+        self.auth.create_user("beth", "secret")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_authenticate_and_verify(self):
+        self.assertIsNone(self.auth.authenticate("beth", "wrong"))
+        self.assertIsNone(self.auth.authenticate("anne", "secret"))
+        token = self.auth.authenticate("beth", "secret")
+        self.assertTrue(self.auth.verify_token("beth", token))
+        self.assertFalse(self.auth.verify_token("anne", token))
+        self.assertFalse(self.auth.create_user("beth", "other"))
+
+    def test_expired_tokens_are_rejected_and_swept(self):
+        live = self.auth.authenticate("beth", "secret")
+        self.auth.token_expiration = -10
+        expired = [self.auth.authenticate("beth", "secret") for _ in range(5)]
+        self.assertFalse(self.auth.verify_token("beth", expired[0]))
+        self.assertEqual(self.auth.delete_expired_tokens(batch_size=2), 5)
+        self.assertIsNone(self.auth.get_token(expired[0]))
+        self.assertTrue(self.auth.verify_token("beth", live))
+        self.assertEqual(self.auth.delete_expired_tokens(), 0)
+
+    def test_migrates_auth_json(self):
+        now = int(time.time())
+        auth_data = {"users": {"anne": {
+            "password_hash": AuthManager._hash_password("pass", "salt"), "salt": "salt", "config": {"groups": ["admin"]},
+            "tokens": {"live": {"created_at": now, "expires_at": now + 3600},
+                       "expired": {"created_at": now - 7200, "expires_at": now - 3600}}
+        }}}
+        with open(self.config_manager.get_path("auth.json"), "w") as f:
+            json.dump(auth_data, f)
+        migrated = AuthManager(self.config_manager)
+        self.assertTrue(migrated.verify_token("anne", "live"))
+        self.assertIsNone(migrated.get_token("expired"))
+        self.assertEqual(migrated.get_user_config("anne", "live"), {"groups": ["admin"]})
+        self.assertIsNotNone(migrated.authenticate("anne", "pass"))
+        self.assertFalse(os.path.exists(self.config_manager.get_path("auth.json")))
+        self.assertTrue(os.path.exists(self.config_manager.get_path("auth.json.migrated")))
+
+    def test_invalid_auth_json(self):
+        with open(self.config_manager.get_path("auth.json"), "w") as f:
+            f.write("{")
+        with self.assertRaises(ValueError):
+            AuthManager(self.config_manager)
+
+class TestTokenIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_manager = FakeConfigManager(self.directory)
+        self.auth = AuthManager(self.config_manager)
+        self.auth.create_user("beth", "secret")
+        self.auth.set_user_config("beth", {"groups": ["default"]})
+        self.token = self.auth.authenticate("beth", "secret")
+        # Another process's writes, through a connection of its own
+        self.other = AuthManager(self.config_manager)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup(self):
+        index = TokenIndex(check_interval=0, auth_manager=self.auth)
+        self.assertEqual(index.lookup("beth", self.token), {"groups": ["default"]})
+        self.assertIsNone(index.lookup("anne", self.token))
+        self.assertIsNone(index.lookup("beth", "unknown"))
+
+    def test_commits_from_other_connections_drop_the_index(self):
+        index = TokenIndex(check_interval=0, auth_manager=self.auth)
+        index.lookup("beth", self.token)
+        self.other.set_user_config("beth", {"groups": ["admin"]})
+        self.assertEqual(index.lookup("beth", self.token), {"groups": ["admin"]})
+
+    def test_changes_are_checked_at_most_once_per_interval(self):
+        index = TokenIndex(check_interval=3600, auth_manager=self.auth)
+        index.lookup("beth", self.token)
+        self.other.set_user_config("beth", {"groups": ["admin"]})
+        self.assertEqual(index.lookup("beth", self.token), {"groups": ["default"]})
+
+    def test_expired_token_is_rejected(self):
+        self.auth.token_expiration = -10
+        expired = self.auth.authenticate("beth", "secret")
+        index = TokenIndex(check_interval=0, auth_manager=self.auth)
+        self.assertIsNone(index.lookup("beth", expired))
+        self.assertNotIn(expired, index.tokens)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from cache_keys import make_cache_key, normalize_text
+
+class TestCacheKeys(unittest.TestCase):
+    def setUp(self):
+        self.messages = [
+            {"role": "system", "content": "You are a helpful AI assistant\n- the users current time and date is 09:15 AM () on Monday, May 05 2025"},
+            {"role": "user", "content": "Here is some context:\n\n  Page   text\n"}
+        ]
+
+    def test_key_is_fixed_size(self):
+        long_messages = [{"role": "user", "content": "word " * 10000}]
+        self.assertEqual(len(make_cache_key("model", 0.7, long_messages)), len(make_cache_key("model", 0.7, self.messages)))
+
+    def test_whitespace_differences_share_a_key(self):
+        refetched = [self.messages[0], {"role": "user", "content": "Here is some context: Page\ttext"}]
+        self.assertEqual(make_cache_key("model", 0.7, self.messages), make_cache_key("model", 0.7, refetched))
+
+    def test_current_time_is_ignored(self):
+        later = [{"role": "system", "content": "You are a helpful AI assistant\n- the users current time and date is 09:16 AM () on Monday, May 05 2025"}, self.messages[1]]
+        self.assertEqual(make_cache_key("model", 0.7, self.messages), make_cache_key("model", 0.7, later))
+
+    def test_model_and_temperature_change_the_key(self):
+        key = make_cache_key("model", 0.7, self.messages)
+        self.assertNotEqual(key, make_cache_key("other-model", 0.7, self.messages))
+        self.assertNotEqual(key, make_cache_key("model", 0.8, self.messages))
+
+    def test_roles_change_the_key(self):
+        swapped = [{"role": "assistant", "content": self.messages[1]["content"]}]
+        self.assertNotEqual(make_cache_key("model", 0.7, self.messages[1:]), make_cache_key("model", 0.7, swapped))
+
+    def test_custom_pipeline(self):
+        self.assertEqual(normalize_text("  Hello  World ", ["lowercase", "strip"]), "hello  world")
+        with self.assertRaises(ValueError):
+            normalize_text("text", ["unknown"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from cache_manager import CacheManager, MemoryCache, start_cache_sweeper
+from fakes import FakeConfigManager
+
+class TestCacheManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_manager = FakeConfigManager(self.directory)
+        self.cache_dir = self.config_manager.get_path("cache")
+        # Every reading of the clock moves it on, so access times never tie
+        clock = mock.patch("time.time", side_effect=itertools.count(1000))
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.size = len(pickle.dumps(b"x" * 100))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_legacy_entry(self, manifest, key, value, expiration_time):
+        manifest[key] = {"expiration_time": expiration_time}
+        with open(os.path.join(self.cache_dir, hashlib.md5(key.encode()).hexdigest() + ".cache"), "wb") as f:
+            pickle.dump(value, f)
+
+    def test_migrates_legacy_files(self):
+        os.makedirs(self.cache_dir)
+        manifest = {}
+        self.write_legacy_entry(manifest, "live", {"answer": 42}, 5000)
+        self.write_legacy_entry(manifest, "expired", "old", 10)
+        manifest["missing"] = {"expiration_time": 5000}
+        with open(os.path.join(self.cache_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        cache = CacheManager(self.config_manager)
+        self.assertEqual(cache.get("live"), {"answer": 42})
+        self.assertIsNone(cache.get("expired"))
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual([name for name in os.listdir(self.cache_dir) if not name.startswith("cache.db")], [])
+        self.assertEqual(CacheManager(self.config_manager).get("live"), {"answer": 42})
+
+    def test_evicts_least_recently_used_over_budget(self):
+        cache = CacheManager(self.config_manager, max_disk_bytes=3 * self.size)
+        for key in "abc":
+            cache.set(key, b"x" * 100)
+        cache.get("a")
+        cache.set("d", b"x" * 100)
+        self.assertEqual([key for key in "abcd" if cache.get(key) is not None], ["a", "c", "d"])
+        self.assertEqual(cache.get_stats()["disk"]["evictions"], 1)
+        self.assertEqual(cache.get_stats()["disk"]["bytes"], 3 * self.size)
+
+    def test_eviction_stops_when_deletes_fail(self):
+        cache = CacheManager(self.config_manager, max_disk_bytes=self.size)
+        cache.set("a", b"x" * 100)
+        with mock.patch.object(cache, "delete", return_value=False):
+            cache.set("b", b"x" * 100)
+        self.assertEqual(cache.get_stats()["disk"]["entries"], 2)
+
+    def test_memory_hits_count_as_disk_accesses(self):
+        cache = CacheManager(self.config_manager, memory_cache=MemoryCache(), max_disk_bytes=3 * self.size, touch_interval=3600)
+        for key in "abc":
+            cache.set(key, b"x" * 100)
+        self.assertEqual(cache.get("a"), b"x" * 100)
+        self.assertEqual(cache.get_stats()["disk"]["hits"], 0)
+        cache.set("d", b"x" * 100)
+        cache.memory_cache.clear()
+        self.assertEqual([key for key in "abcd" if cache.get(key) is not None], ["a", "c", "d"])
+
+    def test_expired_entries_are_deleted_in_batches(self):
+        cache = CacheManager(self.config_manager, purge_batch_size=2)
+        for key in "abcde":
+            cache.set(key, "value", expiration=-1)
+        cache.set("live", "value")
+        self.assertEqual(cache.delete_expired(), 5)
+        self.assertEqual(cache.get_stats()["disk"]["entries"], 1)
+
+    def test_sweeper_deletes_expired_entries(self):
+        cache = CacheManager(self.config_manager)
+        cache.set("old", "value", expiration=-1)
+        start_cache_sweeper(3600, cache)
+        deadline = time.monotonic() + 2
+        while cache.get_stats()["disk"]["entries"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.get_stats()["disk"]["entries"], 0)
+
+    def test_expired_entries_are_misses(self):
+        cache = CacheManager(self.config_manager)
+        cache.set("short", "value", expiration=-1)
+        self.assertEqual(cache.get("short", "default"), "default")
+        self.assertEqual(cache.get_stats()["disk"]["entries"], 0)
+
+class TestMemoryCache(unittest.TestCase):
+    def setUp(self):
+        self.expiration_time = time.time() + 600
+
+    def test_entry_count_bound(self):
+        cache = MemoryCache(max_entries=2)
+        for key in "abc":
+            cache.set(key, key, self.expiration_time, 1)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, "c"))
+        self.assertEqual(cache.get_stats(), {"hits": 1, "misses": 1, "evictions": 1, "entries": 2, "bytes": 2})
+
+    def test_byte_bound_evicts_least_recently_used(self):
+        cache = MemoryCache(max_bytes=100)
+        cache.set("a", "a", self.expiration_time, 40)
+        cache.set("b", "b", self.expiration_time, 40)
+        cache.get("a")
+        cache.set("c", "c", self.expiration_time, 40)
+        self.assertEqual([key for key in "abc" if cache.get(key)[0]], ["a", "c"])
+        self.assertEqual(cache.get_stats()["bytes"], 80)
+
+    def test_oversized_entry_is_not_kept(self):
+        cache = MemoryCache(max_bytes=100)
+        cache.set("a", "old", self.expiration_time, 10)
+        cache.set("a", "new", self.expiration_time, 101)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get_stats()["bytes"], 0)
+
+    def test_expired_entry_is_removed(self):
+        cache = MemoryCache()
+        cache.set("a", "a", time.time() - 1, 10)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from ChatLog import ChatLogFile
+
+class TestChatLogFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.directory.name, "chat_2025-01-01.log")
+        self.chat_log = ChatLogFile(self.log_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_recent_lines_newest_first(self):
+        for i in range(5):
+            self.chat_log.append(f"[2025-01-01_10-00-0{i}] USER: message {i} é")
+        self.assertEqual(self.chat_log.read_recent(2), ["[2025-01-01_10-00-04] USER: message 4 é", "[2025-01-01_10-00-03] USER: message 3 é"])
+        self.assertEqual(len(self.chat_log.read_recent(10)), 5)
+        self.assertEqual(self.chat_log.read_recent(0), [])
+
+    def test_missing_log(self):
+        self.assertEqual(self.chat_log.read_recent(5), [])
+
+    def test_logs_without_an_index_are_indexed_on_read(self):
+        with open(self.log_path, "w", encoding="utf-8") as file:
+            file.write("one\ntwo\nthree\n")
+        self.assertEqual(self.chat_log.read_recent(2), ["three", "two"])
+        self.chat_log.append("four")
+        self.assertEqual(self.chat_log.read_recent(4), ["four", "three", "two", "one"])
+        self.assertEqual(os.path.getsize(self.chat_log.index_path), 4 * 8)
+
+    def test_index_behind_the_log_is_caught_up(self):
+        self.chat_log.append("one")
+        with open(self.log_path, "a", encoding="utf-8") as file:
+            file.write("two\n")
+        self.assertEqual(self.chat_log.read_recent(5), ["two", "one"])
+
+    def test_torn_index_write_is_repaired(self):
+        self.chat_log.append("one")
+        self.chat_log.append("two")
+        with open(self.chat_log.index_path, "ab") as file:
+            file.write(b"\x01\x02")
+        with open(self.log_path, "a", encoding="utf-8") as file:
+            file.write("three\n")
+        self.assertEqual(self.chat_log.read_recent(5), ["three", "two", "one"])
+        self.chat_log.append("four")
+        self.assertEqual(self.chat_log.read_recent(5), ["four", "three", "two", "one"])
+
+    def test_long_lines_are_cut(self):
+        self.chat_log.append("x" * 100)
+        self.chat_log.append("short")
+        self.assertEqual(self.chat_log.read_recent(2, max_line_bytes=10), ["short", "x" * 10])
@@ -0,0 +1,100 @@
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from client_pool import ClientPool, _environment_proxy
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"chunk" * 10
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestClientPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.pool = ClientPool(default_idle_timeout=60)
+
+    def age(self, key):
+        self.pool.clients[key]["last_used"] -= 120
+
+    def test_one_client_per_url_and_key(self):
+        client = self.pool.get_client(self.base_url, "key-a")
+        self.assertIs(self.pool.get_client(self.base_url, "key-a"), client)
+        self.assertIsNot(self.pool.get_client(self.base_url, "key-b"), client)
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["clients_opened"], stats["clients_reused"], stats["open_clients"]), (2, 1, 2))
+
+    def test_idle_clients_are_evicted(self):
+        self.pool.get_client(self.base_url, "key-a")
+        self.pool.get_client(self.base_url, "key-b")
+        self.age((self.base_url, "key-a"))
+        self.pool.get_client(self.base_url, "key-b")
+        self.assertEqual(list(self.pool.clients), [(self.base_url, "key-b")])
+        self.assertEqual(self.pool.get_stats()["clients_evicted"], 1)
+
+    def test_client_with_a_request_in_flight_is_not_evicted(self):
+        self.pool.get_client(self.base_url, "key-a")
+        key = (self.base_url, "key-a")
+        entry = self.pool.clients[key]
+        with entry["http_client"].stream("GET", self.base_url + "/models") as response:
+            self.assertEqual(entry["in_use"], 1)
+            self.age(key)
+            self.pool.get_client(self.base_url, "key-b")
+            self.assertIn(key, self.pool.clients)
+            self.assertEqual(b"".join(response.iter_bytes()), b"chunk" * 10)
+        self.assertEqual(entry["in_use"], 0)
+        self.age(key)
+        self.pool.get_client(self.base_url, "key-b")
+        self.assertNotIn(key, self.pool.clients)
+
+    def test_failed_request_is_not_left_in_flight(self):
+        self.pool.get_client("http://127.0.0.1:1/v1", "key-a")
+        entry = self.pool.clients[("http://127.0.0.1:1/v1", "key-a")]
+        with self.assertRaises(Exception):
+            entry["http_client"].get("http://127.0.0.1:1/v1/models")
+        self.assertEqual(entry["in_use"], 0)
+
+    def test_connections_are_reused(self):
+        self.pool.get_client(self.base_url, "key-a")
+        http_client = self.pool.clients[(self.base_url, "key-a")]["http_client"]
+        for _ in range(3):
+            self.assertEqual(http_client.get(self.base_url + "/models").status_code, 200)
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["connections_opened"], stats["connections_reused"]), (1, 2))
+
+    def test_client_talks_to_the_api(self):
+        client = self.pool.get_client(self.base_url, "key-a")
+        self.assertEqual(client.get("/models", cast_to=str), "chunk" * 10)
+
+class TestEnvironmentProxy(unittest.TestCase):
+    def test_proxy_from_the_environment(self):
+        with mock.patch.dict(os.environ, {"HTTPS_PROXY": "proxy.local:3128", "NO_PROXY": "internal.example"}, clear=True):
+            self.assertEqual(_environment_proxy("https://api.example.com/v1"), "http://proxy.local:3128")
+            self.assertIsNone(_environment_proxy("https://internal.example/v1"))
+            self.assertIsNone(_environment_proxy("http://api.example.com/v1"))
+
+    def test_no_proxy(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(_environment_proxy("https://api.example.com/v1"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from conversation_store import ConversationStore
+from fakes import FakeConfigManager
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ConversationStore(max_sessions=2, config_manager_factory=self.config_manager)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def config_manager(self, username):
+        return FakeConfigManager(os.path.join(self.temp_dir.name, username))
+
+    def path(self, conversation_id):
+        return os.path.join(self.temp_dir.name, "alice", "conversations", f"{conversation_id}.jsonl")
+
+    def reopen(self):
+        return ConversationStore(config_manager_factory=self.config_manager)
+
+    def test_new_conversation_is_empty(self):
+        self.assertEqual(self.store.get("alice", "abc"), [])
+        self.assertFalse(os.path.exists(self.path("abc")))
+
+    def test_appends_only_new_messages(self):
+        history = [message("user", "hi"), message("assistant", "hello")]
+        self.store.update("alice", "abc", history)
+        self.store.update("alice", "abc", history + [message("user", "bye")])
+        with open(self.path("abc")) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual(self.reopen().get("alice", "abc"), history + [message("user", "bye")])
+
+    def test_replaced_messages_survive_reload(self):
+        self.store.update("alice", "abc", [message("user", "hi"), message("assistant", "calling a tool")])
+        replaced = [message("user", "hi"), message("user", "tool result"), message("assistant", "done")]
+        self.store.update("alice", "abc", replaced)
+        self.assertEqual(self.store.get("alice", "abc"), replaced)
+        self.assertEqual(self.reopen().get("alice", "abc"), replaced)
+
+    def test_get_returns_a_copy(self):
+        self.store.update("alice", "abc", [message("user", "hi")])
+        self.store.get("alice", "abc").append(message("user", "not saved"))
+        self.assertEqual(self.store.get("alice", "abc"), [message("user", "hi")])
+
+    def test_torn_last_line_is_ignored(self):
+        self.store.update("alice", "abc", [message("user", "hi")])
+        with open(self.path("abc"), "a") as f:
+            f.write('{"role": "assis')
+        self.assertEqual(self.reopen().get("alice", "abc"), [message("user", "hi")])
+
+    def test_file_is_compacted(self):
+        for i in range(20):
+            self.store.update("alice", "abc", [message("user", "hi"), message("assistant", f"reply {i}")])
+        with open(self.path("abc")) as f:
+            self.assertLessEqual(len(f.readlines()), 2 * 2 + 16)
+        self.assertGreater(self.store.get_stats()["compactions"], 0)
+        self.assertEqual(self.reopen().get("alice", "abc"), [message("user", "hi"), message("assistant", "reply 19")])
+
+    def test_least_recently_used_sessions_are_evicted(self):
+        for conversation_id in ("a", "b", "c"):
+            self.store.update("alice", conversation_id, [message("user", conversation_id)])
+        stats = self.store.get_stats()
+        self.assertEqual((stats["sessions"], stats["evictions"]), (2, 1))
+        self.assertEqual(self.store.get("alice", "a"), [message("user", "a")])
+
+    def test_users_are_kept_apart(self):
+        self.store.update("alice", "abc", [message("user", "alice")])
+        self.assertEqual(self.store.get("bob", "abc"), [])
+
+if __name__ == '__main__':
+    unittest.main()
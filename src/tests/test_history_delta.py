@@ -0,0 +1,45 @@
+import unittest
+from history_delta import HistorySync, history_delta, new_conversation_id, valid_conversation_id
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+def apply(history, frame):
+    return history[:frame["base"]] + frame["messages"]
+
+class TestHistoryDelta(unittest.TestCase):
+    def test_appended_messages(self):
+        previous = [message("user", "hi"), message("assistant", "hello")]
+        current = previous + [message("user", "how are you?")]
+        self.assertEqual(history_delta(previous, current), (2, [message("user", "how are you?")]))
+
+    def test_replaced_messages(self):
+        previous = [message("user", "hi"), message("assistant", "hello"), message("user", "weather?")]
+        current = [message("user", "hi"), message("user", "tool result")]
+        self.assertEqual(history_delta(previous, current), (1, [message("user", "tool result")]))
+
+    def test_unchanged(self):
+        history = [message("user", "hi")]
+        self.assertEqual(history_delta(history, list(history)), (1, []))
+
+class TestHistorySync(unittest.TestCase):
+    def test_client_converges_over_tool_loop(self):
+        client = [message("user", "hi"), message("assistant", "hello")]
+        sync = HistorySync("abc", client)
+        first = client + [message("user", "weather?")]
+        frame = sync.delta(first)
+        self.assertEqual(frame, {"type": "history_delta", "conversation_id": "abc", "base": 2, "messages": [message("user", "weather?")]})
+        client = apply(client, frame)
+        second = client[:1] + [message("user", "tool result"), message("user", "tool result")]
+        client = apply(client, sync.delta(second))
+        self.assertEqual(client, second)
+        self.assertIsNone(sync.delta(second))
+
+    def test_conversation_ids(self):
+        self.assertTrue(valid_conversation_id(new_conversation_id()))
+        self.assertFalse(valid_conversation_id("../etc/passwd"))
+        self.assertFalse(valid_conversation_id(""))
+        self.assertFalse(valid_conversation_id(None))
+
+if __name__ == '__main__':
+    unittest.main()
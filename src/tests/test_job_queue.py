@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from job_queue import JobQueue
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "jobs.db")
+        self.queue = JobQueue(self.db_path, max_attempts=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_coalesces_pending_jobs_with_the_same_key(self):
+        self.queue.put("memory_builder", ["user", "beth", "first"], "user/beth")
+        self.queue.put("memory_builder", ["user", "anne", "other"], "user/anne")
+        self.queue.put("memory_builder", ["user", "beth", "second"], "user/beth")
+        self.assertEqual(self.queue.depth("memory_builder"), 2)
+        self.assertEqual(self.queue.get("memory_builder").args, ["user", "beth", "second"])
+
+    def test_jobs_without_a_key_are_not_coalesced(self):
+        self.queue.put("indexer", ["a"])
+        self.queue.put("indexer", ["a"])
+        self.assertEqual(self.queue.depth("indexer"), 2)
+
+    def test_running_job_does_not_absorb_new_jobs(self):
+        self.queue.put("memory_builder", ["first"], "user/beth")
+        self.queue.get("memory_builder")
+        self.queue.put("memory_builder", ["second"], "user/beth")
+        self.assertEqual(self.queue.depth("memory_builder"), 1)
+
+    def test_recovers_interrupted_jobs(self):
+        self.queue.put("indexer", ["a"])
+        self.queue.get("indexer")
+        restarted = JobQueue(self.db_path)
+        self.assertEqual(restarted.depth("indexer"), 1)
+        self.assertEqual(restarted.get("indexer").args, ["a"])
+
+    def test_ack_removes_job(self):
+        self.queue.put("indexer", ["a"])
+        self.queue.ack(self.queue.get("indexer"))
+        self.assertEqual(JobQueue(self.db_path).depth("indexer"), 0)
+
+    def test_retry_until_max_attempts(self):
+        self.queue.put("indexer", ["a"])
+        self.queue.retry(self.queue.get("indexer"))
+        self.assertEqual(self.queue.depth("indexer"), 1)
+        self.queue.retry(self.queue.get("indexer"))
+        self.assertEqual(self.queue.depth("indexer"), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from LogIndex import LogIndex, get_log_index
+
+class TestLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = LogIndex(os.path.join(self.directory.name, "index.db"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_or_and_and_queries(self):
+        self.index.add_messages([("user", "I adopted a dog"), ("assistant", "Dogs need walks")], timestamp="2025-01-01_10-00-00")
+        self.index.add_messages([("user", "My cat sleeps all day")], timestamp="2025-01-02_10-00-00")
+        self.index.add_messages([("user", "The dog chased the cat")], timestamp="2025-01-03_10-00-00")
+        self.assertEqual(len(self.index.search(["dog", "cat"])), 4)
+        self.assertEqual(self.index.search(["dog", "cat"], "and"), ["[2025-01-03_10-00-00] [USER] The dog chased the cat"])
+        with self.assertRaises(ValueError):
+            self.index.search(["dog"], "xor")
+
+    def test_multi_word_terms_need_every_word(self):
+        self.index.add_messages([("user", "machine learning is fun")], timestamp="2025-01-01_10-00-00")
+        self.index.add_messages([("user", "the machine broke")], timestamp="2025-01-01_10-00-01")
+        self.assertEqual(self.index.search(["machine learning"]), ["[2025-01-01_10-00-00] [USER] machine learning is fun"])
+
+    def test_ranking_prefers_more_matches(self):
+        self.index.add_messages([("user", "python")], timestamp="2025-01-01_10-00-00")
+        self.index.add_messages([("user", "python python snakes")], timestamp="2025-01-01_10-00-00")
+        self.index.add_messages([("user", "unrelated words here")], timestamp="2025-01-01_10-00-00")
+        results = self.index.search(["python", "snakes"], limit=1)
+        self.assertEqual(results, ["[2025-01-01_10-00-00] [USER] python python snakes"])
+
+    def test_tags_are_searchable_and_counted(self):
+        self.index.add_messages([("user", "What should I cook?"), ("assistant", "Try pasta")], ["dinner", "recipes"])
+        self.index.add_messages([("user", "Any dessert ideas?")], ["recipes"])
+        self.assertEqual(len(self.index.search(["dinner"])), 2)
+        self.assertEqual(self.index.get_tags(), ["recipes", "dinner"])
+        self.assertEqual(self.index.get_tags(1), ["recipes"])
+
+    def test_duplicates_are_skipped_and_newlines_escaped(self):
+        self.assertEqual(self.index.add_messages([("user", "line one\nline two")], timestamp="2025-01-01_10-00-00"), 1)
+        self.assertEqual(self.index.add_messages([("user", "line one\nline two")], timestamp="2025-01-01_10-00-00"), 0)
+        self.assertEqual(self.index.search(["two"]), ["[2025-01-01_10-00-00] [USER] line one\\nline two"])
+
+    def test_legacy_term_logs_are_migrated_once(self):
+        logs_directory = self.directory.name
+        legacy_dir = os.path.join(logs_directory, "index", "leah")
+        os.makedirs(legacy_dir)
+        for term in ("travel", "japan"):
+            with open(os.path.join(legacy_dir, f"{term}.log"), "w", encoding="utf-8") as file:
+                file.write("[2025-01-01_10-00-00] [USER] Planning a trip to Tokyo\n")
+                file.write("[2025-01-01_10-00-00] [ASSISTANT] Spring is\\nlovely there\n")
+        index = get_log_index(logs_directory, "leah")
+        self.assertFalse(os.path.exists(legacy_dir))
+        self.assertEqual(sorted(index.get_tags()), ["japan", "travel"])
+        self.assertEqual(len(index.search(["japan"])), 2)
+        self.assertEqual(index.search(["lovely"]), ["[2025-01-01_10-00-00] [ASSISTANT] Spring is\\nlovely there"])
+
+    def test_migration_does_not_block_other_indexes(self):
+        migrating = threading.Event()
+        release = threading.Event()
+        def slow_migration(index, index_dir):
+            migrating.set()
+            release.wait(5)
+            return 0
+        os.makedirs(os.path.join(self.directory.name, "beth", "index", "leah"))
+        with mock.patch.object(LogIndex, "migrate_term_logs", slow_migration):
+            thread = threading.Thread(target=get_log_index, args=(os.path.join(self.directory.name, "beth"), "leah"))
+            thread.start()
+            self.assertTrue(migrating.wait(5))
+            other_ready = threading.Event()
+            threading.Thread(target=lambda: (get_log_index(os.path.join(self.directory.name, "anne"), "leah"), other_ready.set())).start()
+            try:
+                self.assertTrue(other_ready.wait(1))
+            finally:
+                release.set()
+                thread.join()
+
+    def test_plurals_match_through_stemming(self):
+        self.index.add_messages([("user", "We talked about my cats")], timestamp="2025-01-01_10-00-00")
+        self.assertEqual(self.index.search(["cat"]), ["[2025-01-01_10-00-00] [USER] We talked about my cats"])
+
+    def test_search_text_uses_query_and_rare_context_terms(self):
+        self.index.add_messages([("user", "Booking flights to Lisbon")], timestamp="2025-01-01_10-00-00")
+        self.index.add_messages([("user", "Lisbon hotels near the river")], timestamp="2025-01-02_10-00-00")
+        self.index.add_messages([("user", "Recipe for lemon cake")], timestamp="2025-01-03_10-00-00")
+        self.assertEqual(self.index.search_text("What did we say about flights?"), ["[2025-01-01_10-00-00] [USER] Booking flights to Lisbon"])
+        self.assertEqual(len(self.index.search_text("and the hotels?", "You asked about Lisbon")), 2)
+        self.assertEqual(self.index.search_text("what is it"), [])
+
+    def test_analyzer_change_rebuilds_the_index(self):
+        self.index.add_messages([("user", "Gardening tips")], ["plants"], timestamp="2025-01-01_10-00-00")
+        connection = self.index._get_connection()
+        connection.execute("DELETE FROM postings")
+        connection.execute("UPDATE meta SET value = '0' WHERE key = 'analyzer_version'")
+        reopened = LogIndex(self.index.db_path)
+        self.assertEqual(len(reopened.search(["garden"])), 1)
+        self.assertEqual(len(reopened.search(["plant"])), 1)
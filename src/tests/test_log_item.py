@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime
+from LogItem import LogCollection, LogItem, parse_log_date
+
+class TestLogItem(unittest.TestCase):
+    def test_parse_log_date_matches_strptime(self):
+        for date_str in ['[2025-01-02_03-04-05]', '[1999-12-31_23-59-59]']:
+            self.assertEqual(parse_log_date(date_str), datetime.strptime(date_str, '[%Y-%m-%d_%H-%M-%S]'))
+
+    def test_parse_log_date_rejects_other_formats(self):
+        for date_str in ['2025-01-02_03-04-05', '[2025-01-02 03:04:05]', '[2025-13-02_03-04-05]', '[2025-01-02_03-04-0x]']:
+            with self.assertRaises(ValueError):
+                parse_log_date(date_str)
+
+    def test_from_log_line(self):
+        log_item = LogItem.fromLogLine('[2025-01-02_03-04-05] [USER] hello\\nthere')
+        self.assertEqual(log_item.user_type, '[USER]')
+        self.assertEqual(log_item.message, 'hello\nthere')
+        self.assertIsNone(LogItem.fromLogLine('[2025-01-02_03-04-05]'))
+        with self.assertRaises(AttributeError):
+            log_item.extra = 1
+
+    def test_from_log_lines_sorts_and_dedupes(self):
+        lines = [
+            '[2025-01-03_00-00-00] [USER] third',
+            '[2025-01-01_00-00-00] [USER] first',
+            '[2025-01-03_00-00-00] [USER] third',
+            '[2025-01-02_00-00-00] [ASSISTANT] second',
+            'malformed',
+        ]
+        collection = LogCollection.fromLogLines(lines)
+        self.assertEqual([log.message for log in collection.logs], ['first', 'second', 'third'])
+
+    def test_bulk_build_matches_incremental_build(self):
+        lines = [f'[2025-01-0{i % 9 + 1}_00-00-00] [USER] message {i % 7}' for i in range(50)]
+        incremental = LogCollection()
+        for line in lines:
+            incremental.add_log(LogItem.fromLogLine(line))
+        bulk = LogCollection.fromLogLines(lines)
+        self.assertEqual([(log.date, log.message) for log in bulk.logs], [(log.date, log.message) for log in incremental.logs])
+
+    def test_from_sorted_log_lines_merges_groups(self):
+        day_one = ['[2025-01-01_09-00-00] [USER] a', '[2025-01-01_10-00-00] [USER] c']
+        day_two = ['[2025-01-01_09-30-00] [USER] b', '[2025-01-01_10-00-00] [USER] c']
+        collection = LogCollection.fromSortedLogLines(day_one, day_two)
+        self.assertEqual([log.message for log in collection.logs], ['a', 'b', 'c'])
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+from prefetch import Prefetcher
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.prefetcher = Prefetcher(max_workers=3, max_abandoned=2)
+
+    def tearDown(self):
+        self.release.set()
+        self.prefetcher.executor.shutdown(wait=True)
+
+    def slow(self):
+        self.release.wait(5)
+        return "slow"
+
+    def test_results_and_failures(self):
+        def fail():
+            raise ValueError("no terms")
+        results, skipped = self.prefetcher.run({"logs": lambda: ["log"], "terms": fail}, 1)
+        self.assertEqual(results, {"logs": ["log"]})
+        self.assertEqual(skipped, ["terms"])
+
+    def test_slow_step_does_not_delay_the_next_query(self):
+        results, skipped = self.prefetcher.run({"terms": self.slow, "logs": lambda: "logs"}, 0.05)
+        self.assertEqual((results, skipped), ({"logs": "logs"}, ["terms"]))
+        started = time.monotonic()
+        self.assertEqual(self.prefetcher.run({"logs": lambda: "next"}, 1), ({"logs": "next"}, []))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_steps_that_never_started_are_cancelled(self):
+        ran = []
+        prefetcher = Prefetcher(max_workers=1)
+        results, skipped = prefetcher.run({"terms": self.slow, "notes": lambda: ran.append("notes")}, 0.05)
+        self.assertEqual(skipped, ["terms", "notes"])
+        self.assertEqual(prefetcher.abandoned, 1)
+        self.release.set()
+        prefetcher.executor.shutdown(wait=True)
+        self.assertEqual(ran, [])
+        self.assertEqual(prefetcher.abandoned, 0)
+
+    def test_steps_are_skipped_while_abandoned_steps_hold_the_pool(self):
+        self.prefetcher.run({"terms": self.slow, "notes": self.slow}, 0.05)
+        started = time.monotonic()
+        self.assertEqual(self.prefetcher.run({"logs": lambda: "logs"}, 1), ({}, ["logs"]))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.release.set()
+        self.prefetcher.executor.shutdown(wait=True)
+        self.assertEqual(self.prefetcher.abandoned, 0)
+
+if __name__ == '__main__':
+    unittest.main()
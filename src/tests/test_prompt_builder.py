@@ -0,0 +1,117 @@
+import unittest
+from prompt_builder import (PromptBuilder, TRUNCATION_MARKER, build_chat_prompt, chunk_by_tokens, create_prompt_builder,
+                            estimate_message_tokens, estimate_tokens, truncate_to_tokens)
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+class TestEstimateTokens(unittest.TestCase):
+    def test_ascii_is_about_four_characters_per_token(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcd"), 1)
+        self.assertEqual(estimate_tokens("abcde"), 2)
+        self.assertEqual(estimate_tokens("a" * 400), 100)
+
+    def test_other_scripts_count_a_token_per_character(self):
+        self.assertEqual(estimate_tokens("日本語"), 3)
+        self.assertEqual(estimate_tokens("abcd日本"), 3)
+
+class TestTruncateToTokens(unittest.TestCase):
+    def test_text_that_fits_is_unchanged(self):
+        self.assertEqual(truncate_to_tokens("short text", 10), "short text")
+
+    def test_keeps_start_and_end(self):
+        text = "START " + "filler " * 500 + " END"
+        result = truncate_to_tokens(text, 50)
+        self.assertLessEqual(estimate_tokens(result), 50)
+        self.assertTrue(result.startswith("START"))
+        self.assertTrue(result.endswith("END"))
+        self.assertIn(TRUNCATION_MARKER, result)
+
+    def test_tiny_budget(self):
+        self.assertEqual(truncate_to_tokens("word " * 100, 1), "")
+        self.assertEqual(truncate_to_tokens("word " * 100, 0), "")
+
+class TestChunkByTokens(unittest.TestCase):
+    def test_chunks_fit_and_keep_every_word(self):
+        text = " ".join(f"word{i}" for i in range(1000))
+        chunks = chunk_by_tokens(text, 100)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 100)
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_text_without_spaces(self):
+        chunks = chunk_by_tokens("日本語" * 50, 20)
+        self.assertEqual("".join(chunks), "日本語" * 50)
+        self.assertTrue(all(estimate_tokens(chunk) <= 20 for chunk in chunks))
+
+    def test_empty_text(self):
+        self.assertEqual(chunk_by_tokens("   ", 10), [])
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_everything_fits(self):
+        builder = PromptBuilder(context_window=1000, reserved_tokens=100)
+        builder.add("system", "You are helpful.", 0)
+        history = [message("user", "hi"), message("assistant", "hello")]
+        builder.add_history(history, 1)
+        prompt = builder.build()
+        self.assertEqual(prompt.sections, {"system": "You are helpful."})
+        self.assertEqual(prompt.history, history)
+        self.assertEqual(prompt.dropped_messages, 0)
+        self.assertEqual(prompt.tokens, estimate_tokens("You are helpful.") + sum(map(estimate_message_tokens, history)))
+
+    def test_oldest_history_is_dropped_first(self):
+        builder = PromptBuilder(context_window=100, reserved_tokens=0)
+        builder.add("system", "s" * 200, 0)
+        history = [message("user", "x" * 80) for _ in range(5)] + [message("user", "newest")]
+        builder.add_history(history, 1)
+        prompt = builder.build()
+        self.assertEqual(prompt.history, history[-2:])
+        self.assertEqual(prompt.dropped_messages, 4)
+        self.assertLessEqual(prompt.tokens, 100)
+
+    def test_shares_cap_sections(self):
+        builder = PromptBuilder(context_window=1000, reserved_tokens=0)
+        builder.add("memories", "m" * 4000, 1, max_share=0.25)
+        builder.add("logs", "l" * 4000, 2)
+        prompt = builder.build()
+        self.assertLessEqual(estimate_tokens(prompt.sections["memories"]), 250)
+        self.assertLessEqual(estimate_tokens(prompt.sections["logs"]), 1000 - estimate_tokens(prompt.sections["memories"]))
+        self.assertLessEqual(prompt.tokens, 1000)
+
+    def test_priority_decides_who_is_cut(self):
+        builder = PromptBuilder(context_window=100, reserved_tokens=0)
+        builder.add("logs", "l" * 400, 2)
+        builder.add("system", "s" * 200, 0)
+        prompt = builder.build()
+        self.assertEqual(prompt.sections["system"], "s" * 200)
+        self.assertLessEqual(estimate_tokens(prompt.sections["logs"]), 50)
+
+    def test_create_uses_defaults(self):
+        self.assertEqual(create_prompt_builder({}).available, 8192 - 1024)
+        self.assertEqual(create_prompt_builder({"context_window": 100, "reserved_tokens": 200}).available, 0)
+
+class TestBuildChatPrompt(unittest.TestCase):
+    def test_only_the_copies_sent_to_the_model_are_cut(self):
+        query = "TOOL RESULT " + "page text " * 2000 + " QUESTION"
+        history = [message("user", "old " * 200), message("assistant", "reply " * 200), message("user", "recent")]
+        original_history = [dict(entry) for entry in history]
+        system_content, prompt_query, prompt_history = build_chat_prompt(
+            {"context_window": 1000, "reserved_tokens": 0}, "You are helpful.", query, history,
+            memories="These are your memories", logs="These are some logs")
+        self.assertLessEqual(estimate_tokens(prompt_query), 500)
+        self.assertTrue(prompt_query.startswith("TOOL RESULT") and prompt_query.endswith("QUESTION"))
+        self.assertEqual(query, "TOOL RESULT " + "page text " * 2000 + " QUESTION")
+        self.assertEqual(history, original_history)
+        self.assertEqual(prompt_history[-1], message("user", "recent"))
+        self.assertLess(len(prompt_history), len(history))
+        self.assertEqual(system_content, "You are helpful.\n\nThese are your memories\n\nThese are some logs")
+
+    def test_prompt_that_fits_is_unchanged(self):
+        history = [message("user", "hi")]
+        self.assertEqual(build_chat_prompt({}, "System", "Query", history, tools="Tools"),
+                         ("System\n\nTools", "Query", history))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import unittest
+from fakes import FakeClock
+from sse_writer import SSEWriter, create_sse_writer, sse_frame
+
+def parse_frames(frames):
+    return [json.loads(frame[len("data: "):]) for frame in frames.split("\n\n") if frame]
+
+class TestSSEWriter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.writer = SSEWriter(max_delay=0.03, max_bytes=20, clock=self.clock)
+
+    def test_deltas_are_coalesced(self):
+        self.assertEqual(self.writer.content("Hel"), "")
+        self.assertEqual(self.writer.content("lo"), "")
+        self.assertEqual(parse_frames(self.writer.flush()), [{'content': 'Hello'}])
+        self.assertEqual(self.writer.flush(), "")
+
+    def test_flushes_after_time_window(self):
+        self.writer.content("one")
+        self.clock.now = 0.02
+        self.assertEqual(self.writer.content(" two"), "")
+        self.clock.now = 0.031
+        self.assertEqual(parse_frames(self.writer.content(" three")), [{'content': 'one two three'}])
+
+    def test_time_window_starts_with_first_pending_delta(self):
+        self.clock.now = 5.0
+        self.assertEqual(self.writer.content("a"), "")
+        self.clock.now = 5.02
+        self.assertEqual(self.writer.content("b"), "")
+
+    def test_flushes_on_byte_threshold(self):
+        self.assertEqual(self.writer.content("0123456789"), "")
+        self.assertEqual(parse_frames(self.writer.content("0123456789")), [{'content': '01234567890123456789'}])
+
+    def test_byte_threshold_counts_encoded_bytes(self):
+        # Ten characters of three bytes each pass a 20 byte threshold
+        self.assertEqual(parse_frames(self.writer.content("日本語日本語日本語日")), [{'content': '日本語日本語日本語日'}])
+
+    def test_flushes_on_sentence_boundary(self):
+        self.writer.content("Hi")
+        self.assertEqual(parse_frames(self.writer.content(" there.")), [{'content': 'Hi there.'}])
+        self.writer.content("Pi is 3")
+        self.assertEqual(self.writer.content(".14"), "")
+        self.assertEqual(parse_frames(self.writer.content("\n")), [{'content': 'Pi is 3.14\n'}])
+
+    def test_sentence_boundary_can_be_disabled(self):
+        writer = SSEWriter(max_delay=1, max_bytes=0, sentence_boundary=False, clock=self.clock)
+        self.assertEqual(writer.content("Done. "), "")
+
+    def test_control_frames_flush_pending_content_first(self):
+        self.writer.content("Hi")
+        frames = self.writer.control(sse_frame({'filename': 'clip.mp3'}))
+        self.assertEqual(parse_frames(frames), [{'content': 'Hi'}, {'filename': 'clip.mp3'}])
+        self.assertEqual(parse_frames(self.writer.event({'type': 'end'})), [{'type': 'end'}])
+
+    def test_zero_delay_sends_every_delta(self):
+        writer = create_sse_writer({'max_delay_ms': 0})
+        self.assertEqual(parse_frames(writer.content("a")), [{'content': 'a'}])
+        self.assertEqual(parse_frames(writer.content("b")), [{'content': 'b'}])
+
+    def test_create_uses_defaults(self):
+        writer = create_sse_writer({})
+        self.assertEqual((writer.max_delay, writer.max_bytes, writer.sentence_boundary), (0.03, 512, True))
+
+if __name__ == '__main__':
+    unittest.main()
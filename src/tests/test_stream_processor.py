@@ -1,5 +1,6 @@
+import random
 import unittest
-from stream_processor import StreamProcessor
+from stream_processor import MultiStreamProcessor, StreamProcessor
 
 class TestStreamProcessor(unittest.TestCase):
     def setUp(self):
@@ -35,5 +36,75 @@ class TestStreamProcessor(unittest.TestCase):
         self.assertEqual(result, 'Data  more data')
         self.assertEqual(self.json_processor.matches, ['\n\n{"key": "value"}\n\n'])
 
+class TestMultiStreamProcessor(unittest.TestCase):
+    DELIMITERS = [("<think>", "</think>"), ("```tool_code", "```"), ("```json", "```")]
+
+    def run_chained(self, chunks):
+        processors = [StreamProcessor(start, end) for start, end in self.DELIMITERS]
+        output = ""
+        for chunk in chunks:
+            for processor in processors:
+                chunk = processor.process_chunk(chunk)
+            output += chunk
+        return output, [processor.matches for processor in processors]
+
+    def run_multi(self, chunks):
+        processor = MultiStreamProcessor(self.DELIMITERS)
+        output = "".join(processor.process_chunk(chunk) for chunk in chunks)
+        return output, [processor.matches[start] for start, _ in self.DELIMITERS]
+
+    def split(self, text, rng):
+        chunks = []
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 12)
+            chunks.append(text[position:position + size])
+            position += size
+        return chunks
+
+    def test_same_output_and_matches_as_chained_processors(self):
+        rng = random.Random(7)
+        blocks = [
+            "<think>Let me think about a < b and `x` here.\nStep 2...</think>",
+            "```tool_code\n{\"tool\": \"search\"}\n```",
+            "```json\n{\"key\": \"value\"}\n```",
+        ]
+        fillers = ["Hello there. ", "Some words, more words!\n", "a < b is true for these numbers. ",
+                   "Use the `print` function to write output. ", ""]
+        for _ in range(300):
+            parts = [rng.choice(fillers) + "padding text " for _ in range(rng.randint(1, 6))]
+            for _ in range(rng.randint(0, 3)):
+                parts.insert(rng.randint(0, len(parts)), rng.choice(blocks) + " then more text ")
+            # The chained processors hold back a closing ``` until 12 more characters arrive, and
+            # don't rescan those characters, so blocks are kept apart from each other and the end
+            text = "".join(parts) + " and that is all."
+            chunks = self.split(text, rng)
+            self.assertEqual(self.run_multi(chunks), self.run_chained(chunks), text)
+
+    def test_delimiters_split_across_chunks(self):
+        processor = MultiStreamProcessor(self.DELIMITERS)
+        output = "".join(processor.process_chunk(chunk) for chunk in ["Hi <", "thi", "nk>deep</th", "ink> there ``", "`json{}`", "`` done"])
+        self.assertEqual(output, "Hi  there  done")
+        self.assertEqual(processor.get_matches("<think>"), ["deep"])
+        self.assertEqual(processor.get_matches("```tool_code", "```json"), ["{}"])
+
+    def test_flush_returns_a_held_back_false_start(self):
+        processor = MultiStreamProcessor(self.DELIMITERS)
+        self.assertEqual(processor.process_chunk("I love you <"), "I love you ")
+        self.assertEqual(processor.flush(), "<")
+        processor.process_chunk("<think>never closed")
+        self.assertEqual(processor.flush(), "")
+
+    def test_block_at_the_end_of_the_stream(self):
+        processor = MultiStreamProcessor(self.DELIMITERS)
+        processor.process_chunk('Calling it now ```json{"tool": "search"}```')
+        self.assertEqual(processor.get_matches("```json"), ['{"tool": "search"}'])
+
+    def test_inline_code_right_before_a_block(self):
+        processor = MultiStreamProcessor(self.DELIMITERS)
+        output = processor.process_chunk('Run `a` ```json{"b": 1}``` ok')
+        self.assertEqual(output, "Run `a`  ok")
+        self.assertEqual(processor.get_matches("```json"), ['{"b": 1}'])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
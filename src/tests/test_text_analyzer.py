@@ -0,0 +1,18 @@
+import unittest
+from text_analyzer import analyze, stem
+
+class TestTextAnalyzer(unittest.TestCase):
+    def test_plurals_and_verb_forms_share_a_stem(self):
+        self.assertEqual(stem("cats"), stem("cat"))
+        self.assertEqual(stem("boxes"), stem("box"))
+        self.assertEqual(stem("stories"), stem("story"))
+        self.assertEqual(stem("running"), stem("run"))
+        self.assertEqual(stem("cooked"), stem("cooking"))
+
+    def test_short_words_and_numbers_are_kept(self):
+        self.assertEqual(stem("is"), "is")
+        self.assertEqual(stem("2025"), "2025")
+        self.assertEqual(stem("class"), "class")
+
+    def test_stop_words_are_removed(self):
+        self.assertEqual(analyze("What is the weather like in Paris?"), ["weather", "like", "paris"])
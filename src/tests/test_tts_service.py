@@ -0,0 +1,200 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from tts_service import ClipStream, TTSService, voice_cache_filename
+
+class FakeCommunicate:
+    """Stands in for edge_tts.Communicate, speaking each text as its bytes in two chunks."""
+    release = None
+    fail = False
+
+    def __init__(self, text, voice):
+        self.text = text
+
+    async def stream(self):
+        data = self.text.encode("utf-8")
+        yield {"type": "WordBoundary"}
+        yield {"type": "audio", "data": data[:2]}
+        if FakeCommunicate.release is not None and self.text == "blocker":
+            while not FakeCommunicate.release.is_set():
+                await asyncio.sleep(0.001)
+        if FakeCommunicate.fail:
+            raise RuntimeError("connection lost")
+        yield {"type": "audio", "data": data[2:]}
+
+class TestVoiceCacheFilename(unittest.TestCase):
+    def test_whitespace_is_normalized(self):
+        self.assertEqual(voice_cache_filename("en-US-AvaNeural", "Hello  there\n"),
+                         voice_cache_filename("en-US-AvaNeural", " Hello there"))
+        self.assertNotEqual(voice_cache_filename("en-US-AvaNeural", "Hello there"),
+                            voice_cache_filename("en-GB-SoniaNeural", "Hello there"))
+        self.assertTrue(voice_cache_filename("en-US-AvaNeural", "Hello").startswith("en-US-AvaNeural_"))
+
+class TestClipStream(unittest.TestCase):
+    def test_readers_get_every_chunk_from_the_start(self):
+        clip = ClipStream("clip.mp3", "text", "voice")
+        clip.append(b"ab")
+        reader = clip.iter_chunks(timeout=1)
+        self.assertEqual(next(reader), b"ab")
+        threading.Timer(0.01, lambda: (clip.append(b"cd"), clip.finish())).start()
+        self.assertEqual(list(reader), [b"cd"])
+        self.assertEqual(b"".join(clip.iter_chunks(timeout=1)), b"abcd")
+
+    def test_stream_ends_on_error_or_timeout(self):
+        clip = ClipStream("clip.mp3", "text", "voice")
+        clip.append(b"ab")
+        self.assertEqual(list(clip.iter_chunks(timeout=0.01)), [b"ab"])
+        clip.finish(RuntimeError("connection lost"))
+        self.assertEqual(list(clip.iter_chunks(timeout=0.01)), [b"ab"])
+
+class TestTTSService(unittest.TestCase):
+    def setUp(self):
+        self.voice_dir = tempfile.mkdtemp()
+        self.started = []
+        self.completed = []
+        self.all_completed = threading.Event()
+        self.expected = 0
+        FakeCommunicate.release = threading.Event()
+        FakeCommunicate.fail = False
+        patcher = mock.patch("tts_service.edge_tts.Communicate", FakeCommunicate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = TTSService(self.voice_dir, concurrency=1, on_start=self.started.append, on_complete=self.on_complete)
+        self.service.start()
+
+    def tearDown(self):
+        FakeCommunicate.release.set()
+        asyncio.run_coroutine_threadsafe(self.cancel_tasks(), self.service.loop).result(1)
+        self.service.loop.call_soon_threadsafe(self.service.loop.stop)
+        self.service.thread.join(1)
+        self.service.loop.close()
+        shutil.rmtree(self.voice_dir)
+
+    async def cancel_tasks(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def on_complete(self, filename, succeeded):
+        self.completed.append((filename, succeeded))
+        if len(self.completed) >= self.expected:
+            self.all_completed.set()
+
+    def wait_for_start(self, filename):
+        deadline = time.monotonic() + 1
+        while filename not in self.started and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def test_higher_priority_clips_are_synthesized_first(self):
+        self.expected = 4
+        self.service.submit("blocker.mp3", "blocker", "voice")
+        self.wait_for_start("blocker.mp3")
+        self.service.submit("c.mp3", "ccc", "voice", priority=2)
+        self.service.submit("b.mp3", "bbb", "voice", priority=1)
+        self.service.submit("a.mp3", "aaa", "voice", priority=0)
+        self.service.open_stream("c.mp3")
+        FakeCommunicate.release.set()
+        self.assertTrue(self.all_completed.wait(1))
+        self.assertEqual(self.started, ["blocker.mp3", "c.mp3", "a.mp3", "b.mp3"])
+        self.assertEqual(self.service.get_stats()["synthesized"], 4)
+
+    def test_clip_is_written_through_a_part_file(self):
+        self.expected = 1
+        path = os.path.join(self.voice_dir, "blocker.mp3")
+        clip = self.service.submit("blocker.mp3", "blocker", "voice")
+        self.wait_for_start("blocker.mp3")
+        self.assertEqual(next(clip.iter_chunks(timeout=1)), b"bl")
+        self.assertTrue(os.path.exists(path + ".part"))
+        self.assertFalse(os.path.exists(path))
+        FakeCommunicate.release.set()
+        self.assertTrue(self.all_completed.wait(1))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"blocker")
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_failed_clip_leaves_no_file(self):
+        self.expected = 1
+        FakeCommunicate.fail = True
+        clip = self.service.submit("fail.mp3", "failing", "voice")
+        self.assertTrue(self.all_completed.wait(1))
+        self.assertEqual(self.completed, [("fail.mp3", False)])
+        self.assertIsInstance(clip.error, RuntimeError)
+        self.assertEqual(os.listdir(self.voice_dir), [])
+
+    def test_requests_share_one_stream(self):
+        self.expected = 1
+        clip = self.service.submit("blocker.mp3", "blocker", "voice")
+        self.assertIs(self.service.submit("blocker.mp3", "blocker", "voice"), clip)
+        self.wait_for_start("blocker.mp3")
+        self.assertIs(self.service.open_stream("blocker.mp3"), clip)
+        readers = [clip.iter_chunks(timeout=1) for _ in range(2)]
+        FakeCommunicate.release.set()
+        self.assertEqual([b"".join(reader) for reader in readers], [b"blocker", b"blocker"])
+        self.assertTrue(self.all_completed.wait(1))
+        self.assertEqual(self.started, ["blocker.mp3"])
+        self.assertIsNone(self.service.open_stream("blocker.mp3", "blocker", "voice"))
+
+    def test_cancelled_clip_is_not_synthesized(self):
+        self.expected = 2
+        self.service.submit("blocker.mp3", "blocker", "voice")
+        self.wait_for_start("blocker.mp3")
+        clip = self.service.submit("a.mp3", "aaa", "voice")
+        self.assertTrue(self.service.cancel("a.mp3"))
+        self.assertFalse(self.service.cancel("blocker.mp3"))
+        self.assertEqual(list(clip.iter_chunks(timeout=1)), [])
+        self.service.submit("b.mp3", "bbb", "voice")
+        FakeCommunicate.release.set()
+        self.assertTrue(self.all_completed.wait(1))
+        self.assertEqual(self.started, ["blocker.mp3", "b.mp3"])
+
+class TestVoiceCacheSweep(unittest.TestCase):
+    def setUp(self):
+        self.voice_dir = tempfile.mkdtemp()
+        self.service = TTSService(self.voice_dir, max_cache_bytes=250, max_cache_age=3600)
+        self.now = time.time()
+
+    def tearDown(self):
+        shutil.rmtree(self.voice_dir)
+
+    def write_clip(self, name, size, age):
+        path = os.path.join(self.voice_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        os.utime(path, (self.now - age, self.now - age))
+
+    def test_old_clips_are_removed(self):
+        self.write_clip("old.mp3", 10, 7200)
+        self.write_clip("new.mp3", 10, 60)
+        self.assertEqual(self.service.sweep(), 1)
+        self.assertEqual(os.listdir(self.voice_dir), ["new.mp3"])
+
+    def test_least_recently_used_clips_are_removed_over_budget(self):
+        for i, age in enumerate([300, 100, 200]):
+            self.write_clip(f"{i}.mp3", 100, age)
+        self.assertEqual(self.service.sweep(), 1)
+        self.assertEqual(sorted(os.listdir(self.voice_dir)), ["1.mp3", "2.mp3"])
+        self.assertEqual(self.service.get_stats()["evicted"], 1)
+
+    def test_cache_hits_refresh_a_clip(self):
+        self.write_clip("0.mp3", 100, 300)
+        self.write_clip("1.mp3", 100, 200)
+        self.write_clip("2.mp3", 100, 100)
+        self.assertTrue(self.service.has_clip("0.mp3"))
+        self.assertFalse(self.service.has_clip("missing.mp3"))
+        self.service.sweep()
+        self.assertEqual(sorted(os.listdir(self.voice_dir)), ["0.mp3", "2.mp3"])
+
+    def test_only_abandoned_part_files_are_removed(self):
+        self.write_clip("writing.mp3.part", 10, 60)
+        self.write_clip("abandoned.mp3.part", 10, 7200)
+        self.service.sweep()
+        self.assertEqual(os.listdir(self.voice_dir), ["writing.mp3.part"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from VectorIndex import VectorIndex, chunk_text, index_notes
+
+class FakeNotes:
+    def __init__(self, notes_directory):
+        self.notes_directory = notes_directory
+
+    def get_all_notes(self):
+        return [name for name in os.listdir(self.notes_directory) if name.endswith(".txt")]
+
+    def get_note(self, note_name):
+        with open(os.path.join(self.notes_directory, note_name)) as f:
+            return f.read()
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = VectorIndex(self.directory.name, block_rows=3)
+        self.vectors = np.random.default_rng(0).normal(size=(10, 8))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_nearest_items_first_across_blocks(self):
+        self.index.add("message", "chat", [f"m{i}" for i in range(10)], self.vectors)
+        results = self.index.search([self.vectors[4], self.vectors[7]], k=3)
+        self.assertEqual([items[0]["text"] for items in results], ["m4", "m7"])
+        self.assertEqual(len(results[0]), 3)
+        self.assertAlmostEqual(results[0][0]["score"], 1.0, places=5)
+
+    def test_kind_filter_and_replaced_sources(self):
+        self.index.add("message", "chat", ["m0"], self.vectors[:1])
+        self.index.replace_source("note", "memories", ["old"], self.vectors[:1])
+        self.index.replace_source("note", "memories", ["new"], self.vectors[1:2])
+        self.assertEqual([item["text"] for item in self.index.search([self.vectors[0]], k=5, kind="note")[0]], ["new"])
+        self.assertEqual([item["text"] for item in self.index.search([self.vectors[0]], k=5, kind="message")[0]], ["m0"])
+
+    def test_compaction_keeps_live_items(self):
+        self.index.add("note", "memories", list("abcdef"), self.vectors[:6])
+        self.index.replace_source("note", "memories", ["g"], self.vectors[2:3])
+        self.assertTrue(self.index.compact_if_needed())
+        self.assertEqual(self.index.get_stats(), {"rows": 1, "deleted": 0, "dimension": 8})
+        self.assertEqual([item["text"] for item in self.index.search([self.vectors[2]], k=3)[0]], ["g"])
+        self.index.add("message", "chat", ["m"], self.vectors[:1])
+        self.assertEqual(self.index.search([self.vectors[0]], k=1)[0][0]["text"], "m")
+
+    def test_vectors_without_metadata_are_dropped_on_open(self):
+        self.index.add("message", "chat", ["m0", "m1"], self.vectors[:2])
+        with open(self.index._vectors_path(), "ab") as f:
+            f.write(np.zeros(8, dtype=np.float32).tobytes())
+        reopened = VectorIndex(self.directory.name)
+        self.assertEqual(os.path.getsize(reopened._vectors_path()), 2 * 8 * 4)
+
+    def test_search_retries_after_compaction_renumbers_rows(self):
+        self.index.add("note", "old", ["x0", "x1", "x2"], self.vectors[:3])
+        self.index.add("note", "keep", ["k3", "k4"], self.vectors[3:5])
+        self.index.replace_source("note", "old", [], [])
+        search_matrix = self.index._search_matrix
+        def compact_during_first_search(*args):
+            self.index._search_matrix = search_matrix
+            result = search_matrix(*args)
+            self.index.compact()
+            return result
+        self.index._search_matrix = compact_during_first_search
+        results = self.index.search([self.vectors[4]], k=1)
+        self.assertEqual(results[0][0]["text"], "k4")
+        self.assertAlmostEqual(results[0][0]["score"], 1.0, places=5)
+
+    def test_failed_insert_drops_its_vectors(self):
+        self.index.add("message", "chat", ["m0"], self.vectors[:1])
+        with self.assertRaises(Exception):
+            self.index.add("message", "chat", [object()], self.vectors[1:2])
+        self.assertEqual(os.path.getsize(self.index._vectors_path()), 8 * 4)
+        self.index.add("message", "chat", ["m2"], self.vectors[2:3])
+        self.assertEqual(self.index.search([self.vectors[2]], k=1)[0][0]["text"], "m2")
+
+    def test_failed_replacement_keeps_the_old_items(self):
+        self.index.replace_source("note", "memories", ["old"], self.vectors[:1], version="1")
+        with self.assertRaises(Exception):
+            self.index.replace_source("note", "memories", [object()], self.vectors[1:2], version="2")
+        self.assertEqual([item["text"] for item in self.index.search([self.vectors[0]], k=5)[0]], ["old"])
+        self.assertEqual(self.index.get_source_versions("note"), {"memories": "1"})
+        self.assertEqual(self.index.get_stats()["deleted"], 0)
+
+    def test_dimension_mismatch(self):
+        self.index.add("message", "chat", ["m0"], self.vectors[:1])
+        with self.assertRaises(ValueError):
+            self.index.add("message", "chat", ["m1"], [[1.0, 2.0]])
+
+    def test_chunk_text(self):
+        self.assertEqual([len(chunk) for chunk in chunk_text("a" * 600 + "\n\n" + "b" * 600 + "\n\nc")], [600, 603])
+
+class TestIndexNotes(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.notes_directory = os.path.join(self.directory.name, "notes")
+        os.makedirs(self.notes_directory)
+        self.index = VectorIndex(os.path.join(self.directory.name, "vectors"))
+        self.notes = FakeNotes(self.notes_directory)
+        self.embedder = CountingEmbedder()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_note(self, name, content, mtime):
+        path = os.path.join(self.notes_directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def note_texts(self):
+        return sorted(item["text"] for item in self.index.search([[1.0, 1.0, 0.0]], k=10, kind="note")[0])
+
+    def test_only_changed_notes_are_embedded(self):
+        self.write_note("shopping.txt", "eggs", 1000)
+        self.write_note("ideas.txt", "a garden", 1000)
+        self.assertEqual(index_notes(self.index, self.notes, self.embedder), 2)
+        self.assertEqual(self.note_texts(), ["a garden", "eggs"])
+        self.assertEqual(index_notes(self.index, self.notes, self.embedder), 0)
+        self.write_note("shopping.txt", "milk", 2000)
+        self.assertEqual(index_notes(self.index, self.notes, self.embedder), 1)
+        self.assertEqual(self.note_texts(), ["a garden", "milk"])
+        self.assertEqual(sorted(self.embedder.texts), ["a garden", "eggs", "milk"])
+
+    def test_deleted_notes_are_removed(self):
+        self.write_note("shopping.txt", "eggs", 1000)
+        index_notes(self.index, self.notes, self.embedder)
+        os.remove(os.path.join(self.notes_directory, "shopping.txt"))
+        index_notes(self.index, self.notes, self.embedder)
+        self.assertEqual(self.note_texts(), [])
+        self.assertEqual(self.index.get_source_versions("note"), {})
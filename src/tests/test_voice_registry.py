@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from voice_registry import VoiceJobRegistry, open_voice_clip, QUEUED, SYNTHESIZING, READY, FAILED
+
+class FakeTTSService:
+    def __init__(self):
+        self.opened = []
+
+    def open_stream(self, filename, text=None, voice=None):
+        self.opened.append((filename, text, voice))
+        return "stream"
+
+class TestVoiceJobRegistry(unittest.TestCase):
+    def setUp(self):
+        self.cancelled = []
+        self.registry = VoiceJobRegistry(max_pending=2, ttl=0.05, on_expire=self.cancelled.append)
+
+    def test_pending_jobs_are_capped(self):
+        self.assertTrue(self.registry.register("a.mp3", "text", "voice"))
+        self.assertTrue(self.registry.register("b.mp3", "text", "voice"))
+        self.assertFalse(self.registry.register("c.mp3", "text", "voice"))
+        self.assertEqual(self.registry.get_stats()["dropped"], 1)
+
+    def test_registering_the_same_clip_twice(self):
+        self.assertTrue(self.registry.register("a.mp3", "text", "voice"))
+        self.assertTrue(self.registry.register("a.mp3", "text", "voice"))
+        self.assertEqual(self.registry.get_stats()[QUEUED], 1)
+
+    def test_finished_jobs_free_a_slot(self):
+        self.registry.register("a.mp3", "text", "voice")
+        self.registry.register("b.mp3", "text", "voice")
+        self.registry.set_state("a.mp3", SYNTHESIZING)
+        self.registry.set_state("a.mp3", READY)
+        self.assertTrue(self.registry.register("c.mp3", "text", "voice"))
+
+    def test_claimed_job_is_forgotten_once_finished(self):
+        self.registry.register("a.mp3", "text", "voice")
+        job = self.registry.claim("a.mp3")
+        self.assertEqual(job.text, "text")
+        self.assertTrue(self.registry.contains("a.mp3"))
+        self.registry.set_state("a.mp3", FAILED)
+        self.assertFalse(self.registry.contains("a.mp3"))
+        self.assertIsNone(self.registry.claim("a.mp3"))
+
+    def test_unclaimed_jobs_expire(self):
+        self.registry.register("a.mp3", "text", "voice")
+        self.registry.register("b.mp3", "text", "voice")
+        self.registry.set_state("b.mp3", SYNTHESIZING)
+        time.sleep(0.1)
+        self.registry.register("c.mp3", "text", "voice")
+        self.assertEqual(self.cancelled, ["a.mp3"])
+        self.assertFalse(self.registry.contains("a.mp3"))
+        self.assertTrue(self.registry.contains("b.mp3"))
+        self.assertEqual(self.registry.get_stats()["expired"], 1)
+
+class TestOpenVoiceClip(unittest.TestCase):
+    def setUp(self):
+        self.voice_dir = tempfile.mkdtemp()
+        self.registry = VoiceJobRegistry(ttl=0.05)
+        self.tts_service = FakeTTSService()
+
+    def tearDown(self):
+        shutil.rmtree(self.voice_dir)
+
+    def test_fetching_a_ready_clip_claims_its_job(self):
+        self.registry.register("a.mp3", "text", "voice")
+        self.registry.set_state("a.mp3", READY)
+        with open(os.path.join(self.voice_dir, "a.mp3"), "wb") as f:
+            f.write(b"audio")
+        self.assertIsNone(open_voice_clip(self.registry, self.tts_service, self.voice_dir, "a.mp3"))
+        self.assertEqual(self.tts_service.opened, [])
+        self.assertEqual(self.registry.get_stats()[READY], 0)
+        time.sleep(0.1)
+        self.registry.register("b.mp3", "text", "voice")
+        self.assertEqual(self.registry.get_stats()["expired"], 0)
+
+    def test_clip_being_synthesized_is_streamed(self):
+        self.registry.register("a.mp3", "text", "voice")
+        self.assertEqual(open_voice_clip(self.registry, self.tts_service, self.voice_dir, "a.mp3"), "stream")
+        self.assertEqual(self.tts_service.opened, [("a.mp3", "text", "voice")])
+        self.assertTrue(self.registry.contains("a.mp3"))
+        open_voice_clip(self.registry, self.tts_service, self.voice_dir, "unknown.mp3")
+        self.assertEqual(self.tts_service.opened[-1], ("unknown.mp3", None, None))
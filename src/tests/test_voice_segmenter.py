@@ -0,0 +1,63 @@
+import unittest
+from voice_segmenter import SentenceSegmenter, create_segmenter
+
+def feed_tokens(segmenter, text, size=3):
+    segments = []
+    for i in range(0, len(text), size):
+        segments.extend(segmenter.feed(text[i:i + size]))
+    return segments
+
+class TestSentenceSegmenter(unittest.TestCase):
+    def test_first_segment_is_cut_early(self):
+        segmenter = SentenceSegmenter(first_min_length=10, min_length=100)
+        segments = feed_tokens(segmenter, "Hi there, friend. Let me look that up for you. ")
+        self.assertEqual(segments, ["Hi there, friend."])
+        self.assertEqual(segmenter.flush(), "Let me look that up for you.")
+
+    def test_boundary_inside_a_chunk(self):
+        segmenter = SentenceSegmenter(first_min_length=5)
+        self.assertEqual(segmenter.feed("Hello world. How"), ["Hello world."])
+        self.assertEqual(segmenter.flush(), "How")
+
+    def test_punctuation_at_end_of_buffer_waits_for_more_text(self):
+        segmenter = SentenceSegmenter(first_min_length=5)
+        self.assertEqual(segmenter.feed("The value is 3."), [])
+        self.assertEqual(segmenter.feed("14 exactly. "), ["The value is 3.14 exactly."])
+
+    def test_segments_grow(self):
+        segmenter = SentenceSegmenter(first_min_length=10, min_length=30, max_length=200)
+        sentence = "This is a sentence. "
+        segments = feed_tokens(segmenter, sentence * 20)
+        lengths = [len(segment) for segment in segments]
+        self.assertEqual(lengths, sorted(lengths))
+        self.assertLess(lengths[0], lengths[-1])
+
+    def test_long_text_without_boundary_is_cut_at_a_space(self):
+        segmenter = SentenceSegmenter(first_min_length=10, max_length=50)
+        segments = feed_tokens(segmenter, "word " * 30)
+        self.assertTrue(segments)
+        self.assertTrue(all(len(segment) <= 50 for segment in segments))
+        self.assertTrue(all(segment.endswith("word") for segment in segments))
+
+    def test_newline_is_a_boundary(self):
+        segmenter = SentenceSegmenter(first_min_length=5)
+        self.assertEqual(segmenter.feed("- first item\n- second"), ["- first item"])
+
+    def test_flush_of_empty_buffer(self):
+        segmenter = SentenceSegmenter()
+        self.assertIsNone(segmenter.flush())
+        segmenter.feed("  \n")
+        self.assertIsNone(segmenter.flush())
+
+    def test_nothing_is_lost(self):
+        text = "Sure! Here's what I found.\n\n1. The first thing... and more. \"Quoted.\" Done"
+        segmenter = SentenceSegmenter(first_min_length=4, min_length=8, max_length=30)
+        segments = feed_tokens(segmenter, text, size=2) + [segmenter.flush()]
+        self.assertEqual(" ".join(" ".join(segments).split()), " ".join(text.split()))
+
+    def test_create_segmenter(self):
+        segmenter = create_segmenter({"type": "sentence", "first_min_length": 5})
+        self.assertIsInstance(segmenter, SentenceSegmenter)
+        self.assertEqual(segmenter.target, 5)
+        with self.assertRaises(ValueError):
+            create_segmenter({"type": "unknown"})
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from fakes import FakeClock
+from job_queue import JobQueue
+from worker_pool import JobType, RateLimiter, WorkerPool
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_burst_up_to_the_rate_then_waits(self):
+        limiter = RateLimiter(6, clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(6):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        limiter.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 10.0)
+
+    def test_tokens_refill_over_time(self):
+        limiter = RateLimiter(6, clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(6):
+            limiter.acquire()
+        self.clock.now += 25
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertAlmostEqual(limiter.tokens, 0.5)
+
+    def test_refill_is_capped_at_the_burst_size(self):
+        limiter = RateLimiter(6, clock=self.clock, sleep=self.clock.sleep)
+        self.clock.now += 3600
+        for _ in range(7):
+            limiter.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_rates_below_one_per_minute(self):
+        limiter = RateLimiter(0.5, clock=self.clock, sleep=self.clock.sleep)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertAlmostEqual(sum(self.clock.sleeps), 120.0)
+
+class TestJobType(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.job_type = JobType("indexer", print, 2, None, None, clock=self.clock)
+
+    def test_counts_and_lag(self):
+        self.job_type.record_start(1.0)
+        self.job_type.record_start(3.0)
+        self.job_type.record_finish(True)
+        stats = self.job_type.get_stats(queue_depth=5)
+        self.assertEqual((stats["queue_depth"], stats["in_progress"], stats["completed"], stats["failed"]), (5, 1, 1, 0))
+        self.assertEqual((stats["average_lag"], stats["max_lag"]), (2.0, 3.0))
+        self.job_type.record_finish(False)
+        self.assertEqual(self.job_type.get_stats(0)["failed"], 1)
+
+    def test_throughput_covers_the_last_minute(self):
+        for finished_at in (0, 30, 50):
+            self.clock.now = finished_at
+            self.job_type.record_start(0.0)
+            self.job_type.record_finish(True)
+        self.assertEqual(self.job_type.get_stats(0)["throughput_per_minute"], 3)
+        self.clock.now = 75
+        self.assertEqual(self.job_type.get_stats(0)["throughput_per_minute"], 2)
+        self.clock.now = 111
+        self.assertEqual(self.job_type.get_stats(0)["throughput_per_minute"], 0)
+
+    def test_no_jobs(self):
+        self.assertEqual(self.job_type.get_stats(0)["average_lag"], 0.0)
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.pool = WorkerPool(JobQueue(os.path.join(self.directory, "jobs.db"), max_attempts=1), clock=self.clock)
+        self.handled = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def handler(self, value):
+        if value == "bad":
+            raise ValueError("bad job")
+        self.handled.append(value)
+
+    def wait_for_finished(self, name, count):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            stats = self.pool.get_stats()[name]
+            if stats["completed"] + stats["failed"] >= count:
+                return stats
+            time.sleep(0.005)
+        self.fail("the jobs did not finish")
+
+    def test_jobs_are_processed_and_measured(self):
+        self.pool.set_rate_limit("openai", 60)
+        self.pool.register("summarize", self.handler, connector=lambda value: "openai")
+        for value in ("a", "bad", "b"):
+            self.pool.submit("summarize", value)
+        stats = self.wait_for_finished("summarize", 3)
+        self.assertEqual(self.handled, ["a", "b"])
+        self.assertEqual((stats["completed"], stats["failed"], stats["queue_depth"], stats["in_progress"]), (2, 1, 0, 0))
+        self.assertEqual(stats["throughput_per_minute"], 3)
+        self.assertAlmostEqual(self.pool.rate_limiters["openai"].tokens, 57)
+        self.clock.now = 61
+        self.assertEqual(self.pool.get_stats()["summarize"]["throughput_per_minute"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import re
+from typing import List
+
+# Bump whenever analyze() changes, so indexes built with the old rules are rebuilt
+ANALYZER_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just let me more most my myself no nor
+not now of off on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# Suffixes are tried in order and only the first match is removed
+SUFFIXES = [
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive"),
+    ("ingly", ""), ("edly", ""), ("ments", ""), ("ment", ""), ("ness", ""),
+    ("ies", "y"), ("ied", "y"), ("ing", ""), ("ed", ""), ("ly", "")
+]
+
+def stem(word: str) -> str:
+    """
+    Reduce a word to a stem with a light suffix-stripping stemmer, so plurals and verb forms match.
+
+    Args:
+        word (str): A lowercase word
+
+    Returns:
+        str: The stem, which is not necessarily a word
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            stemmed = word[:-len(suffix)] + replacement
+            # running -> runn -> run
+            if suffix in ("ing", "ed") and stemmed[-1] == stemmed[-2] and stemmed[-1] not in "lsz":
+                stemmed = stemmed[:-1]
+            return stemmed
+    if word.endswith("es") and word[:-2].endswith(("s", "x", "z", "ch", "sh")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def analyze(text: str) -> List[str]:
+    """
+    Split text into stemmed search terms, leaving out stop words.
+
+    Args:
+        text (str): The text to analyze
+
+    Returns:
+        List[str]: The terms in the order they appear
+    """
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import edge_tts
+
+def voice_cache_filename(voice: str, text: str) -> str:
+    """
+    Get the content-addressed filename of a clip, so identical text spoken by the same voice is synthesized once.
+
+    Args:
+        voice (str): The edge-tts voice
+        text (str): The text to speak, after markdown, emojis and URLs have been filtered out
+
+    Returns:
+        str: The filename of the clip in the voice directory
+    """
+    normalized = " ".join(text.split())
+    digest = hashlib.sha256(f"{voice}\0{normalized}".encode("utf-8")).hexdigest()
+    return f"{voice}_{digest[:32]}.mp3"
+
+class Histogram:
+    """
+    A thread-safe histogram of durations in seconds with fixed, cumulative buckets.
+    """
+
+    def __init__(self, buckets: tuple = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets (tuple): The upper bounds of the buckets in seconds, in increasing order
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record a duration."""
+        with self.lock:
+            self.count += 1
+            self.total += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the recorded distribution.
+
+        Returns:
+            Dict[str, Any]: The number of observations, their sum and the count at or below each bucket bound
+        """
+        with self.lock:
+            return {
+                "count": self.count,
+                "sum": self.total,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            }
+
+class ClipStream:
+    """
+    A clip being synthesized, whose audio chunks can be read by any number of requests while it is produced.
+    """
+
+    def __init__(self, filename: str, text: str, voice: str):
+        self.filename = filename
+        self.text = text
+        self.voice = voice
+        self.started = False
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.chunks: List[bytes] = []
+        self.condition = threading.Condition()
+
+    def append(self, chunk: bytes) -> None:
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def iter_chunks(self, timeout: float = 60) -> Iterator[bytes]:
+        """
+        Yield the audio chunks from the start of the clip, waiting for new ones until synthesis ends.
+
+        Args:
+            timeout (float): Seconds to wait for the next chunk before giving up
+
+        Yields:
+            bytes: The next chunk of MP3 audio
+        """
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.chunks) and not self.done:
+                    if not self.condition.wait(timeout):
+                        print(f"Timed out waiting for audio of {self.filename}")
+                        return
+                chunks = self.chunks[position:]
+                done = self.done
+            position += len(chunks)
+            yield from chunks
+            if done:
+                if self.error:
+                    print(f"Voice stream for {self.filename} ended early: {self.error}")
+                return
+
+class TTSService:
+    """
+    Synthesizes voice clips with edge-tts on one long-lived asyncio event loop.
+
+    Clips are queued by priority, then in submission order, and up to `concurrency` of them are
+    synthesized at once. The service runs on its own daemon thread, so submit can be called from
+    any request thread. The voice directory doubles as a cache of clips, which a periodic sweep
+    keeps within an age and size budget, removing the least recently used clips first.
+    """
+
+    def __init__(self, voice_dir: str, concurrency: int = 4,
+                 on_start: Optional[Callable[[str], None]] = None, on_complete: Optional[Callable[[str, bool], None]] = None,
+                 max_cache_bytes: int = 256 * 1024 * 1024, max_cache_age: float = 7 * 24 * 3600, sweep_interval: float = 600):
+        """
+        Initialize the TTS service.
+
+        Args:
+            voice_dir (str): The directory the clips are written to
+            concurrency (int): The maximum number of clips synthesized at the same time
+            on_start (Optional[Callable[[str], None]]): Called with the filename when synthesis of a clip starts
+            on_complete (Optional[Callable[[str, bool], None]]): Called with the filename and whether synthesis succeeded once a clip is done
+            max_cache_bytes (int): The total size of clips kept in the voice directory
+            max_cache_age (float): Seconds since its last use after which a clip is removed
+            sweep_interval (float): Seconds between sweeps of the voice directory
+        """
+        self.voice_dir = voice_dir
+        self.concurrency = concurrency
+        self.on_start = on_start
+        self.on_complete = on_complete
+        self.max_cache_bytes = max_cache_bytes
+        self.max_cache_age = max_cache_age
+        self.sweep_interval = sweep_interval
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evicted = 0
+        self.cancelled = 0
+        self.loop = asyncio.new_event_loop()
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.sequence = itertools.count()
+        self.active = 0
+        self.synthesized = 0
+        self.failed = 0
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self.inflight: Dict[str, ClipStream] = {}
+        self.inflight_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="tts-service", daemon=True)
+
+    def start(self) -> None:
+        """Start the event loop thread and wait until it accepts jobs."""
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.PriorityQueue()
+        for _ in range(self.concurrency):
+            self.loop.create_task(self._worker())
+        self.loop.create_task(self._sweep_periodically())
+        self.ready.set()
+        self.loop.run_forever()
+
+    def has_clip(self, filename: str) -> bool:
+        """
+        Check whether a clip is already cached, marking it as recently used if it is.
+
+        Args:
+            filename (str): The name of the clip in the voice directory
+
+        Returns:
+            bool: True if the clip can be served without synthesizing it
+        """
+        try:
+            os.utime(os.path.join(self.voice_dir, filename))
+        except OSError:
+            self.cache_misses += 1
+            return False
+        self.cache_hits += 1
+        return True
+
+    def submit(self, filename: str, text: str, voice: str, priority: int = 1) -> ClipStream:
+        """
+        Queue a clip for synthesis, or return the clip already queued under the same filename.
+
+        Args:
+            filename (str): The name of the file to write in the voice directory
+            text (str): The text to speak
+            voice (str): The edge-tts voice to use
+            priority (int): Lower values are synthesized first, 0 is used for the first clip of a reply
+
+        Returns:
+            ClipStream: The clip, whose audio can be read while it is synthesized
+        """
+        with self.inflight_lock:
+            clip = self.inflight.get(filename)
+            if clip is None:
+                clip = ClipStream(filename, text, voice)
+                self.inflight[filename] = clip
+            elif clip.started:
+                return clip
+        # Queueing a clip again with a higher priority moves it ahead, and whichever entry is reached first runs it
+        job = (priority, next(self.sequence), time.monotonic(), clip)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, job)
+        return clip
+
+    def open_stream(self, filename: str, text: Optional[str] = None, voice: Optional[str] = None) -> Optional[ClipStream]:
+        """
+        Get a clip that is being synthesized, so a request can stream it instead of waiting for the file.
+
+        A clip that is still queued is moved to the front of the queue. If it is not known and text
+        and voice are given, it is queued at the front.
+
+        Args:
+            filename (str): The name of the clip in the voice directory
+            text (Optional[str]): The text to speak if the clip has to be queued
+            voice (Optional[str]): The voice to use if the clip has to be queued
+
+        Returns:
+            Optional[ClipStream]: The clip, or None if it is not being synthesized and should be served from disk
+        """
+        with self.inflight_lock:
+            clip = self.inflight.get(filename)
+            if clip is not None and clip.started:
+                return clip
+        if clip is not None:
+            return self.submit(filename, clip.text, clip.voice, priority=-1)
+        if text is None or os.path.exists(os.path.join(self.voice_dir, filename)):
+            return None
+        return self.submit(filename, text, voice, priority=-1)
+
+    def cancel(self, filename: str) -> bool:
+        """
+        Drop a queued clip before it is synthesized.
+
+        Args:
+            filename (str): The name of the clip
+
+        Returns:
+            bool: True if the clip was queued and has been cancelled, False if it is unknown or already being synthesized
+        """
+        with self.inflight_lock:
+            clip = self.inflight.get(filename)
+            if clip is None or clip.started:
+                return False
+            # Marking the clip as started makes the workers skip its queue entries
+            clip.started = True
+            del self.inflight[filename]
+        self.cancelled += 1
+        clip.finish(Exception("cancelled"))
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, enqueued_at, clip = await self.queue.get()
+            with self.inflight_lock:
+                if clip.started:
+                    continue
+                clip.started = True
+            self.queue_wait.observe(time.monotonic() - enqueued_at)
+            started_at = time.monotonic()
+            self.active += 1
+            succeeded = False
+            try:
+                if self.on_start:
+                    self.on_start(clip.filename)
+                await self._synthesize(clip)
+                self.synthesized += 1
+                succeeded = True
+                clip.finish()
+            except Exception as e:
+                self.failed += 1
+                print(f"Error synthesizing {clip.filename}: {e}")
+                clip.finish(e)
+            finally:
+                self.active -= 1
+                self.latency.observe(time.monotonic() - started_at)
+                # The file is in place before the clip leaves the in-flight table, so readers always find one or the other
+                with self.inflight_lock:
+                    self.inflight.pop(clip.filename, None)
+                if self.on_complete:
+                    self.on_complete(clip.filename, succeeded)
+
+    async def _synthesize(self, clip: ClipStream) -> None:
+        """
+        Stream a clip's audio to its readers and to a temporary file, then move the file into place so
+        nobody sees a partial file.
+        """
+        voice_file_path = os.path.join(self.voice_dir, clip.filename)
+        if os.path.exists(voice_file_path):
+            with open(voice_file_path, "rb") as f:
+                clip.append(f.read())
+            return
+        print(f"Generating voice for {clip.filename} as {voice_file_path}")
+        temp_path = voice_file_path + ".part"
+        communicate = edge_tts.Communicate(text=clip.text, voice=clip.voice)
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        f.write(chunk["data"])
+                        clip.append(chunk["data"])
+            os.replace(temp_path, voice_file_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.loop.run_in_executor(None, self.sweep)
+            except Exception as e:
+                print(f"Error sweeping voice cache: {e}")
+
+    def sweep(self) -> int:
+        """
+        Remove clips unused for longer than max_cache_age, then the least recently used clips until
+        the directory fits in max_cache_bytes.
+
+        Returns:
+            int: The number of files removed
+        """
+        now = time.time()
+        clips = []
+        for entry in os.scandir(self.voice_dir):
+            if entry.is_file():
+                stat = entry.stat()
+                clips.append((stat.st_mtime, stat.st_size, entry.path))
+        clips.sort()
+        total_bytes = sum(size for _, size, _ in clips)
+        removed = 0
+        for mtime, size, path in clips:
+            # Partial files are left alone until they are old enough to be abandoned
+            if path.endswith(".part") and now - mtime <= self.max_cache_age:
+                continue
+            if now - mtime <= self.max_cache_age and total_bytes <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the service metrics.
+
+        Returns:
+            Dict[str, Any]: Queue depth, active, finished and cancelled job counts, cache hits, misses and evictions,
+                and the synthesis latency and queue wait histograms
+        """
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "synthesized": self.synthesized,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "evicted": self.evicted,
+            "synthesis_latency": self.latency.get_stats(),
+            "queue_wait": self.queue_wait.get_stats()
+        }
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+QUEUED = "queued"
+SYNTHESIZING = "synthesizing"
+READY = "ready"
+FAILED = "failed"
+
+class VoiceJob:
+    """A voice clip announced to a client, from the moment it is queued until it is fetched or expires."""
+
+    def __init__(self, filename: str, text: str, voice: str, now: float):
+        self.filename = filename
+        self.text = text
+        self.voice = voice
+        self.state = QUEUED
+        self.created_at = now
+        self.claimed = False
+
+class VoiceJobRegistry:
+    """
+    A thread-safe registry of the voice clips that have been announced but not yet fetched.
+
+    Jobs move from queued to synthesizing to ready or failed. A job is forgotten once it has been
+    fetched and has finished, or once it has gone unfetched for longer than its TTL, in which case a
+    clip that is still queued is cancelled. The number of queued and synthesizing jobs is capped so a
+    burst of replies cannot queue audio without limit.
+    """
+
+    def __init__(self, max_pending: int = 64, ttl: float = 300, on_expire: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            max_pending (int): The maximum number of queued and synthesizing jobs
+            ttl (float): Seconds an unfetched job is kept
+            on_expire (Optional[Callable[[str], None]]): Called with the filename of an expired job that was still queued
+        """
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.jobs: Dict[str, VoiceJob] = {}
+        self.lock = threading.Lock()
+        self.registered = 0
+        self.dropped = 0
+        self.expired = 0
+
+    def register(self, filename: str, text: str, voice: str) -> bool:
+        """
+        Add a job for a clip that is about to be queued for synthesis.
+
+        Args:
+            filename (str): The name of the clip
+            text (str): The text to speak
+            voice (str): The voice to use
+
+        Returns:
+            bool: True if the clip should be queued, False if it was dropped because too many jobs are pending
+        """
+        expired = self._expire()
+        try:
+            with self.lock:
+                if filename in self.jobs:
+                    return True
+                pending = sum(1 for job in self.jobs.values() if job.state in (QUEUED, SYNTHESIZING))
+                if pending >= self.max_pending:
+                    self.dropped += 1
+                    return False
+                self.jobs[filename] = VoiceJob(filename, text, voice, time.monotonic())
+                self.registered += 1
+                return True
+        finally:
+            if self.on_expire:
+                for job in expired:
+                    self.on_expire(job.filename)
+
+    def _expire(self) -> list:
+        """Forget unfetched jobs older than the TTL and return the expired jobs that were still queued."""
+        now = time.monotonic()
+        cancelled = []
+        with self.lock:
+            for filename, job in list(self.jobs.items()):
+                if job.claimed or job.state == SYNTHESIZING or now - job.created_at <= self.ttl:
+                    continue
+                del self.jobs[filename]
+                self.expired += 1
+                if job.state == QUEUED:
+                    cancelled.append(job)
+        return cancelled
+
+    def contains(self, filename: str) -> bool:
+        """Check whether a clip has a job."""
+        with self.lock:
+            return filename in self.jobs
+
+    def claim(self, filename: str) -> Optional[VoiceJob]:
+        """
+        Mark a job as fetched by a client.
+
+        Args:
+            filename (str): The name of the clip
+
+        Returns:
+            Optional[VoiceJob]: The job, or None if the clip is unknown or its job has already been forgotten
+        """
+        with self.lock:
+            job = self.jobs.get(filename)
+            if job is None:
+                return None
+            job.claimed = True
+            if job.state in (READY, FAILED):
+                del self.jobs[filename]
+            return job
+
+    def set_state(self, filename: str, state: str) -> None:
+        """
+        Record a job's progress, forgetting it if it has finished and was already fetched.
+
+        Args:
+            filename (str): The name of the clip
+            state (str): The new state of the job
+        """
+        with self.lock:
+            job = self.jobs.get(filename)
+            if job is None:
+                return
+            job.state = state
+            if job.claimed and state in (READY, FAILED):
+                del self.jobs[filename]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the registry counters.
+
+        Returns:
+            Dict[str, Any]: The number of jobs in each state, and how many jobs were registered, dropped and expired
+        """
+        with self.lock:
+            states = {QUEUED: 0, SYNTHESIZING: 0, READY: 0, FAILED: 0}
+            for job in self.jobs.values():
+                states[job.state] += 1
+            return {
+                **states,
+                "max_pending": self.max_pending,
+                "registered": self.registered,
+                "dropped": self.dropped,
+                "expired": self.expired
+            }
+
+def open_voice_clip(voice_jobs: VoiceJobRegistry, tts_service: Any, voice_dir: str, filename: str) -> Optional[Any]:
+    """
+    Claim a clip's job for a fetch and get the stream of a clip that is not on disk yet.
+
+    The job is claimed on every fetch, including fetches of clips already on disk, so fetched jobs
+    are forgotten rather than left to expire.
+
+    Args:
+        voice_jobs (VoiceJobRegistry): The registry of announced clips
+        tts_service (Any): The TTSService synthesizing the clips
+        voice_dir (str): The directory the clips are written to
+        filename (str): The name of the clip
+
+    Returns:
+        Optional[Any]: The ClipStream to serve while the clip is synthesized, or None if the clip should be served from disk
+    """
+    voice_job = voice_jobs.claim(filename)
+    if os.path.exists(os.path.join(voice_dir, filename)):
+        return None
+    # Stream the clip as it is synthesized, sharing the work with any request already waiting on it
+    if voice_job:
+        return tts_service.open_stream(filename, voice_job.text, voice_job.voice)
+    return tts_service.open_stream(filename)
@@ -0,0 +1,117 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Any, List, Mapping, Optional
+
+# A sentence ends at closing punctuation, optionally followed by quotes or brackets, and then whitespace.
+# A line break ends a segment as well, so lists and headings are spoken as they arrive.
+SENTENCE_BOUNDARY = re.compile(r'[.!?…]+["\'”’)\]]*\s+|\n+')
+
+class Segmenter(ABC):
+    """
+    Splits streamed text into segments to synthesize as separate voice clips.
+    """
+
+    @abstractmethod
+    def feed(self, text: str) -> List[str]:
+        """
+        Add streamed text.
+
+        Args:
+            text (str): The next piece of the response
+
+        Returns:
+            List[str]: The segments that are complete and can be synthesized
+        """
+
+    @abstractmethod
+    def flush(self) -> Optional[str]:
+        """
+        End the stream.
+
+        Returns:
+            Optional[str]: The remaining text, or None if there is nothing left to synthesize
+        """
+
+class SentenceSegmenter(Segmenter):
+    """
+    Cuts segments at sentence boundaries found anywhere in the buffered text.
+
+    The first segment is cut as soon as a sentence of first_min_length characters is complete, so
+    audio starts early. Each following segment must be longer than the one before, growing by
+    `growth` from min_length up to max_length, so fewer clips are made once playback has started.
+    Text that reaches max_length before a long enough sentence ends is cut at the last boundary, or
+    at the last space if there is none.
+    """
+
+    def __init__(self, first_min_length: int = 40, min_length: int = 128, max_length: int = 400, growth: float = 2.0):
+        """
+        Initialize the segmenter.
+
+        Args:
+            first_min_length (int): The minimum length of the first segment
+            min_length (int): The minimum length of the second segment
+            max_length (int): The length after which a segment is cut even without a sentence boundary
+            growth (float): The factor by which the minimum length grows after each segment
+        """
+        self.min_length = min_length
+        self.max_length = max_length
+        self.growth = growth
+        self.target = first_min_length
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        segments = []
+        while True:
+            end = self._find_cut()
+            if end is None:
+                return segments
+            segment = self.buffer[:end].strip()
+            self.buffer = self.buffer[end:]
+            if segment:
+                segments.append(segment)
+                self.target = min(self.max_length, max(self.min_length, int(self.target * self.growth)))
+
+    def _find_cut(self) -> Optional[int]:
+        """Get the end of the next complete segment in the buffer, or None if more text is needed."""
+        last_boundary = None
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            if match.end() > self.max_length:
+                break
+            if match.end() >= self.target:
+                return match.end()
+            last_boundary = match.end()
+        if len(self.buffer) < self.max_length:
+            return None
+        if last_boundary:
+            return last_boundary
+        space = self.buffer.rfind(" ", 0, self.max_length)
+        return space + 1 if space > 0 else self.max_length
+
+    def flush(self) -> Optional[str]:
+        segment = self.buffer.strip()
+        self.buffer = ""
+        return segment or None
+
+SEGMENTERS = {
+    "sentence": SentenceSegmenter
+}
+
+def create_segmenter(settings: Optional[Mapping[str, Any]] = None) -> Segmenter:
+    """
+    Create a segmenter from a persona's voice_segmenter settings.
+
+    Args:
+        settings (Optional[Mapping[str, Any]]): The segmenter type under "type" and the keyword arguments of its constructor
+
+    Returns:
+        Segmenter: A new segmenter for one response
+
+    Raises:
+        ValueError: If the segmenter type is unknown
+    """
+    settings = dict(settings or {})
+    segmenter_type = settings.pop("type", "sentence")
+    if segmenter_type not in SEGMENTERS:
+        raise ValueError(f"Unknown voice segmenter: {segmenter_type}")
+    return SEGMENTERS[segmenter_type](**settings)
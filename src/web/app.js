@@ -17,6 +17,9 @@ const App = () => {
         const saved = localStorage.getItem('conversationHistory');
         return saved ? JSON.parse(saved) : [];
     });
+    const [conversationId, setConversationId] = React.useState(() => {
+        return localStorage.getItem('conversationId') || '';
+    });
     const [audioQueue, setAudioQueue] = React.useState([]);
     const [queue, setQueue] = React.useState([]);
     const [isPlaying, setIsPlaying] = React.useState(false);
@@ -67,6 +70,10 @@ const App = () => {
         localStorage.setItem('conversationHistory', JSON.stringify(conversationHistory));
     }, [conversationHistory]);
 
+    React.useEffect(() => {
+        localStorage.setItem('conversationId', conversationId);
+    }, [conversationId]);
+
     React.useEffect(() => {
         localStorage.setItem('selectedPersona', selectedPersona);
     }, [selectedPersona]);
@@ -134,11 +141,13 @@ const App = () => {
         localStorage.removeItem('username');
         localStorage.removeItem('token');
         localStorage.removeItem('conversationHistory');
+        localStorage.removeItem('conversationId');
         localStorage.removeItem('responses');
         setIsAuthenticated(false);
         setUsername('');
         setToken('');
         setConversationHistory([]);
+        setConversationId('');
         setResponses([]);
     };
 
@@ -217,8 +226,6 @@ const App = () => {
         console.log("Submitting input:", input);
         try {
             setLoading(true); // Show loading message
-            const updatedHistory = [...conversationHistory];
-            setConversationHistory(updatedHistory);
             setResponses([...responses, { role: 'user', content: input }]);
             setInputValue(''); // Clear the input field before submitting
             setModalInputValue('');
@@ -232,7 +239,9 @@ const App = () => {
                 },
                 body: JSON.stringify({ 
                     query: input, 
-                    history: updatedHistory,
+                    conversation_id: conversationId,
+                    // The server keeps the history of a conversation once it has an ID
+                    ...(conversationId ? {} : { history: conversationHistory }),
                     persona: selectedPersona,
                     context: modalInputValue // Pass modal input value as context
                 }),
@@ -244,6 +253,7 @@ const App = () => {
                 setUsername('');
                 setToken('');
                 setConversationHistory([]);
+                setConversationId('');
                 setResponses([]);
                 return;
             }
@@ -251,14 +261,17 @@ const App = () => {
             const decoder = new TextDecoder('utf-8');
 
             let assistantResponse = '';
+            let pendingFrames = '';
 
             while (true) {
                 const { done, value } = await reader.read();
                 if (done) break;
-                const chunk = decoder.decode(value, { stream: true });
+                pendingFrames += decoder.decode(value, { stream: true });
 
-                // Split the chunk into individual JSON objects
-                const jsonObjects = chunk.split('\n\n').filter(Boolean);
+                // Split the complete frames into individual JSON objects, keeping a frame cut off by the read for the next one
+                const frames = pendingFrames.split('\n\n');
+                pendingFrames = frames.pop();
+                const jsonObjects = frames.filter(Boolean);
                 for (const jsonObject of jsonObjects) {
                     try {
                         // Strip the 'data:' prefix and parse the JSON response
@@ -296,6 +309,8 @@ const App = () => {
                                     return [...prevResponses, { role: 'assistant', content: plainTextContent }];
                                 }
                             });
+                        } else if (jsonResponse.type === 'voice_backpressure') {
+                            console.warn("Voice queue is full, skipped a clip. Pending:", jsonResponse.pending);
                         } else if (jsonResponse.filename && !isMuted) {
                             console.log("Adding voice to queue:", jsonResponse.filename);
                             addToAudioQueue("/voice/" + jsonResponse.filename); // Add to the audio queue only if not muted
@@ -303,6 +318,10 @@ const App = () => {
                             // Update the conversation history with the server's version
                             console.log("Updating conversation history with server's version:", jsonResponse.history);
                             setConversationHistory(jsonResponse.history);
+                        } else if (jsonResponse.type === "history_delta") {
+                            // Keep the messages the server has in common with us and apply the ones it changed
+                            setConversationId(jsonResponse.conversation_id);
+                            setConversationHistory(prevHistory => [...prevHistory.slice(0, jsonResponse.base), ...jsonResponse.messages]);
                         } 
                     } catch (error) {
                         console.error('Error parsing JSON:', error);
@@ -310,9 +329,6 @@ const App = () => {
                 }
             }
 
-            // Store the complete assistant response in conversation history
-            setConversationHistory(prevHistory => [...prevHistory, { role: 'assistant', content: assistantResponse }]);
-
             // Convert the complete response from markdown to HTML
             const htmlResponse = marked.parse(assistantResponse);
 
@@ -562,8 +578,10 @@ React.useEffect(() => {
                             onClick: () => {
                                 console.log("Resetting conversation history");
                                 setConversationHistory([]);
+                                setConversationId('');
                                 setResponses([]);
                                 localStorage.removeItem('conversationHistory');
+                                localStorage.removeItem('conversationId');
                                 localStorage.removeItem('responses');
                             },
                             className: 'dropdown-item'
@@ -0,0 +1,214 @@
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from job_queue import JobQueue
+
+class RateLimiter:
+    """
+    A token bucket that limits how many jobs per minute may call an LLM connector.
+    """
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate_per_minute (float): The number of calls allowed per minute, which is also the burst size
+            clock (Callable[[], float]): The time source, in seconds
+            sleep (Callable[[float], None]): Waits the given number of seconds
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1.0, rate_per_minute)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a call is allowed."""
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_second
+            self.sleep(wait)
+
+class JobType:
+    """
+    A kind of background job, with its own worker threads and metrics.
+    """
+
+    def __init__(self, name: str, handler: Callable, concurrency: int, connector: Optional[Callable], coalesce: Optional[Callable],
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the job type.
+
+        Args:
+            name (str): The name of the job type
+            handler (Callable): The function that processes a job, called with the job's arguments
+            concurrency (int): The number of worker threads processing this job type
+            connector (Optional[Callable]): A function returning the name of the LLM connector a job uses, given its arguments
+            coalesce (Optional[Callable]): A function returning the key under which pending jobs are merged, given a job's arguments
+            clock (Callable[[], float]): The time source the throughput is measured with, in seconds
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.connector = connector
+        self.coalesce = coalesce
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.recent_completions: deque = deque()
+
+    def record_start(self, lag: float) -> None:
+        with self.lock:
+            self.in_progress += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def record_finish(self, succeeded: bool) -> None:
+        now = self.clock()
+        with self.lock:
+            self.in_progress -= 1
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.recent_completions.append(now)
+            self._trim_completions(now)
+
+    def _trim_completions(self, now: float) -> None:
+        """Forget completions older than a minute. Must be called with the lock held."""
+        while self.recent_completions and now - self.recent_completions[0] > 60:
+            self.recent_completions.popleft()
+
+    def get_stats(self, queue_depth: int) -> Dict[str, Any]:
+        """
+        Get the metrics of this job type.
+
+        Args:
+            queue_depth (int): The number of pending jobs of this type
+
+        Returns:
+            Dict[str, Any]: Queue depth, jobs in progress, completed and failed counts,
+                average and maximum processing lag in seconds, and jobs finished in the last minute
+        """
+        with self.lock:
+            self._trim_completions(self.clock())
+            started = self.completed + self.failed + self.in_progress
+            return {
+                "queue_depth": queue_depth,
+                "concurrency": self.concurrency,
+                "in_progress": self.in_progress,
+                "completed": self.completed,
+                "failed": self.failed,
+                "average_lag": self.total_lag / started if started else 0.0,
+                "max_lag": self.max_lag,
+                "throughput_per_minute": len(self.recent_completions)
+            }
+
+class WorkerPool:
+    """
+    A pool of background workers that block on a persistent job queue instead of polling it.
+
+    Each job type has its own number of worker threads, and jobs can be rate limited by the LLM
+    connector they call.
+    """
+
+    def __init__(self, job_queue: JobQueue, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty worker pool.
+
+        Args:
+            job_queue (JobQueue): The queue the jobs are stored in
+            clock (Callable[[], float]): The time source for rate limits and throughput, in seconds
+        """
+        self.job_queue = job_queue
+        self.clock = clock
+        self.job_types: Dict[str, JobType] = {}
+        self.rate_limiters: Dict[str, RateLimiter] = {}
+
+    def register(self, name: str, handler: Callable, concurrency: int = 1, connector: Optional[Callable] = None, coalesce: Optional[Callable] = None) -> None:
+        """
+        Register a job type and start its workers.
+
+        Args:
+            name (str): The name of the job type
+            handler (Callable): The function that processes a job, called with the job's arguments
+            concurrency (int): The number of worker threads processing this job type
+            connector (Optional[Callable]): A function returning the name of the LLM connector a job uses, given its arguments
+            coalesce (Optional[Callable]): A function returning the key under which pending jobs are merged, given a job's arguments
+        """
+        job_type = JobType(name, handler, concurrency, connector, coalesce, self.clock)
+        self.job_types[name] = job_type
+        for i in range(concurrency):
+            threading.Thread(target=self._work, args=(job_type,), name=f"{name}-worker-{i}", daemon=True).start()
+
+    def set_rate_limit(self, connector: str, rate_per_minute: float) -> None:
+        """
+        Limit how many jobs per minute may call a connector.
+
+        Args:
+            connector (str): The name of the connector
+            rate_per_minute (float): The number of jobs allowed per minute
+        """
+        self.rate_limiters[connector] = RateLimiter(rate_per_minute, self.clock)
+
+    def submit(self, name: str, *args) -> None:
+        """
+        Add a job to the queue, merging it with a pending job of the same type and coalesce key.
+
+        Args:
+            name (str): The name of the job type
+            *args: The JSON serializable arguments to call the job type's handler with
+        """
+        job_type = self.job_types[name]
+        coalesce_key = job_type.coalesce(*args) if job_type.coalesce else None
+        self.job_queue.put(name, list(args), coalesce_key)
+
+    def _work(self, job_type: JobType) -> None:
+        """Process jobs of one type forever, blocking while the queue is empty."""
+        while True:
+            job = self.job_queue.get(job_type.name)
+            try:
+                if job_type.connector:
+                    rate_limiter = self.rate_limiters.get(job_type.connector(*job.args))
+                    if rate_limiter:
+                        rate_limiter.acquire()
+            except Exception as e:
+                print(f"Error rate limiting {job_type.name} job: {e}")
+            job_type.record_start(max(0.0, time.time() - job.enqueued_at))
+            succeeded = False
+            try:
+                job_type.handler(*job.args)
+                succeeded = True
+            except Exception as e:
+                print(f"Error in {job_type.name} worker: {e}")
+                print(traceback.format_exc())
+            finally:
+                job_type.record_finish(succeeded)
+                if succeeded:
+                    self.job_queue.ack(job)
+                else:
+                    self.job_queue.retry(job)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the metrics of every job type.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The metrics keyed by job type name
+        """
+        return {name: job_type.get_stats(self.job_queue.depth(name)) for name, job_type in self.job_types.items()}
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""
+Stream Processor Benchmark - Compares the chained per-character StreamProcessors with the single-pass
+MultiStreamProcessor on a long reasoning trace streamed in small chunks.
+Usage: python bench_stream_processor.py [think_chars] [chunk_size]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from stream_processor import MultiStreamProcessor, StreamProcessor
+
+DELIMITERS = [("<think>", "</think>"), ("```tool_code", "```"), ("```json", "```")]
+
+def make_trace(think_chars):
+    """Build a response with a long <think> block followed by an answer and a tool call."""
+    reasoning = ("Let me consider whether a < b holds here, and check the `value` again. " * (think_chars // 72 + 1))[:think_chars]
+    answer = "Here is the answer to your question. " * 20
+    return f"<think>{reasoning}</think>{answer}```json\n{{\"tool\": \"search\", \"query\": \"weather\"}}\n``` Done."
+
+def run_chained(chunks):
+    processors = [StreamProcessor(start, end) for start, end in DELIMITERS]
+    for chunk in chunks:
+        for processor in processors:
+            chunk = processor.process_chunk(chunk)
+
+def run_multi(chunks):
+    processor = MultiStreamProcessor(DELIMITERS)
+    for chunk in chunks:
+        processor.process_chunk(chunk)
+    processor.flush()
+
+def benchmark(name, function, chunks, total_chars):
+    start = time.perf_counter()
+    function(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10}: {elapsed * 1000:9.1f} ms  {total_chars / elapsed / 1e6:8.2f} M chars/s")
+
+def main():
+    think_chars = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    trace = make_trace(think_chars)
+    chunks = [trace[i:i + chunk_size] for i in range(0, len(trace), chunk_size)]
+    print(f"{len(trace)} characters in {len(chunks)} chunks of {chunk_size}")
+    benchmark("chained", run_chained, chunks, len(trace))
+    benchmark("multi", run_multi, chunks, len(trace))
+
+if __name__ == "__main__":
+    main()